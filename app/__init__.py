@@ -11,14 +11,16 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
 
-db = SQLAlchemy()
+from app import ratelimit  # registra o storage sqlite:// do Flask-Limiter
+from app.database import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    default_limits=["200 per day", "50 per hour"]
 )
 
 def create_app(config_name='development'):
@@ -30,12 +32,57 @@ def create_app(config_name='development'):
     
     app.config.from_object(f'app.config.{config_name.capitalize()}Config')
     
+    from app.json_provider import init_json_provider
+    init_json_provider(app)
+    
+    from app.database import configure_engine_profile, init_engine_profile, init_read_replicas
+    engine_profile = configure_engine_profile(app)
+    
     db.init_app(app)
+    init_engine_profile(app, db, engine_profile)
+    init_read_replicas(app, engine_profile)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     limiter.init_app(app)
     
+    # Registrado primeiro para que seu after_request rode por último
+    from app.instrumentation import init_sql_counter
+    init_sql_counter(app)
+    
+    from app.cart_store import init_cart_store
+    init_cart_store(app)
+    
+    from app.passwords import init_password_hasher
+    init_password_hasher(app)
+    
+    from app.identity import register_identity_events
+    register_identity_events()
+    
+    from app.attributes import register_attribute_events
+    register_attribute_events()
+    
+    from app.changes import register_change_events
+    register_change_events()
+    
+    from app.coupons import register_coupon_events
+    register_coupon_events()
+    
+    from app.order_history import register_order_summary_events
+    register_order_summary_events()
+    
+    from app.autocomplete import init_autocomplete
+    init_autocomplete(app)
+    
+    from app.fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
+    
+    from app.assets import init_assets
+    init_assets(app)
+    
+    from app.compression import init_compression
+    init_compression(app)
+    
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Por favor, faça login para acessar esta página.'
     login_manager.login_message_category = 'info'
@@ -56,7 +103,8 @@ def create_app(config_name='development'):
     def inject_globals():
         from datetime import datetime
         from flask import session
-        cart_count = len(session.get('cart', {}))
+        from app.utils import CartService
+        cart_count = CartService.count(session)
         return {
             'current_year': datetime.now().year,
             'site_name': 'Fermarc Robótica',
@@ -0,0 +1,110 @@
+"""
+Listagem de pedidos do admin - Fermarc E-commerce
+Desenvolvido por João Lion
+
+A lista é uma única consulta de colunas (pedido + cliente via JOIN), sem
+montar objetos do ORM: o template recebe tuplas (Row) com os campos de
+``order_list_columns``. As contagens das abas de status vêm de um único
+``GROUP BY status``, que também dá o total da paginação.
+
+A busca por cliente ou número do pedido é por prefixo. LIKE sozinho não usa
+índice de expressão no SQLite (nem em colação não-C no PostgreSQL), então o
+prefixo também vira uma faixa (>= prefixo e < próximo prefixo) sobre os
+índices em lower() de e-mail e nomes. O termo é convertido com str.lower;
+no SQLite o lower() do banco é a mesma função (app/database.py), então
+"Ângela" e "élcio" também casam. No PostgreSQL lower() segue o LC_CTYPE do
+banco (que não deve ser "C").
+"""
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import and_, func, or_, select
+
+from app import db
+
+
+class RowPagination(Pagination):
+    """Pagination do Flask-SQLAlchemy para consultas de colunas, com total já conhecido"""
+
+    def _query_items(self):
+        statement = self._query_args['select']
+        return db.session.execute(statement.limit(self.per_page).offset(self._query_offset)).all()
+
+    def _query_count(self):
+        return self._query_args['total']
+
+
+def prefix_match(expression, prefix):
+    """``expression`` começa com ``prefix``, de forma que o índice seja usado"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(expression >= prefix, expression < upper,
+                expression.like(escaped + '%', escape='\\'))
+
+
+def search_filter(term):
+    """Prefixo de e-mail, nome, sobrenome, nome completo ou número do pedido"""
+    from app.models import Order, User
+
+    term = ' '.join(term.split())
+    lowered = term.lower()
+    conditions = [
+        prefix_match(func.lower(User.email), lowered),
+        prefix_match(func.lower(User.first_name), lowered),
+        prefix_match(func.lower(User.last_name), lowered),
+        prefix_match(Order.order_number, term.upper()),
+    ]
+    if ' ' in lowered:
+        first, last = lowered.split(' ', 1)
+        conditions.append(and_(prefix_match(func.lower(User.first_name), first),
+                               prefix_match(func.lower(User.last_name), last)))
+    return or_(*conditions)
+
+
+def order_list_columns():
+    from app.models import Order, User
+    return (
+        Order.id, Order.order_number, Order.status, Order.payment_method,
+        Order.payment_status, Order.total, Order.created_at,
+        User.id.label('user_id'), User.username, User.first_name, User.last_name, User.email,
+    )
+
+
+def _filtered(statement, search):
+    from app.models import Order, User
+    if search:
+        statement = statement.join(User, User.id == Order.user_id).where(search_filter(search))
+    return statement
+
+
+def status_counts(search=None):
+    """{status: pedidos} em um único GROUP BY, mais a chave 'all'"""
+    from app.models import Order
+
+    statement = _filtered(select(Order.status, func.count(Order.id)), search).group_by(Order.status)
+    counts = dict(db.session.execute(statement).all())
+    counts['all'] = sum(counts.values())
+    return counts
+
+
+def order_rows(status=None, search=None):
+    """Consulta (sem executar) das linhas da listagem, mais recentes primeiro"""
+    from app.models import Order, User
+
+    statement = select(*order_list_columns()).join(User, User.id == Order.user_id)
+    if search:
+        statement = statement.where(search_filter(search))
+    if status:
+        statement = statement.where(Order.status == status)
+    return statement.order_by(Order.created_at.desc(), Order.id.desc())
+
+
+def paginate_orders(page, per_page, status=None, search=None):
+    """(paginação de Rows, contagens por status) com duas consultas no total"""
+    counts = status_counts(search)
+    total = counts.get(status, 0) if status else counts['all']
+    pagination = RowPagination(page=page, per_page=per_page, error_out=False,
+                               select=order_rows(status, search), total=total)
+    return pagination, counts
+
+
+def recent_orders(limit=10):
+    return db.session.execute(order_rows().limit(limit)).all()
@@ -0,0 +1,122 @@
+"""
+Autenticação da API JSON - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Clientes sem navegador (app mobile) pedem um token em ``POST /api/auth/token``
+e o enviam em ``Authorization: Bearer <token>``. O token é assinado com a
+SECRET_KEY (itsdangerous), guarda o id do usuário e um selo da senha atual
+(HMAC do password_hash) e expira após API_TOKEN_MAX_AGE segundos. A cada
+requisição uma consulta pela chave primária confere se o usuário continua
+ativo e com a mesma senha, então trocar a senha ou desativar a conta revoga
+os tokens na hora, em todos os workers; o ``current_user`` continua vindo
+do cache de identidade.
+
+Requisições com token não passam pela verificação de CSRF (não há cookie a
+ser reaproveitado por outro site) nem usam a sessão: o carrinho é o
+carrinho salvo do usuário no CART_STORE, o mesmo que o site carrega no login.
+Sem token, os endpoints continuam aceitando a sessão do site, com CSRF.
+"""
+import hashlib
+import hmac
+from functools import wraps
+
+from flask import current_app, g, jsonify, request, session
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from app import csrf, db
+
+TOKEN_SALT = 'fermarc-api-token'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def password_stamp(password_hash):
+    """Selo da senha para o token; muda quando o password_hash muda"""
+    key = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(key, password_hash.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+def issue_token(user):
+    return _serializer().dumps({'uid': user.id, 'pw': password_stamp(user.password_hash)})
+
+
+def load_token_user(token):
+    """
+    Usuário (UserSnapshot) do token, ou None se inválido/expirado, se a conta
+    foi desativada ou se a senha mudou depois da emissão
+    """
+    from sqlalchemy import select
+    from app.identity import identity_cache
+    from app.models import User
+    try:
+        data = _serializer().loads(token, max_age=current_app.config.get('API_TOKEN_MAX_AGE'))
+    except BadSignature:
+        return None
+    if not isinstance(data, dict) or 'pw' not in data:
+        return None
+    row = db.session.execute(
+        select(User.is_active, User.password_hash).where(User.id == data.get('uid'))
+    ).first()
+    if row is None or not row.is_active or \
+            not hmac.compare_digest(password_stamp(row.password_hash), str(data['pw'])):
+        return None
+    return identity_cache.load(data['uid'])
+
+
+def bearer_token():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    token = token.strip()
+    return token if scheme.lower() == 'bearer' and token else None
+
+
+def token_authenticated():
+    return g.get('_api_token_auth', False)
+
+
+def cart_session():
+    """
+    Objeto de sessão para o CartService: a sessão do site ou, com token,
+    um dict apontando para o carrinho salvo do usuário
+    """
+    if not token_authenticated():
+        return session
+    state = g.get('_api_cart_session')
+    if state is None:
+        from app.utils import CartService
+        cart_id = CartService._store().find_user_cart(current_user.id)
+        state = g._api_cart_session = {'cart_id': cart_id} if cart_id else {}
+    return state
+
+
+def api_login_required(view):
+    """Exige token Bearer ou login na sessão (com CSRF em métodos de escrita)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        if token is not None:
+            user = load_token_user(token)
+            if user is None:
+                return jsonify({'error': 'Token inválido ou expirado'}), 401
+            # Mesmo efeito de login_user() para esta requisição, sem gravar a sessão
+            g._login_user = user
+            g._api_token_auth = True
+        else:
+            if request.method not in SAFE_METHODS and current_app.config.get('WTF_CSRF_ENABLED', True):
+                csrf.protect()
+            if not current_user.is_authenticated:
+                return jsonify({'error': 'Autenticação necessária'}), 401
+
+        response = view(*args, **kwargs)
+
+        if token is not None and '_api_cart_session' in g:
+            # O after_request do cart_store só grava o carrinho da sessão do site
+            from app.utils import CartService
+            CartService.flush(g._api_cart_session)
+        return response
+
+    csrf.exempt(wrapper)
+    return wrapper
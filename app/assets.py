@@ -0,0 +1,224 @@
+"""
+Pipeline de assets estáticos - Fermarc E-commerce
+Desenvolvido por João Lion
+
+``flask assets build`` minifica os CSS/JS de app/static/css e app/static/js,
+grava cópias com o hash do conteúdo no nome em app/static/dist e escreve
+app/static/dist/manifest.json ({"css/base.css": "css/base.1a2b3c4d5e6f.css"}).
+
+Nos templates, ``asset_url('css/base.css')`` aponta para a versão com hash
+quando o manifest existe (servida com cache "immutable" de um ano) e para o
+arquivo original caso contrário, então o site funciona sem o build.
+
+Usa rcssmin/rjsmin quando instalados; senão, um minificador conservador que
+só remove comentários e espaços fora de strings. Cada arquivo ganha irmãos
+.gz (e .br, com o pacote brotli) servidos por app/compression.py.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import current_app, request, url_for
+
+try:
+    import rcssmin
+except ImportError:  # opcional
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # opcional
+    rjsmin = None
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+SOURCE_DIRS = ('css', 'js')
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE_RE = re.compile(r'\s+')
+CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+# Só o espaço depois de ':' ("a :hover" é diferente de "a:hover")
+CSS_COLON_RE = re.compile(r':\s+')
+
+
+def minify_css(source):
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    source = CSS_COMMENT_RE.sub('', source)
+    source = CSS_SPACE_RE.sub(' ', source)
+    source = CSS_PUNCT_RE.sub(r'\1', source)
+    source = CSS_COLON_RE.sub(':', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(source):
+    """
+    Remove comentários, indentação e linhas vazias. Mantém as quebras de
+    linha (inserção automática de ';') e o conteúdo de strings/templates.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+
+    lines = []
+    quote = None       # aspa da string aberta (` pode atravessar linhas)
+    in_comment = False  # dentro de /* ... */
+    for raw in source.splitlines():
+        if quote != '`':
+            raw = raw.strip()  # dentro de template literal o conteúdo é preservado
+        out, i = [], 0
+        while i < len(raw):
+            char = raw[i]
+            pair = raw[i:i + 2]
+            if in_comment:
+                if pair == '*/':
+                    in_comment = False
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if quote:
+                out.append(char)
+                if char == '\\' and i + 1 < len(raw):
+                    out.append(raw[i + 1])
+                    i += 2
+                    continue
+                if char == quote:
+                    quote = None
+                i += 1
+                continue
+            if pair == '//':
+                break
+            if pair == '/*':
+                in_comment = True
+                i += 2
+                continue
+            if char in '\'"`':
+                quote = char
+            out.append(char)
+            i += 1
+        if quote and quote != '`':
+            quote = None  # string sem fechamento na linha (JS inválido)
+        line = ''.join(out)
+        if quote == '`' or line.strip():
+            lines.append(line if quote == '`' else line.rstrip())
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def write_precompressed(path, data):
+    """Grava path.gz e path.br (compressão máxima: feita uma vez no build)"""
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _sources(static_folder):
+    for directory in SOURCE_DIRS:
+        root = os.path.join(static_folder, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                name, ext = os.path.splitext(filename)
+                if ext in MINIFIERS and not name.endswith('.min'):
+                    path = os.path.join(dirpath, filename)
+                    yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def build_assets(static_folder, clean=False):
+    """
+    Gera dist/ e o manifest. Retorna [(origem, destino, bytes_origem, bytes_min)].
+    Com ``clean``, remove de dist/ os arquivos que não estão no novo manifest.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    report = []
+    for logical, path in _sources(static_folder):
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        name, ext = os.path.splitext(logical)
+        minified = MINIFIERS[ext](source).encode('utf-8')
+        digest = hashlib.sha256(minified).hexdigest()[:HASH_LENGTH]
+        target = f'{name}.{digest}{ext}'
+        target_path = os.path.join(dist, target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if not os.path.exists(target_path):
+            with open(target_path, 'wb') as f:
+                f.write(minified)
+            write_precompressed(target_path, minified)
+        manifest[logical] = target
+        report.append((logical, target, len(source.encode('utf-8')), len(minified)))
+
+    if clean:
+        keep = {os.path.normpath(os.path.join(dist, t)) for t in manifest.values()}
+        for dirpath, _, filenames in os.walk(dist):
+            for filename in filenames:
+                path = os.path.normpath(os.path.join(dirpath, filename))
+                original = path[:-3] if path.endswith(('.gz', '.br')) else path
+                if filename != MANIFEST_NAME and original not in keep:
+                    os.remove(path)
+
+    os.makedirs(dist, exist_ok=True)
+    manifest_path = os.path.join(dist, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return report
+
+
+class AssetManifest:
+    """Manifest carregado sob demanda; recarregado se o arquivo mudar"""
+
+    def __init__(self):
+        self._entries = {}
+        self._mtime = None
+
+    def lookup(self, static_folder, logical):
+        path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._entries, self._mtime = {}, None
+            return None
+        if mtime != self._mtime:
+            with open(path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        return self._entries.get(logical)
+
+
+asset_manifest = AssetManifest()
+
+
+def asset_url(filename):
+    """URL do asset com hash (se compilado) ou do arquivo original"""
+    target = asset_manifest.lookup(current_app.static_folder, filename)
+    if target:
+        return url_for('static', filename=f'{DIST_DIR}/{target}')
+    return url_for('static', filename=filename)
+
+
+def init_assets(app):
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.after_request
+    def cache_fingerprinted_assets(response):
+        filename = (request.view_args or {}).get('filename', '')
+        if request.endpoint == 'static' and filename.startswith(f'{DIST_DIR}/') \
+                and filename != f'{DIST_DIR}/{MANIFEST_NAME}':
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
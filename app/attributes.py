@@ -0,0 +1,232 @@
+"""
+Índice de atributos dos produtos - Fermarc E-commerce
+Desenvolvido por João Lion
+
+As especificações ficam em ``Product.specifications`` (JSON). Para filtrar
+o catálogo por elas sem carregar os produtos, cada par nome/valor é
+copiado para ``product_attributes`` (uma linha por produto e atributo) com
+a chave normalizada (slug), o valor normalizado e o primeiro número do
+valor. A tabela é mantida pelos eventos do mapper de ``Product`` e pela
+carga de fixtures.
+
+Filtros na query string (``shop`` e ``/api/products``)::
+
+    attr.tensao-de-operacao=5v          valor exato (repetir para OU)
+    attr.memoria-flash.min=16           faixa numérica
+    attr.memoria-flash.max=64
+"""
+import re
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, select
+from unidecode import unidecode
+
+from app import db
+
+FILTER_PREFIX = 'attr.'
+KEY_LENGTH = 100
+VALUE_LENGTH = 255
+
+NUMBER_RE = re.compile(r'-?\d+(?:[.,]\d+)?')
+
+
+def normalize_key(name):
+    """'Tensão de Operação' -> 'tensao-de-operacao'"""
+    from app.utils import slugify
+    return slugify(str(name))[:KEY_LENGTH]
+
+
+def normalize_value(value):
+    """'  5V DC ' -> '5v dc' (sem acentos, minúsculo, espaços únicos)"""
+    return ' '.join(unidecode(str(value)).lower().split())[:VALUE_LENGTH]
+
+
+def extract_number(value):
+    """Primeiro número do valor: '3.3V - 5V' -> 3.3, '32 KB' -> 32.0"""
+    match = NUMBER_RE.search(str(value))
+    if not match:
+        return None
+    return float(match.group().replace(',', '.'))
+
+
+def attribute_rows(product_id, specifications):
+    """Linhas de product_attributes para um produto"""
+    rows = {}
+    for name, value in (specifications or {}).items():
+        if value is None or isinstance(value, (dict, list)):
+            continue
+        key = normalize_key(name)
+        if not key or key in rows:
+            continue
+        rows[key] = {
+            'product_id': product_id,
+            'key': key,
+            'label': str(name)[:KEY_LENGTH],
+            'value': str(value)[:VALUE_LENGTH],
+            'value_norm': normalize_value(value),
+            'value_num': extract_number(value),
+        }
+    return list(rows.values())
+
+
+def sync_product_attributes(connection, product_id, specifications):
+    """Regrava os atributos de um produto na conexão/transação informada"""
+    from app.models import ProductAttribute
+    table = ProductAttribute.__table__
+    connection.execute(delete(table).where(table.c.product_id == product_id))
+    rows = attribute_rows(product_id, specifications)
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def _after_insert(mapper, connection, target):
+    sync_product_attributes(connection, target.id, target.specifications)
+
+
+def _after_update(mapper, connection, target):
+    if inspect(target).attrs.specifications.history.has_changes():
+        sync_product_attributes(connection, target.id, target.specifications)
+
+
+def _before_delete(mapper, connection, target):
+    sync_product_attributes(connection, target.id, None)
+
+
+def register_attribute_events():
+    """Mantém product_attributes em dia com Product.specifications"""
+    from app.models import Product
+
+    if not event.contains(Product, 'after_insert', _after_insert):
+        event.listen(Product, 'after_insert', _after_insert)
+        event.listen(Product, 'after_update', _after_update)
+        event.listen(Product, 'before_delete', _before_delete)
+
+
+def parse_attribute_filters(args):
+    """
+    Lê os filtros ``attr.*`` da query string
+    Retorna {chave: {'values': [...], 'min': float|None, 'max': float|None}}
+    """
+    filters = {}
+    for arg in args:
+        if not arg.startswith(FILTER_PREFIX):
+            continue
+        name = arg[len(FILTER_PREFIX):]
+        bound = None
+        if name.endswith(('.min', '.max')):
+            name, bound = name[:-4], name[-3:]
+        key = normalize_key(name)
+        if not key:
+            continue
+        entry = filters.setdefault(key, {'values': [], 'min': None, 'max': None})
+        if bound:
+            number = extract_number(args.get(arg, ''))
+            if number is not None:
+                entry[bound] = number
+        else:
+            entry['values'].extend(
+                normalize_value(v) for v in args.getlist(arg) if v.strip()
+            )
+    return {key: entry for key, entry in filters.items()
+            if entry['values'] or entry['min'] is not None or entry['max'] is not None}
+
+
+def filter_args(filters):
+    """Inverso de parse_attribute_filters - para url_for na paginação"""
+    args = {}
+    for key, entry in filters.items():
+        if entry['values']:
+            args[f'{FILTER_PREFIX}{key}'] = entry['values']
+        for bound in ('min', 'max'):
+            if entry[bound] is not None:
+                args[f'{FILTER_PREFIX}{key}.{bound}'] = entry[bound]
+    return args
+
+
+def _matching_products(key, entry):
+    """Subconsulta indexada (key, value_norm|value_num) -> product_id"""
+    from app.models import ProductAttribute
+    conditions = [ProductAttribute.key == key]
+    if entry['values']:
+        conditions.append(ProductAttribute.value_norm.in_(entry['values']))
+    if entry['min'] is not None:
+        conditions.append(ProductAttribute.value_num >= entry['min'])
+    if entry['max'] is not None:
+        conditions.append(ProductAttribute.value_num <= entry['max'])
+    return select(ProductAttribute.product_id).where(*conditions)
+
+
+def apply_attribute_filters(query, filters, exclude=None):
+    """Filtra a Query de Product (E entre atributos, OU entre valores)"""
+    from app.models import Product
+    for key, entry in filters.items():
+        if key != exclude:
+            query = query.filter(Product.id.in_(_matching_products(key, entry)))
+    return query
+
+
+def _facet_rows(product_ids, keys=None):
+    from app.models import ProductAttribute
+    conditions = [ProductAttribute.product_id.in_(product_ids)]
+    if keys is not None:
+        conditions.append(ProductAttribute.key.in_(keys))
+    statement = (
+        select(
+            ProductAttribute.key,
+            ProductAttribute.value_norm,
+            func.min(ProductAttribute.label),
+            func.min(ProductAttribute.value),
+            func.min(ProductAttribute.value_num),
+            func.count(ProductAttribute.product_id),
+        )
+        .where(and_(*conditions))
+        .group_by(ProductAttribute.key, ProductAttribute.value_norm)
+    )
+    return db.session.execute(statement).all()
+
+
+def attribute_facets(base_query, filters, keys=None, max_facets=8, max_values=10):
+    """
+    Contagem de produtos por valor de atributo, agregada no banco.
+
+    ``base_query`` é a Query de Product já com os demais filtros (busca,
+    categoria, preço) mas sem os de atributo. Cada atributo selecionado é
+    contado ignorando o próprio filtro, para que os valores alternativos
+    continuem visíveis; os demais são contados em uma única consulta.
+    """
+    from app.models import Product
+
+    def ids(query):
+        return query.with_entities(Product.id).order_by(None).statement
+
+    filtered = apply_attribute_filters(base_query, filters)
+    unselected = None if keys is None else [k for k in keys if k not in filters]
+    rows = list(_facet_rows(ids(filtered), unselected))
+    if keys is None:
+        rows = [row for row in rows if row[0] not in filters]
+    for key in filters:
+        if keys is None or key in keys:
+            others = apply_attribute_filters(base_query, filters, exclude=key)
+            rows.extend(_facet_rows(ids(others), [key]))
+
+    facets = {}
+    for key, value_norm, label, value, value_num, count in rows:
+        facet = facets.setdefault(key, {
+            'key': key, 'label': label, 'values': [], 'min': None, 'max': None
+        })
+        selected = value_norm in filters.get(key, {}).get('values', ())
+        facet['values'].append({
+            'value': value_norm, 'label': value, 'count': count, 'selected': selected
+        })
+        if value_num is not None:
+            facet['min'] = value_num if facet['min'] is None else min(facet['min'], value_num)
+            facet['max'] = value_num if facet['max'] is None else max(facet['max'], value_num)
+
+    result = []
+    for facet in facets.values():
+        facet['values'].sort(key=lambda v: (not v['selected'], -v['count'], v['value']))
+        facet['values'] = facet['values'][:max_values]
+        result.append(facet)
+    # Atributos selecionados primeiro, depois os mais frequentes
+    result.sort(key=lambda f: (f['key'] not in filters,
+                               -sum(v['count'] for v in f['values']), f['key']))
+    return result[:max_facets]
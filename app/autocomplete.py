@@ -0,0 +1,326 @@
+"""
+Autocomplete da busca - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Índice de prefixos em memória (lista ordenada + bisect) sobre título, SKU
+e nome das categorias, já normalizados (sem acento, minúsculo). Cada
+título é indexado a partir de cada palavra, então "uno" e "arduino u"
+encontram "Arduino Uno R3". A resposta não toca o banco.
+
+O índice é montado no início de cada worker (primeira requisição do
+processo), atualizado pelos eventos da sessão quando o próprio worker
+altera produtos e reconstruído a cada
+AUTOCOMPLETE_REFRESH_SECONDS para enxergar alterações feitas por outros
+workers. Só alterações das colunas usadas pelo índice (INDEXED_FIELDS)
+marcam o produto; estoque não. Montagem e atualizações rodam em uma thread
+de fundo, uma de cada vez por processo; a requisição só entrega os ids. As
+buscas continuam usando o índice anterior (vazio logo após o início do
+worker) até a troca. A atualização remove e insere só as chaves dos
+produtos alterados (bisect), sem reordenar o catálogo; lotes maiores que
+AUTOCOMPLETE_INCREMENTAL_LIMIT viram uma reconstrução completa. Ranking: sugestões que começam pelo termo primeiro, depois
+popularidade (unidades vendidas, com bônus para produtos em destaque).
+"""
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from flask import current_app, request
+from sqlalchemy import event, func, inspect, select
+from unidecode import unidecode
+
+from app import db
+
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+# Máximo de chaves examinadas por consulta (prefixos muito curtos)
+SCAN_LIMIT = 400
+
+# Colunas de Product usadas pelo índice: chaves (título, SKU), filtro,
+# ranking e campos da sugestão. Preço e destaque só trocam a entrada
+INDEXED_FIELDS = ('title', 'sku', 'slug', 'is_active', 'featured', 'price')
+
+
+def normalize(text):
+    """'Módulo Relé 5V' -> 'modulo rele 5v'"""
+    return NON_ALNUM_RE.sub(' ', unidecode(str(text or '')).lower()).strip()
+
+
+def _suffixes(text):
+    """Chaves a partir de cada palavra: 'a b c' -> ['a b c', 'b c', 'c']"""
+    words = text.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    """Lista ordenada de (chave, entrada); leitura sem lock via troca atômica"""
+
+    def __init__(self):
+        self._keys = []
+        self._refs = []
+        self._entries = {}   # ('product'|'category', id) -> dict
+        self._lock = threading.Lock()
+        self._dirty = set()  # ids de produtos alterados neste processo
+        self.pid = None
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _entry_keys(entry):
+        keys = [(key, 0 if i == 0 else 1) for i, key in enumerate(_suffixes(entry['norm']))]
+        if entry.get('sku_norm'):
+            keys.append((entry['sku_norm'], 0))
+        return keys
+
+    def _rebuild_arrays(self, entries):
+        pairs = sorted(
+            (key, ref, start)
+            for ref, entry in entries.items()
+            for key, start in self._entry_keys(entry)
+        )
+        keys = [pair[0] for pair in pairs]
+        refs = [(pair[1], pair[2]) for pair in pairs]
+        # Troca atômica: buscas concorrentes veem o índice antigo ou o novo
+        self._entries, self._keys, self._refs = entries, keys, refs
+
+    def build(self, entries):
+        with self._lock:
+            # _dirty não é limpo: alterações feitas durante a montagem são
+            # reaplicadas depois (reaplicar as anteriores é inofensivo)
+            self._rebuild_arrays({(e['type'], e['id']): e for e in entries})
+            self.pid = os.getpid()
+            self.built_at = time.monotonic()
+
+    def replace_products(self, product_entries, removed_ids=()):
+        """
+        Atualiza apenas os produtos informados: as chaves antigas deles saem
+        e as novas entram por bisect, sem reordenar o catálogo
+        """
+        with self._lock:
+            # Trabalha em cópias (cópia de lista é linear, sem ordenar) e troca
+            # no fim: buscas concorrentes nunca veem as listas pela metade
+            entries, keys, refs = dict(self._entries), list(self._keys), list(self._refs)
+            new_entries = {('product', entry['id']): entry for entry in product_entries}
+            for ref in {('product', product_id) for product_id in removed_ids} | set(new_entries):
+                old, new = entries.pop(ref, None), new_entries.get(ref)
+                old_keys = set(self._entry_keys(old)) if old else set()
+                new_keys = set(self._entry_keys(new)) if new else set()
+                # Preço/destaque mudam só a entrada; as chaves ficam onde estão
+                for key, start in old_keys - new_keys:
+                    i = bisect_left(keys, key)
+                    while i < len(keys) and keys[i] == key:
+                        if refs[i] == (ref, start):
+                            del keys[i], refs[i]
+                            break
+                        i += 1
+                for key, start in new_keys - old_keys:
+                    i = bisect_right(keys, key)
+                    keys.insert(i, key)
+                    refs.insert(i, (ref, start))
+                if new is not None:
+                    entries[ref] = new
+            self._entries, self._keys, self._refs = entries, keys, refs
+
+    def mark_dirty(self, product_ids):
+        with self._lock:
+            self._dirty.update(product_ids)
+
+    def has_dirty(self):
+        return bool(self._dirty)
+
+    def take_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def search(self, text, limit=8):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        keys, refs, entries = self._keys, self._refs, self._entries
+        best = {}
+        i = bisect_left(keys, prefix)
+        end = min(len(keys), i + SCAN_LIMIT)
+        while i < end and keys[i].startswith(prefix):
+            ref, start = refs[i]
+            entry = entries[ref]
+            rank = (start == 0, entry['score'])
+            if ref not in best or rank > best[ref][0]:
+                best[ref] = (rank, entry)
+            i += 1
+        top = heapq.nlargest(limit, best.values(), key=lambda item: item[0])
+        return [entry for _, entry in top]
+
+
+autocomplete_index = PrefixIndex()
+
+# Segurado enquanto a thread de montagem/atualização do índice está rodando
+_rebuilding = threading.Lock()
+
+
+def _product_entries(product_ids=None):
+    from app.models import Product, OrderItem
+
+    sold = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity).label('sold'))
+        .group_by(OrderItem.product_id)
+        .subquery()
+    )
+    statement = (
+        select(Product.id, Product.title, Product.slug, Product.sku, Product.price,
+               Product.featured, func.coalesce(sold.c.sold, 0))
+        .outerjoin(sold, sold.c.product_id == Product.id)
+        .where(Product.is_active == True)
+    )
+    if product_ids is not None:
+        statement = statement.where(Product.id.in_(product_ids))
+
+    boost = current_app.config.get('AUTOCOMPLETE_FEATURED_BOOST', 10)
+    return [
+        {
+            'type': 'product', 'id': product_id, 'label': title, 'slug': slug,
+            'sku': sku, 'price': float(price),
+            'norm': normalize(title), 'sku_norm': normalize(sku),
+            'score': int(units) + (boost if featured else 0),
+        }
+        for product_id, title, slug, sku, price, featured, units in db.session.execute(statement)
+    ]
+
+
+def _category_entries():
+    from app.models import Category, product_categories
+
+    counts = (
+        select(product_categories.c.category_id, func.count().label('products'))
+        .group_by(product_categories.c.category_id)
+        .subquery()
+    )
+    statement = (
+        select(Category.id, Category.name, Category.slug, func.coalesce(counts.c.products, 0))
+        .outerjoin(counts, counts.c.category_id == Category.id)
+        .where(Category.is_active == True)
+    )
+    return [
+        {
+            'type': 'category', 'id': category_id, 'label': name, 'slug': slug,
+            'norm': normalize(name), 'score': int(products),
+        }
+        for category_id, name, slug, products in db.session.execute(statement)
+    ]
+
+
+def build_index():
+    autocomplete_index.build(_product_entries() + _category_entries())
+    return len(autocomplete_index)
+
+
+def update_products(product_ids):
+    """Reindexa só os produtos informados (removidos/inativos saem do índice)"""
+    autocomplete_index.replace_products(_product_entries(product_ids), removed_ids=product_ids)
+
+
+def _build_in_background(app, product_ids=None):
+    """
+    Monta o índice (ou, com ``product_ids``, atualiza só esses produtos) em
+    uma thread com contexto próprio; libera _rebuilding ao terminar
+    """
+    def run():
+        try:
+            with app.app_context():
+                try:
+                    if product_ids is None:
+                        build_index()
+                    else:
+                        update_products(product_ids)
+                except Exception as e:  # banco ainda sem tabelas, por exemplo
+                    db.session.rollback()
+                    app.logger.warning(f'Autocomplete: índice não atualizado ({e})')
+        finally:
+            _rebuilding.release()
+
+    try:
+        threading.Thread(target=run, name='autocomplete-build', daemon=True).start()
+    except Exception:
+        _rebuilding.release()
+        raise
+
+
+def refresh_index():
+    """
+    Dispara em segundo plano a montagem (índice expirado) ou a atualização
+    dos produtos alterados neste processo; no máximo uma thread por vez
+    """
+    interval = current_app.config.get('AUTOCOMPLETE_REFRESH_SECONDS', 300)
+    if (autocomplete_index.pid != os.getpid()
+            or time.monotonic() - autocomplete_index.built_at > interval):
+        if _rebuilding.acquire(blocking=False):
+            _build_in_background(current_app._get_current_object())
+            return
+    if not autocomplete_index.has_dirty():
+        return
+    # Com uma montagem/atualização em andamento, as pendências ficam para depois
+    if not _rebuilding.acquire(blocking=False):
+        return
+    dirty = autocomplete_index.take_dirty()
+    if not dirty:  # outra requisição já as levou
+        _rebuilding.release()
+        return
+    if len(dirty) > current_app.config.get('AUTOCOMPLETE_INCREMENTAL_LIMIT', 200):
+        # Muitos produtos: a reconstrução completa sai mais barata
+        _build_in_background(current_app._get_current_object())
+    else:
+        _build_in_background(current_app._get_current_object(), dirty)
+
+
+def _indexed_change(product):
+    attrs = inspect(product).attrs
+    return any(attrs[name].history.has_changes() for name in INDEXED_FIELDS)
+
+
+def _collect_changed(session, flush_context):
+    """
+    after_flush: os ids já existem e new/dirty/deleted e o histórico dos
+    atributos ainda refletem o flush
+    """
+    from app.models import Product
+    changed = session.info.setdefault('autocomplete_dirty', set())
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Product):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Product) and _indexed_change(obj):
+            changed.add(obj.id)
+
+
+def _after_commit(session):
+    changed = session.info.pop('autocomplete_dirty', None)
+    if changed:
+        autocomplete_index.mark_dirty(changed)
+
+
+def _after_rollback(session):
+    session.info.pop('autocomplete_dirty', None)
+
+
+def init_autocomplete(app):
+    """Monta o índice no início do worker e registra os eventos de atualização"""
+    from sqlalchemy.orm import Session
+
+    if not event.contains(Session, 'after_commit', _after_commit):
+        event.listen(Session, 'after_flush', _collect_changed)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+
+    @app.before_request
+    def warm_autocomplete_index():
+        if request.endpoint in (None, 'static'):
+            return
+        try:
+            refresh_index()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f'Autocomplete: índice não atualizado ({e})')
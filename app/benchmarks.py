@@ -0,0 +1,185 @@
+"""
+Benchmarks - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Medições usadas pelos comandos ``flask bench-*``, contra o banco configurado.
+Os fluxos completos rodam pelo test client do Flask com um usuário
+temporário que é removido no final (pedidos, carrinho e chaves de
+idempotência junto; o estoque consumido é devolvido).
+"""
+import contextlib
+import io
+import re
+import secrets
+import statistics
+import time
+
+from app import db, limiter
+
+KEY_RE = re.compile(r'name="idempotency_key"[^>]*value="([^"]+)"')
+
+
+class StepTimer:
+    """Acumula as durações (ms) de cada etapa nomeada"""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        yield
+        self.samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    def report(self):
+        """[(etapa, mediana_ms, p95_ms)] incluindo a soma das etapas ('total')"""
+        rows = []
+        totals = None
+        for name, values in self.samples.items():
+            rows.append((name, statistics.median(values), _percentile(values, 95)))
+            totals = values if totals is None else [a + b for a, b in zip(totals, values)]
+        if totals:
+            rows.append(('total', statistics.median(totals), _percentile(totals, 95)))
+        return rows
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f'{response.request.method} {response.request.path} '
+                           f'retornou {response.status_code}')
+    return response
+
+
+def _html_flow(client, timer, product_id, address_id):
+    with timer.step('adicionar'):
+        _expect(client.post(f'/cart/add/{product_id}', data={'quantity': 1}), 302)
+    with timer.step('página de checkout'):
+        html = _expect(client.get('/cart/checkout'), 200).get_data(as_text=True)
+    key = KEY_RE.search(html).group(1)
+    with timer.step('pedido'):
+        _expect(client.post('/cart/checkout', data={
+            'idempotency_key': key, 'address_id': address_id, 'payment_method': 'pix'
+        }), 302)
+
+
+def _json_flow(client, timer, headers, product_id, address_id):
+    with timer.step('adicionar'):
+        _expect(client.post('/api/cart/items', headers=headers,
+                            json={'product_id': product_id, 'quantity': 1}), 200)
+    with timer.step('cotação'):
+        _expect(client.post('/api/cart/quote', headers=headers,
+                            json={'address_id': address_id}), 200)
+    with timer.step('pedido'):
+        _expect(client.post('/api/checkout', json={'address_id': address_id, 'payment_method': 'pix'},
+                            headers=dict(headers, **{'Idempotency-Key': secrets.token_hex(8)})), 201)
+
+
+def bench_checkout_flows(app, iterations=20, warmup=2):
+    """
+    Mede o checkout pelo HTML (sessão + formulários) e pela API JSON (token).
+    Retorna {'html': [...], 'json': [...]} no formato de StepTimer.report().
+    """
+    from app.models import Address, IdempotencyKey, Product, User
+
+    suffix = secrets.token_hex(4)
+    password = secrets.token_urlsafe(12)
+    csrf_enabled = app.config.get('WTF_CSRF_ENABLED', True)
+    limiter_enabled = limiter.enabled
+
+    with app.app_context():
+        product = Product.query.filter(
+            Product.is_active == True, Product.stock >= 2 * (iterations + warmup)
+        ).order_by(Product.id).first()
+        if product is None:
+            raise RuntimeError('Nenhum produto ativo com estoque suficiente para o benchmark')
+        product_id, stock = product.id, product.stock
+
+        user = User(email=f'bench-{suffix}@example.com', username=f'bench-{suffix}')
+        user.set_password(password)
+        db.session.add(user)
+        db.session.flush()
+        address = Address(user_id=user.id, street='Rua do Benchmark', number='1',
+                           neighborhood='Centro', city='São Paulo', state='SP',
+                           zipcode='01001-000', is_default=True)
+        db.session.add(address)
+        db.session.commit()
+        user_id, address_id = user.id, address.id
+
+    # Formulários sem CSRF e sem rate limit, só durante o benchmark
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    results = {}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # e-mails simulados
+            client = app.test_client()
+            _expect(client.post('/auth/login', data={'email': user.email, 'password': password}), 302)
+            timer = StepTimer()
+            for i in range(warmup + iterations):
+                _html_flow(client, timer if i >= warmup else StepTimer(), product_id, address_id)
+            results['html'] = timer.report()
+
+            client = app.test_client()
+            token = _expect(client.post('/api/auth/token', json={
+                'email': user.email, 'password': password
+            }), 200).get_json()['token']
+            headers = {'Authorization': f'Bearer {token}'}
+            timer = StepTimer()
+            for i in range(warmup + iterations):
+                _json_flow(client, timer if i >= warmup else StepTimer(), headers, product_id, address_id)
+            results['json'] = timer.report()
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = csrf_enabled
+        limiter.enabled = limiter_enabled
+        with app.app_context():
+            store = app.extensions['cart_store']
+            while (cart_id := store.find_user_cart(user_id)) is not None:
+                store.delete(cart_id)
+            IdempotencyKey.query.filter_by(user_id=user_id).delete()
+            db.session.delete(db.session.get(User, user_id))
+            db.session.get(Product, product_id).stock = stock
+            db.session.commit()
+    return results
+
+
+def bench_product_serialization(app, per_page=100, rounds=20,
+                                fieldsets=(None, 'id,title,slug,price,stock,main_image')):
+    """
+    Para cada conjunto de campos da listagem /api/products: tempo da consulta,
+    da montagem dos dicts e da codificação JSON (stdlib x orjson) e o tamanho
+    do payload. Retorna [(campos, etapa, mediana_ms, bytes)].
+    """
+    from flask.json.provider import DefaultJSONProvider
+    from app.json_provider import OrjsonProvider, orjson
+    from app.models import Product
+    from app.serializers import PRODUCT_LIST_FIELDS, product_serializer
+
+    providers = [('json (stdlib)', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+
+    rows = []
+    with app.app_context():
+        for fieldset in fieldsets:
+            fields = product_serializer.parse(fieldset, default=PRODUCT_LIST_FIELDS)
+            label = fieldset or 'padrão'
+            timer = StepTimer()
+            sizes = {}
+            for _ in range(rounds):
+                db.session.expunge_all()
+                with timer.step('consulta'):
+                    products = Product.query.options(*product_serializer.load_options(fields)) \
+                        .filter_by(is_active=True).order_by(Product.id).limit(per_page).all()
+                with timer.step('dicts'):
+                    data = {'products': product_serializer.dump_many(products, fields)}
+                for name, provider in providers:
+                    with timer.step(name):
+                        body = provider.dumps(data, separators=(',', ':'))
+                    sizes[name] = len(body.encode('utf-8'))
+            rows += [(label, step, median, sizes.get(step))
+                     for step, median, _ in timer.report() if step != 'total']
+    return rows
@@ -0,0 +1,257 @@
+"""
+Operações em massa do admin - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Reajuste de preço, estoque via CSV, ativação de produtos e mudança de
+status de pedidos aplicados com UPDATEs por conjunto, sem carregar os
+objetos do ORM. Os ids/SKUs são processados em lotes de BULK_CHUNK_SIZE,
+cada lote em sua própria transação: uma falha no meio mantém os lotes já
+confirmados e o retorno informa o que foi aplicado.
+
+UPDATEs via Core não disparam os eventos do mapper, então cada lote grava
+``catalog_changes`` (``record_changes``) e marca a sessão como os eventos
+fariam (long-poll de /api/changes e índice do autocomplete); cancelamentos
+descontam o total gasto em ``user_order_summaries``. O
+``updated_at`` também é atualizado, o que invalida fragmentos, feeds e
+sitemaps. Os UPDATEs de produto usam RETURNING (PostgreSQL, SQLite 3.35+).
+"""
+import csv
+import io
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+from sqlalchemy import case, func, select, update
+
+from app import db
+from app.changes import product_state, record_changes
+from app.order_history import CANCELLED, apply_summary_delta
+
+ORDER_STATUSES = ('pending', 'paid', 'shipped', 'delivered', 'cancelled')
+
+# Status de destino -> status de origem aceitos na mudança em massa
+ORDER_TRANSITIONS = {
+    'paid': ('pending',),
+    'shipped': ('paid',),
+    'delivered': ('shipped',),
+    'cancelled': ('pending', 'paid'),
+}
+
+
+class BulkRow:
+    """Linha devolvida pelo RETURNING com a interface de product_state"""
+    __slots__ = ('id', 'price', 'stock', 'is_active')
+
+    def __init__(self, id, price, stock, is_active):
+        self.id = id
+        self.price = price
+        self.stock = stock
+        self.is_active = is_active
+
+
+def _log_products(rows, changed):
+    """O que os eventos do mapper de Product fariam para estas linhas"""
+    rows = [BulkRow(*row) for row in rows]
+    if not rows:
+        return
+    record_changes(db.session.connection(), [
+        {'product_id': row.id, 'op': 'update', 'data': dict(product_state(row), changed=list(changed))}
+        for row in rows
+    ])
+    db.session.info['catalog_changed'] = True  # app/changes.py
+    if 'stock' not in changed:
+        # Estoque não entra no índice do autocomplete (app/autocomplete.py)
+        db.session.info.setdefault('autocomplete_dirty', set()).update(row.id for row in rows)
+
+
+def _run_chunks(keys, apply, chunk_size=None):
+    """
+    Chama ``apply(lote, agora)`` (retorna quantas linhas alterou) e faz
+    commit a cada lote. Retorna matched/updated/chunks/elapsed_ms.
+    """
+    size = chunk_size or current_app.config.get('BULK_CHUNK_SIZE', 1000)
+    started = time.perf_counter()
+    updated = chunks = 0
+    try:
+        for start in range(0, len(keys), size):
+            updated += apply(keys[start:start + size], datetime.utcnow())
+            db.session.commit()
+            chunks += 1
+    except Exception:
+        db.session.rollback()
+        raise
+    return {
+        'matched': len(keys),
+        'updated': updated,
+        'chunks': chunks,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _product_ids(category_ids=(), product_ids=()):
+    from app.models import Product, product_categories
+
+    query = select(Product.id)
+    if category_ids:
+        query = query.where(Product.id.in_(
+            select(product_categories.c.product_id)
+            .where(product_categories.c.category_id.in_(category_ids))
+        ))
+    if product_ids:
+        query = query.where(Product.id.in_(product_ids))
+    return db.session.execute(query.order_by(Product.id)).scalars().all()
+
+
+def _returning():
+    from app.models import Product
+    return Product.id, Product.price, Product.stock, Product.is_active
+
+
+def reprice_products(percent, category_ids=(), product_ids=(), chunk_size=None):
+    """
+    Reajusta em ``percent`` % (negativo para desconto) os preços dos produtos
+    das categorias e/ou ids informados (todos se nenhum filtro), arredondando
+    para centavos. Produtos cujo preço não muda não são contados.
+    """
+    from app.models import Product
+
+    percent = Decimal(str(percent))
+    if not percent.is_finite() or percent <= -100:
+        raise ValueError('O percentual deve ser um número maior que -100')
+    new_price = func.round(Product.price * (1 + percent / 100), 2)
+
+    def apply(ids, now):
+        rows = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(ids), new_price != Product.price)
+            .values(price=new_price, updated_at=now)
+            .returning(*_returning())
+            .execution_options(synchronize_session=False)
+        ).all()
+        _log_products(rows, ('price',))
+        return len(rows)
+
+    return _run_chunks(_product_ids(category_ids, product_ids), apply, chunk_size)
+
+
+def set_products_active(active, category_ids=(), product_ids=(), chunk_size=None):
+    """Ativa ou desativa os produtos selecionados"""
+    from app.models import Product
+
+    def apply(ids, now):
+        rows = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(ids), Product.is_active != active)
+            .values(is_active=active, updated_at=now)
+            .returning(*_returning())
+            .execution_options(synchronize_session=False)
+        ).all()
+        _log_products(rows, ('is_active',))
+        return len(rows)
+
+    return _run_chunks(_product_ids(category_ids, product_ids), apply, chunk_size)
+
+
+def parse_stock_csv(data):
+    """
+    {sku: estoque} de um CSV com colunas ``sku`` e ``stock`` (ou ``estoque``,
+    como no export do admin). Retorna (linhas, erros).
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(data))
+    columns = {name.strip().lower(): name for name in reader.fieldnames or ()}
+    sku_column = columns.get('sku')
+    stock_column = columns.get('stock') or columns.get('estoque')
+    if sku_column is None or stock_column is None:
+        return {}, ['O CSV precisa das colunas "sku" e "stock"']
+
+    rows, errors = {}, []
+    for line, record in enumerate(reader, start=2):
+        sku = (record.get(sku_column) or '').strip()
+        value = (record.get(stock_column) or '').strip()
+        try:
+            stock = int(Decimal(value))
+        except (InvalidOperation, ValueError):
+            stock = None
+        if not sku or stock is None or stock < 0:
+            errors.append(f'Linha {line}: SKU ou estoque inválido')
+            continue
+        rows[sku] = stock
+    return rows, errors
+
+
+def set_stock(stock_by_sku, chunk_size=None):
+    """
+    Define o estoque por SKU: por lote, uma consulta IN para resolver os SKUs
+    e um UPDATE com CASE. SKUs inexistentes voltam em ``unknown``.
+    """
+    from app.models import Product
+
+    unknown = []
+
+    def apply(skus, now):
+        current = db.session.execute(
+            select(Product.id, Product.sku, Product.stock).where(Product.sku.in_(skus))
+        ).all()
+        found = {sku for _, sku, _ in current}
+        unknown.extend(sku for sku in skus if sku not in found)
+        targets = {product_id: stock_by_sku[sku] for product_id, sku, stock in current
+                   if stock != stock_by_sku[sku]}
+        if not targets:
+            return 0
+        rows = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(targets))
+            .values(stock=case(targets, value=Product.id), updated_at=now)
+            .returning(*_returning())
+            .execution_options(synchronize_session=False)
+        ).all()
+        _log_products(rows, ('stock',))
+        return len(rows)
+
+    result = _run_chunks(sorted(stock_by_sku), apply, chunk_size)
+    result['unknown'] = unknown
+    return result
+
+
+def transition_orders(order_ids, status, chunk_size=None):
+    """
+    Muda para ``status`` os pedidos selecionados que estão em um status de
+    origem aceito (ORDER_TRANSITIONS); os demais são ignorados.
+    """
+    from app.models import Order
+
+    if status not in ORDER_TRANSITIONS:
+        raise ValueError(f'Status de destino inválido: {status}')
+    sources = ORDER_TRANSITIONS[status]
+
+    def apply(ids, now):
+        rows = db.session.execute(
+            update(Order)
+            .where(Order.id.in_(ids), Order.status.in_(sources))
+            .values(status=status, updated_at=now)
+            .returning(Order.user_id, Order.total)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if status == CANCELLED:
+            # Nenhuma origem é 'cancelled': todo pedido alterado sai do total gasto
+            spent = {}
+            for user_id, total in rows:
+                spent[user_id] = spent.get(user_id, 0) + total
+            connection = db.session.connection()
+            for user_id, total in spent.items():
+                apply_summary_delta(connection, user_id, spent=-total)
+        return len(rows)
+
+    return _run_chunks(sorted(set(order_ids)), apply, chunk_size)
+
+
+def describe_result(result):
+    """Resumo para flash/CLI"""
+    text = (f"{result['updated']} de {result['matched']} alterados "
+            f"em {result['chunks']} lote(s), {result['elapsed_ms']:.0f} ms")
+    if result.get('unknown'):
+        text += f" ({len(result['unknown'])} SKU(s) não encontrados)"
+    return text
@@ -0,0 +1,253 @@
+"""
+Armazenamento do carrinho no servidor - Fermarc E-commerce
+Desenvolvido por João Lion
+
+O cookie de sessão guarda apenas o ``cart_id``; os itens ficam em um
+backend plugável (tabelas ``carts``/``cart_items`` ou memória local do
+processo). Cada produto é uma linha: adicionar, alterar ou remover um item
+grava só aquela linha (``apply``), sem reescrever o carrinho inteiro a cada
+chamada AJAX; ``save`` substitui o carrinho todo (limpeza, login).
+"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, insert, delete, func
+
+from app import db
+
+
+class CartStore:
+    """Interface dos backends de carrinho"""
+
+    def load(self, cart_id):
+        """Retorna dict {product_id(str): quantidade}"""
+        raise NotImplementedError
+
+    def save(self, cart_id, items, user_id=None):
+        """Substitui todos os itens do carrinho"""
+        raise NotImplementedError
+
+    def apply(self, cart_id, changes, user_id=None):
+        """
+        Grava só as linhas alteradas: ``changes`` é {product_id(str):
+        quantidade}, com quantidade 0 para remover o produto
+        """
+        raise NotImplementedError
+
+    def count(self, cart_id):
+        """Quantidade de linhas do carrinho sem desserializar os itens"""
+        raise NotImplementedError
+
+    def delete(self, cart_id):
+        raise NotImplementedError
+
+    def find_user_cart(self, user_id):
+        """Retorna o cart_id associado ao usuário (ou None)"""
+        raise NotImplementedError
+
+    def owner(self, cart_id):
+        """user_id dono do carrinho (None se anônimo ou inexistente)"""
+        raise NotImplementedError
+
+    def purge(self, older_than):
+        """Remove carrinhos anônimos sem atualização desde ``older_than``"""
+        raise NotImplementedError
+
+
+class MemoryCartStore(CartStore):
+    """
+    Backend chave-valor local ao processo. Rápido, porém não é
+    compartilhado entre workers - indicado para desenvolvimento e testes.
+    """
+
+    def __init__(self):
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def load(self, cart_id):
+        entry = self._carts.get(cart_id)
+        return dict(entry['items']) if entry else {}
+
+    def save(self, cart_id, items, user_id=None):
+        with self._lock:
+            previous = self._carts.get(cart_id, {})
+            self._carts[cart_id] = {
+                'items': dict(items),
+                'user_id': user_id or previous.get('user_id'),
+                'updated_at': datetime.utcnow()
+            }
+
+    def apply(self, cart_id, changes, user_id=None):
+        with self._lock:
+            entry = self._carts.setdefault(cart_id, {'items': {}, 'user_id': None})
+            for product_id, quantity in changes.items():
+                if quantity > 0:
+                    entry['items'][product_id] = quantity
+                else:
+                    entry['items'].pop(product_id, None)
+            entry['user_id'] = user_id or entry['user_id']
+            entry['updated_at'] = datetime.utcnow()
+
+    def count(self, cart_id):
+        entry = self._carts.get(cart_id)
+        return len(entry['items']) if entry else 0
+
+    def delete(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def find_user_cart(self, user_id):
+        with self._lock:
+            for cart_id, entry in self._carts.items():
+                if entry['user_id'] == user_id:
+                    return cart_id
+        return None
+
+    def owner(self, cart_id):
+        entry = self._carts.get(cart_id)
+        return entry['user_id'] if entry else None
+
+    def purge(self, older_than):
+        with self._lock:
+            expired = [cid for cid, e in self._carts.items()
+                       if e['user_id'] is None and e['updated_at'] < older_than]
+            for cart_id in expired:
+                del self._carts[cart_id]
+        return len(expired)
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Backend nas tabelas ``carts`` (cabeçalho e contagem) e ``cart_items``
+    (uma linha por produto). Usa conexões próprias do engine para não
+    interferir na transação da sessão ORM da requisição.
+    """
+
+    @property
+    def table(self):
+        from app.models import Cart
+        return Cart.__table__
+
+    @property
+    def items_table(self):
+        from app.models import CartItem
+        return CartItem.__table__
+
+    def load(self, cart_id):
+        items = self.items_table
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(items.c.product_id, items.c.quantity).where(items.c.cart_id == cart_id)
+            )
+            return {str(product_id): quantity for product_id, quantity in rows}
+
+    def _touch(self, conn, cart_id, user_id, item_count=None):
+        """Atualiza (ou cria) o cabeçalho do carrinho"""
+        values = {'updated_at': datetime.utcnow()}
+        if user_id is not None:
+            values['user_id'] = user_id
+        if item_count is not None:
+            values['item_count'] = item_count
+        result = conn.execute(
+            update(self.table).where(self.table.c.id == cart_id).values(**values)
+        )
+        if result.rowcount == 0:
+            values.setdefault('item_count', 0)
+            conn.execute(insert(self.table).values(id=cart_id, **values))
+
+    def save(self, cart_id, items, user_id=None):
+        lines = self.items_table
+        with db.engine.begin() as conn:
+            self._touch(conn, cart_id, user_id, item_count=len(items))
+            conn.execute(delete(lines).where(lines.c.cart_id == cart_id))
+            if items:
+                conn.execute(insert(lines), [
+                    {'cart_id': cart_id, 'product_id': int(product_id), 'quantity': quantity}
+                    for product_id, quantity in items.items()
+                ])
+
+    def apply(self, cart_id, changes, user_id=None):
+        lines = self.items_table
+        with db.engine.begin() as conn:
+            self._touch(conn, cart_id, user_id)
+            for product_id, quantity in changes.items():
+                line = (lines.c.cart_id == cart_id) & (lines.c.product_id == int(product_id))
+                if quantity <= 0:
+                    conn.execute(delete(lines).where(line))
+                elif conn.execute(update(lines).where(line).values(quantity=quantity)).rowcount == 0:
+                    conn.execute(insert(lines).values(
+                        cart_id=cart_id, product_id=int(product_id), quantity=quantity
+                    ))
+            if changes:
+                conn.execute(
+                    update(self.table).where(self.table.c.id == cart_id).values(
+                        item_count=select(func.count()).select_from(lines)
+                        .where(lines.c.cart_id == cart_id).scalar_subquery()
+                    )
+                )
+
+    def count(self, cart_id):
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(self.table.c.item_count).where(self.table.c.id == cart_id)
+            ).scalar() or 0
+
+    def delete(self, cart_id):
+        lines = self.items_table
+        with db.engine.begin() as conn:
+            conn.execute(delete(lines).where(lines.c.cart_id == cart_id))
+            conn.execute(delete(self.table).where(self.table.c.id == cart_id))
+
+    def find_user_cart(self, user_id):
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(self.table.c.id)
+                .where(self.table.c.user_id == user_id)
+                .order_by(self.table.c.updated_at.desc())
+                .limit(1)
+            ).scalar()
+
+    def owner(self, cart_id):
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(self.table.c.user_id).where(self.table.c.id == cart_id)
+            ).scalar()
+
+    def purge(self, older_than):
+        lines = self.items_table
+        expired = select(self.table.c.id).where(
+            self.table.c.user_id.is_(None),
+            self.table.c.updated_at < older_than
+        )
+        with db.engine.begin() as conn:
+            conn.execute(delete(lines).where(lines.c.cart_id.in_(expired)))
+            return conn.execute(
+                delete(self.table).where(self.table.c.id.in_(expired))
+            ).rowcount
+
+
+CART_STORES = {
+    'database': DatabaseCartStore,
+    'memory': MemoryCartStore,
+}
+
+
+def init_cart_store(app):
+    """Instancia o backend configurado em CART_STORE e registra o flush por requisição"""
+    backend = app.config.get('CART_STORE', 'database')
+    if backend not in CART_STORES:
+        raise ValueError(f'CART_STORE inválido: {backend}')
+    app.extensions['cart_store'] = CART_STORES[backend]()
+
+    @app.after_request
+    def flush_cart(response):
+        from flask import session
+        from app.utils import CartService
+        CartService.flush(session)
+        return response
+
+
+def purge_expired_carts(app, days=30):
+    """Remove carrinhos anônimos abandonados há mais de ``days`` dias"""
+    older_than = datetime.utcnow() - timedelta(days=days)
+    return app.extensions['cart_store'].purge(older_than)
@@ -0,0 +1,210 @@
+"""
+Log de alterações do catálogo - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Toda inserção, alteração de preço/estoque/status e exclusão de produto feita
+pelo ORM (edit_product, checkout...) grava uma linha em
+``catalog_changes`` na mesma transação, pelos eventos do mapper. O ``id``
+da linha é a sequência que os consumidores (ERP, marketplaces, cache do
+app) guardam para pedir só o que veio depois: ``/api/changes?after=<seq>``.
+
+Cada linha traz os valores atuais de todos os campos monitorados, então a
+compactação (``flask compact-changes``) pode apagar as linhas antigas de um
+produto que já tem uma mais nova sem perder o estado final.
+
+No PostgreSQL a sequência é alocada antes do commit, e uma transação mais
+lenta poderia gravar um número menor depois que o consumidor já leu um
+maior. Por isso quem grava no log pega um advisory lock de transação: as
+gravações no log ficam serializadas e a ordem de commit segue a sequência.
+UPDATEs em massa via Core não disparam os eventos e devem chamar
+``record_changes`` explicitamente.
+
+O long-poll (``wait=``) ocupa a thread/greenlet da requisição durante a
+espera. Com o worker ``sync`` do gunicorn (um processo, uma requisição por
+vez) isso travaria o site inteiro, então a espera só é aceita quando o
+servidor atende requisições concorrentes: workers ``gthread`` (o Procfile
+usa ``--worker-class gthread``), gevent ou o servidor de desenvolvimento.
+Nos demais ``wait`` vira 0 e a chamada é um polling comum.
+"""
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, event, exists, func, insert, inspect, select, text
+from sqlalchemy.orm import aliased, object_session
+
+from app import db
+
+TRACKED_FIELDS = ('price', 'stock', 'is_active')
+
+# Chave arbitrária do pg_advisory_xact_lock do log
+ADVISORY_LOCK_KEY = 46460001
+
+
+def product_state(product):
+    """Valores atuais dos campos monitorados"""
+    return {
+        'price': float(product.price) if product.price is not None else None,
+        'stock': product.stock,
+        'is_active': product.is_active,
+    }
+
+
+def record_changes(connection, rows):
+    """
+    Grava no log, na conexão/transação informada.
+    ``rows``: [{'product_id': 1, 'op': 'update', 'data': {...}}]
+    """
+    from app.models import CatalogChange
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+    now = datetime.utcnow()
+    connection.execute(insert(CatalogChange.__table__),
+                       [dict(row, created_at=now) for row in rows])
+
+
+def _mark_session(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['catalog_changed'] = True
+
+
+def _after_insert(mapper, connection, target):
+    data = dict(product_state(target), changed=list(TRACKED_FIELDS))
+    record_changes(connection, [{'product_id': target.id, 'op': 'insert', 'data': data}])
+    _mark_session(target)
+
+
+def _after_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    changed = []
+    for name in TRACKED_FIELDS:
+        history = attrs[name].history
+        # Reatribuir o mesmo valor aparece no histórico, mas não é mudança
+        if history.has_changes() and list(history.added) != list(history.deleted):
+            changed.append(name)
+    if changed:
+        data = dict(product_state(target), changed=changed)
+        record_changes(connection, [{'product_id': target.id, 'op': 'update', 'data': data}])
+        _mark_session(target)
+
+
+def _after_delete(mapper, connection, target):
+    data = dict(product_state(target), is_active=False, changed=['is_active'])
+    record_changes(connection, [{'product_id': target.id, 'op': 'delete', 'data': data}])
+    _mark_session(target)
+
+
+class ChangeNotifier:
+    """Acorda os long-polls deste processo quando um commit grava no log"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._version = 0
+
+    def notify(self):
+        with self._condition:
+            self._version += 1
+            self._condition.notify_all()
+
+    def wait(self, timeout):
+        with self._condition:
+            version = self._version
+            self._condition.wait_for(lambda: self._version != version, timeout)
+
+
+change_notifier = ChangeNotifier()
+
+
+def _after_commit(session):
+    if session.info.pop('catalog_changed', False):
+        change_notifier.notify()
+
+
+def _after_rollback(session):
+    session.info.pop('catalog_changed', None)
+
+
+def register_change_events():
+    """Grava catalog_changes junto com as alterações de Product"""
+    from sqlalchemy.orm import Session
+    from app.models import Product
+
+    if not event.contains(Product, 'after_insert', _after_insert):
+        event.listen(Product, 'after_insert', _after_insert)
+        event.listen(Product, 'after_update', _after_update)
+        event.listen(Product, 'after_delete', _after_delete)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+
+
+def long_poll_supported(environ):
+    """O servidor WSGI atende outras requisições enquanto esta espera?"""
+    if environ.get('wsgi.multithread'):
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def head_sequence():
+    from app.models import CatalogChange
+    return db.session.execute(select(func.max(CatalogChange.id))).scalar() or 0
+
+
+def fetch_changes(after, limit, wait=0, poll_interval=1.0):
+    """
+    Alterações com sequência maior que ``after``. Sem resultados, espera até
+    ``wait`` segundos: acorda no commit deste processo ou a cada
+    ``poll_interval`` (commits de outros workers).
+    """
+    from app.models import CatalogChange
+
+    query = select(CatalogChange).where(CatalogChange.id > after) \
+        .order_by(CatalogChange.id).limit(limit)
+    deadline = time.monotonic() + wait
+    while True:
+        changes = db.session.execute(query).scalars().all()
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            return changes
+        db.session.close()  # devolve a conexão ao pool durante a espera
+        change_notifier.wait(min(remaining, poll_interval))
+
+
+def compact_changes(older_than):
+    """
+    Remove registros anteriores a ``older_than`` de produtos que têm um
+    registro mais novo. Retorna quantos foram removidos.
+    """
+    from app.models import CatalogChange
+
+    cutoff = db.session.execute(
+        select(func.max(CatalogChange.id)).where(CatalogChange.created_at < older_than)
+    ).scalar()
+    if cutoff is None:
+        return 0
+
+    newer = aliased(CatalogChange)
+    removed = db.session.execute(
+        delete(CatalogChange)
+        .where(
+            CatalogChange.id <= cutoff,
+            exists().where(newer.product_id == CatalogChange.product_id, newer.id > CatalogChange.id)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return removed
+
+
+def change_result(change):
+    return {
+        'seq': change.id,
+        'product_id': change.product_id,
+        'op': change.op,
+        'data': change.data,
+        'created_at': change.created_at.isoformat(),
+    }
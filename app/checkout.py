@@ -0,0 +1,119 @@
+"""
+Fechamento de pedidos - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Cálculo de totais e criação do pedido, compartilhados pelo checkout HTML
+(cart.checkout) e pela API JSON (cotação e pedido). ``place_order`` não faz
+commit: quem chama decide a transação (ver app/idempotency.py).
+"""
+from decimal import Decimal
+
+from app import db
+from app.coupons import PricedCart, coupon_engine, reserve_usage
+from app.models import Order, OrderItem
+from app.utils import generate_order_number, calculate_shipping
+
+
+def price_order(items, subtotal, zipcode, coupon_code=None, user_id=None):
+    """
+    Totais do pedido. Retorna dict com subtotal, shipping, tax, discount,
+    total, coupon (CompiledCoupon aplicado ou None) e coupon_message
+    (cupom recusado).
+    """
+    shipping = Decimal(str(calculate_shipping(zipcode, subtotal)))
+    tax = subtotal * Decimal('0.00')
+    discount = Decimal('0.00')
+    coupon = None
+    coupon_message = None
+
+    if coupon_code:
+        result = coupon_engine.evaluate(coupon_code, PricedCart(items, subtotal), user_id)
+        if result is None:
+            coupon_message = 'Cupom não encontrado'
+        elif result.valid:
+            coupon = result.coupon
+            discount = result.discount
+        else:
+            coupon_message = result.message
+
+    return {
+        'subtotal': subtotal,
+        'shipping': shipping,
+        'tax': tax,
+        'discount': discount,
+        'total': subtotal + shipping + tax - discount,
+        'coupon': coupon,
+        'coupon_message': coupon_message,
+    }
+
+
+def place_order(user_id, items, address, pricing, payment_method, notes=None):
+    """Cria o pedido, os itens e baixa o estoque (sem commit)"""
+    order = Order(
+        user_id=user_id,
+        order_number=generate_order_number(),
+        subtotal=pricing['subtotal'],
+        tax=pricing['tax'],
+        shipping=pricing['shipping'],
+        discount=pricing['discount'],
+        total=pricing['total'],
+        payment_method=payment_method,
+        shipping_street=address.street,
+        shipping_number=address.number,
+        shipping_complement=address.complement,
+        shipping_neighborhood=address.neighborhood,
+        shipping_city=address.city,
+        shipping_state=address.state,
+        shipping_zipcode=address.zipcode,
+        coupon_code=pricing['coupon'].code if pricing['coupon'] is not None else None,
+        notes=notes
+    )
+    db.session.add(order)
+
+    for item in items:
+        product = item['product']
+        db.session.add(OrderItem(
+            order=order,
+            product_id=product.id,
+            product_title=product.title,
+            product_sku=product.sku,
+            price=product.price,
+            quantity=item['quantity'],
+            subtotal=item['subtotal']
+        ))
+        product.stock -= item['quantity']
+
+    if pricing['coupon'] is not None and pricing['discount'] > 0:
+        reserve_usage(pricing['coupon'])  # CouponUnavailable se esgotou
+
+    db.session.flush()
+    return order
+
+
+def order_result(order):
+    """Corpo JSON guardado na chave de idempotência"""
+    return {
+        'order_id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'total': float(order.total),
+    }
+
+
+def cart_fingerprint_data(items, **fields):
+    """Conteúdo relevante para o fingerprint do checkout"""
+    return dict(
+        fields,
+        items=sorted((item['product'].id, item['quantity']) for item in items),
+    )
+
+
+def pricing_result(pricing):
+    """Totais em JSON (cotação da API)"""
+    result = {
+        name: float(pricing[name])
+        for name in ('subtotal', 'shipping', 'tax', 'discount', 'total')
+    }
+    result['coupon'] = pricing['coupon'].code if pricing['coupon'] is not None else None
+    result['coupon_message'] = pricing['coupon_message']
+    return result
@@ -0,0 +1,170 @@
+"""
+Compressão de respostas - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Middleware WSGI que comprime com brotli (se o pacote estiver instalado) ou
+gzip, conforme o Accept-Encoding do cliente. Só comprime respostas 200 com
+Content-Length (respostas em streaming passam direto), a partir de
+COMPRESS_MIN_SIZE bytes e com MIME em COMPRESS_MIMETYPES.
+
+Arquivos de app/static com irmão pré-comprimido (``arquivo.css.br`` /
+``arquivo.css.gz``, gerados por ``flask assets build``) são enviados
+direto do disco via send_file, sem recomprimir a cada requisição.
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+from werkzeug.datastructures import Headers
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+# (Content-Encoding, extensão do arquivo pré-comprimido), em ordem de preferência
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """{'gzip': 1.0, 'br': 0.8, ...} a partir do Accept-Encoding"""
+    result = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        result[name] = quality
+    return result
+
+
+def negotiate(header, available):
+    """Melhor codificação de ``available`` aceita pelo cliente, ou None"""
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def add_vary(headers, value='Accept-Encoding'):
+    current = [v.strip() for v in headers.get('Vary', '').split(',') if v.strip()]
+    if value.lower() not in (v.lower() for v in current) and '*' not in current:
+        headers['Vary'] = ', '.join(current + [value])
+
+
+class CompressionMiddleware:
+    """Comprime o corpo de respostas WSGI já completas"""
+
+    def __init__(self, app, min_size=500, mimetypes=(), level=6, br_level=4):
+        self.app = app
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.level = level
+        self.br_level = br_level
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def _is_compressible_type(self, headers):
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return mimetype in self.mimetypes
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers:
+            return False
+        if 'Content-Range' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        length = headers.get('Content-Length')
+        return length is not None and int(length) >= self.min_size
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.br_level)
+        return gzip.compress(body, compresslevel=self.level, mtime=0)
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        deferred = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if self._is_compressible_type(headers):
+                add_vary(headers)
+                if encoding and environ['REQUEST_METHOD'] != 'HEAD' \
+                        and self._should_compress(status, headers):
+                    deferred.update(status=status, headers=headers, exc_info=exc_info)
+                    return deferred.setdefault('chunks', []).append
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, capture_start_response)
+        if 'status' not in deferred:
+            return app_iter
+
+        chunks = deferred['chunks']
+        try:
+            chunks.extend(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        body = self.compress(b''.join(chunks), encoding)
+        headers = deferred['headers']
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(body))
+        # O corpo mudou: ETag forte vira fraca (continua valendo no If-None-Match)
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f'W/{etag}'
+        start_response(deferred['status'], headers.to_wsgi_list(), deferred['exc_info'])
+        return [body]
+
+
+def init_compression(app):
+    """Instala o middleware e a view de static com arquivos pré-comprimidos"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config.get('COMPRESS_MIN_SIZE', 500),
+        mimetypes=app.config.get('COMPRESS_MIMETYPES', ()),
+        level=app.config.get('COMPRESS_LEVEL', 6),
+        br_level=app.config.get('COMPRESS_BR_LEVEL', 4),
+    )
+
+    static_view = app.view_functions.get('static')
+    if static_view is None:
+        return
+
+    def static_precompressed(filename):
+        path = safe_join(app.static_folder, filename)
+        if path is not None:
+            available = [enc for enc, ext in PRECOMPRESSED if os.path.isfile(path + ext)]
+            encoding = negotiate(request.headers.get('Accept-Encoding', ''), available)
+            if encoding:
+                ext = dict(PRECOMPRESSED)[encoding]
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(
+                    app.static_folder, filename + ext, mimetype=mimetype,
+                    max_age=app.get_send_file_max_age(filename)
+                )
+                response.headers['Content-Encoding'] = encoding
+                add_vary(response.headers)
+                return response
+            if available:
+                response = static_view(filename=filename)
+                add_vary(response.headers)
+                return response
+        return static_view(filename=filename)
+
+    app.view_functions['static'] = static_precompressed
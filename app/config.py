@@ -8,10 +8,57 @@ from datetime import timedelta
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Perfis de engine do banco (ver app/database.py). Escolhido por DB_ENGINE_PROFILE.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # em KiB (64 MB)
+    'temp_store': 'MEMORY',
+}
+
+ENGINE_PROFILES = {
+    'default': {},
+    'development': {
+        'pool_pre_ping': False,
+        'statement_timeout_ms': 5000,
+        'sqlite_pragmas': SQLITE_PRAGMAS,
+    },
+    'production': {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000)),
+        'sqlite_pragmas': SQLITE_PRAGMAS,
+    },
+    # Consultas de relatório/exportação toleram mais tempo e menos conexões
+    'reporting': {
+        'pool_size': 3,
+        'max_overflow': 2,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 120000,
+        'sqlite_pragmas': SQLITE_PRAGMAS,
+    },
+}
+
 class Config:
     """Configuração base"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'default')
+    
+    # Réplicas de leitura (ver app/database.py): URIs separadas por vírgula
+    SQLALCHEMY_REPLICA_URIS = [u for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u]
+    READ_REPLICA_BLUEPRINTS = {'public', 'api'}
+    READ_REPLICA_ENDPOINTS = {'admin.dashboard', 'admin.export_products', 'admin.export_orders'}
+    # Leituras de dados do próprio usuário logo após escrevê-los. A janela de
+    # REPLICA_STICKY_SECONDS fica na sessão do site e não vale para tokens Bearer
+    READ_REPLICA_EXCLUDED_ENDPOINTS = {'api.cart', 'api.order_detail'}
+    REPLICA_STICKY_SECONDS = 10
+    REPLICA_HEALTH_INTERVAL = 5
     
     @staticmethod
     def validate_config(config_name='development'):
@@ -53,6 +100,103 @@ class Config:
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
     
+    # Hash de senhas: algoritmo/custo no formato do Werkzeug (ex.: 'scrypt:32768:8:1',
+    # 'pbkdf2:sha256:600000'). Hashes com parâmetros diferentes são refeitos no login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    # Pool de processos para o hash (0 = na própria thread da requisição)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    # Hashes simultâneos aceitos por worker antes de responder 503
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 8))
+    PASSWORD_HASH_TIMEOUT = 10
+    
+    # Rate limiting compartilhado entre os workers (arquivo SQLite em modo WAL).
+    # batch_interval > 0 agrupa os incrementos (limite aproximado, custo menor).
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or \
+        'sqlite:///' + os.path.join(basedir, '..', 'ratelimit.db')
+    RATELIMIT_STORAGE_OPTIONS = {
+        'batch_interval': float(os.environ.get('RATELIMIT_BATCH_INTERVAL', 0.05))
+    }
+    RATELIMIT_STRATEGY = 'sliding-window-counter'
+    
+    # Método de hash dos usuários de fixtures; None usa PASSWORD_HASH_METHOD.
+    # O hash barato fica só em desenvolvimento/testes (init-db também cria o
+    # admin de produção) e nunca vale para usuários is_admin
+    FIXTURE_PASSWORD_METHOD = os.environ.get('FIXTURE_PASSWORD_METHOD')
+    
+    # Backend do carrinho: 'database' (tabela carts) ou 'memory' (local ao processo)
+    CART_STORE = os.environ.get('CART_STORE', 'database')
+    
+    # Cache do usuário logado no user_loader (por processo); 0 desativa
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = 1024
+    
+    # Header X-SQL-Queries com o total de consultas da requisição
+    SQL_COUNTER_HEADER = False
+    
+    # Facetas de especificações no shop/API (ver app/attributes.py)
+    ATTRIBUTE_FACETS_MAX = 8
+    ATTRIBUTE_FACET_VALUES = 10
+    
+    # Autocomplete em memória: reconstrução periódica (alterações de outros workers)
+    AUTOCOMPLETE_REFRESH_SECONDS = 300
+    AUTOCOMPLETE_FEATURED_BOOST = 10
+    # Acima disto, produtos alterados de uma vez vão para a reconstrução em segundo plano
+    AUTOCOMPLETE_INCREMENTAL_LIMIT = 200
+    
+    # Cache de fragmentos de template ({% cache %}), LRU por processo
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_TTL = 300
+    FRAGMENT_CACHE_SIZE = 2048
+    
+    # Compressão gzip/brotli das respostas (ver app/compression.py)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BR_LEVEL = 4
+    COMPRESS_MIMETYPES = {
+        'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+        'application/javascript', 'application/json', 'application/xml',
+        'application/x-ndjson', 'image/svg+xml',
+    }
+    
+    # Sitemaps: URLs por shard (limite do protocolo: 50 mil) e cache em disco
+    SITEMAP_SHARD_SIZE = 50000
+    SITEMAP_CACHE_DIR = os.environ.get('SITEMAP_CACHE_DIR')  # padrão: instance/sitemaps
+    SITEMAP_INDEX_TTL = 300
+    # Base canônica das URLs dos sitemaps (ex.: https://www.fermarc.com.br);
+    # sem ela (e sem SERVER_NAME) os sitemaps não são gerados
+    SITEMAP_BASE_URL = os.environ.get('SITEMAP_BASE_URL')
+    
+    # jsonify com orjson quando instalado (ver app/json_provider.py)
+    JSON_FAST_PROVIDER = True
+    
+    # Produtos lidos por lote nos feeds em streaming (ver app/feeds.py)
+    FEED_BATCH_SIZE = 500
+    
+    # /api/changes (ver app/changes.py): página, espera máxima do long-poll
+    # (segundos) e idade a partir da qual o log é compactado (dias)
+    CHANGES_PAGE_SIZE = 500
+    CHANGES_MAX_WAIT = 25
+    CHANGES_RETENTION_DAYS = 7
+    
+    # Motor de cupons (ver app/coupons.py): intervalo de checagem da versão
+    # no banco e cache negativo de códigos inexistentes (segundos / entradas)
+    COUPON_VERSION_TTL = 30
+    COUPON_NEGATIVE_TTL = 300
+    COUPON_NEGATIVE_SIZE = 10000
+    
+    # Linhas por transação nas operações em massa do admin (ver app/bulk.py)
+    BULK_CHUNK_SIZE = 1000
+    
+    # Máximo de produtos por chamada em /api/products/batch
+    API_BATCH_MAX = 300
+    
+    # Validade dos tokens Bearer da API (ver app/api_auth.py), em segundos
+    API_TOKEN_MAX_AGE = int(os.environ.get('API_TOKEN_MAX_AGE', 30 * 24 * 3600))
+    
+    # Validade das chaves de idempotência do checkout (segundos)
+    IDEMPOTENCY_KEY_TTL = 24 * 3600
+    
     ITEMS_PER_PAGE = 12
     ADMIN_ITEMS_PER_PAGE = 20
     
@@ -79,19 +223,33 @@ class DevelopmentConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, '..', 'data.db')
     SESSION_COOKIE_SECURE = False
+    SQL_COUNTER_HEADER = True
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'development')
+    FIXTURE_PASSWORD_METHOD = os.environ.get('FIXTURE_PASSWORD_METHOD', 'pbkdf2:sha256:1000')
+    SITEMAP_BASE_URL = os.environ.get('SITEMAP_BASE_URL', 'http://localhost:5000')
 
 class ProductionConfig(Config):
     """Configuração de produção"""
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'production')
     
     if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace('postgres://', 'postgresql://', 1)
+    
+    SQLALCHEMY_REPLICA_URIS = [u.replace('postgres://', 'postgresql://', 1) for u in Config.SQLALCHEMY_REPLICA_URIS]
 
 class TestingConfig(Config):
     """Configuração para testes"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    FRAGMENT_CACHE_ENABLED = False
+    CART_STORE = 'memory'
+    PASSWORD_HASH_WORKERS = 0
+    FIXTURE_PASSWORD_METHOD = 'pbkdf2:sha256:1000'
+    SITEMAP_BASE_URL = 'http://localhost'
+    RATELIMIT_STORAGE_URI = 'memory://'
+    RATELIMIT_STORAGE_OPTIONS = {}
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
 
@@ -0,0 +1,330 @@
+"""
+Motor de regras de cupons - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Os cupons ativos e dentro da validade são compilados em um dict em memória
+(código -> CompiledCoupon), com datas, valores e regras já convertidos.
+Validar um código contra o carrinho não consulta o banco, exceto:
+
+- cupons com ``per_user_limit`` contam os pedidos do usuário (uma consulta);
+- cupons restritos a categorias leem as categorias dos itens do carrinho
+  (uma consulta IN, só quando o cupom tem essa regra).
+
+Códigos fora do dict (desconhecidos, inativos ou expirados) são procurados
+no banco uma vez e os desconhecidos entram em um cache negativo, para que
+robôs testando códigos não gerem uma consulta por tentativa.
+
+A tabela é recompilada quando a versão dos cupons muda: na hora para
+alterações feitas por este processo (eventos do mapper) e em até
+COUPON_VERSION_TTL segundos para as de outros workers (contagem + maior
+updated_at). Cada uso não invalida a tabela; o limite de uso é garantido no
+pedido por um UPDATE condicional (``reserve_usage``), que atualiza
+``updated_at`` (e a versão) quando o cupom esgota, para que a cotação
+passe a responder "Limite de uso atingido".
+
+Regras (coluna ``rules``, JSON), todas opcionais::
+
+    {"categories": [1, 2],          # desconto só sobre itens dessas categorias
+     "user_ids": [10, 11],          # cupom exclusivo desses usuários
+     "per_user_limit": 1,           # usos por usuário
+     "tiers": [{"min": "200", "value": "10"},   # valor por faixa de subtotal
+               {"min": "500", "value": "15"}]}
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from flask import current_app
+from sqlalchemy import case, event, func, select, update
+
+from app import db
+
+CENTS = Decimal('0.01')
+
+
+class CouponUnavailable(Exception):
+    """Cupom esgotado entre a cotação e o pedido"""
+
+
+class CouponResult:
+    __slots__ = ('coupon', 'valid', 'message', 'discount')
+
+    def __init__(self, coupon, valid, message, discount=Decimal('0.00')):
+        self.coupon = coupon
+        self.valid = valid
+        self.message = message
+        self.discount = discount
+
+
+def _decimal(value, default='0'):
+    return Decimal(str(value if value is not None else default))
+
+
+class CompiledCoupon:
+    """Cupom imutável com regras pré-processadas"""
+    __slots__ = (
+        'id', 'code', 'type', 'value', 'min_purchase', 'usage_limit', 'used_count',
+        'is_active', 'valid_from', 'valid_to', 'categories', 'user_ids',
+        'per_user_limit', 'tiers',
+    )
+
+    def __init__(self, coupon):
+        rules = coupon.rules or {}
+        self.id = coupon.id
+        self.code = coupon.code
+        self.type = coupon.type
+        self.value = _decimal(coupon.value)
+        self.min_purchase = _decimal(coupon.min_purchase)
+        self.usage_limit = coupon.usage_limit
+        self.used_count = coupon.used_count or 0
+        self.is_active = coupon.is_active
+        self.valid_from = coupon.valid_from
+        self.valid_to = coupon.valid_to
+        self.categories = frozenset(int(c) for c in rules.get('categories') or ())
+        self.user_ids = frozenset(int(u) for u in rules.get('user_ids') or ())
+        self.per_user_limit = rules.get('per_user_limit')
+        # Maior faixa primeiro
+        self.tiers = tuple(sorted(
+            ((_decimal(t['min']), _decimal(t['value'])) for t in rules.get('tiers') or ()),
+            reverse=True
+        ))
+
+    def _check(self, subtotal, user_id, now):
+        """Mensagem de erro ou None (mesmas mensagens de Coupon.is_valid)"""
+        if not self.is_active:
+            return 'Cupom inativo'
+        if self.valid_from and now < self.valid_from:
+            return 'Cupom ainda não válido'
+        if self.valid_to and now > self.valid_to:
+            return 'Cupom expirado'
+        if self.usage_limit and self.used_count >= self.usage_limit:
+            return 'Limite de uso atingido'
+        if subtotal < self.min_purchase:
+            return f'Compra mínima de R$ {self.min_purchase:.2f} necessária'
+        if self.user_ids and user_id not in self.user_ids:
+            return 'Cupom não disponível para esta conta'
+        if self.per_user_limit:
+            if user_id is None:
+                return 'Faça login para usar este cupom'
+            if user_coupon_uses(user_id, self.code) >= self.per_user_limit:
+                return 'Você já utilizou este cupom'
+        return None
+
+    def evaluate(self, cart, user_id=None, now=None):
+        """Valida e calcula o desconto para um PricedCart"""
+        message = self._check(cart.subtotal, user_id, now or datetime.utcnow())
+        if message:
+            return CouponResult(self, False, message)
+
+        eligible = cart.subtotal_in(self.categories) if self.categories else cart.subtotal
+        if eligible <= 0:
+            return CouponResult(self, False, 'Nenhum item do carrinho participa desta promoção')
+
+        value = self.value
+        if self.tiers:
+            for minimum, tier_value in self.tiers:
+                if eligible >= minimum:
+                    value = tier_value
+                    break
+            else:
+                lowest = self.tiers[-1][0]
+                return CouponResult(self, False, f'Compra mínima de R$ {lowest:.2f} necessária')
+
+        if self.type == 'percent':
+            discount = eligible * value / Decimal(100)
+        elif self.type == 'fixed':
+            discount = min(value, eligible)
+        else:
+            discount = Decimal('0.00')
+        discount = discount.quantize(CENTS, rounding=ROUND_HALF_UP)
+        return CouponResult(self, True, 'Cupom válido', discount)
+
+
+class PricedCart:
+    """Itens já precificados (CartService.get_cart_items) para avaliar cupons"""
+
+    def __init__(self, items, subtotal):
+        self.items = items
+        self.subtotal = _decimal(subtotal)
+        self._categories = None
+
+    def _product_categories(self):
+        from app.models import product_categories
+        if self._categories is None:
+            ids = [item['product'].id for item in self.items]
+            self._categories = {}
+            if ids:
+                rows = db.session.execute(
+                    select(product_categories.c.product_id, product_categories.c.category_id)
+                    .where(product_categories.c.product_id.in_(ids))
+                )
+                for product_id, category_id in rows:
+                    self._categories.setdefault(product_id, set()).add(category_id)
+        return self._categories
+
+    def subtotal_in(self, categories):
+        by_product = self._product_categories()
+        return sum(
+            (_decimal(item['subtotal']) for item in self.items
+             if by_product.get(item['product'].id, set()) & categories),
+            Decimal('0.00')
+        )
+
+
+def user_coupon_uses(user_id, code):
+    from app.models import Order
+    return db.session.execute(
+        select(func.count(Order.id)).where(Order.user_id == user_id, Order.coupon_code == code)
+    ).scalar()
+
+
+class CouponVersion:
+    """Mesmo esquema de CategoryVersion (app/fragment_cache.py)"""
+
+    def __init__(self):
+        self._value = None
+        self._checked_at = 0.0
+        self._local_changes = 0
+
+    def bump(self, *args):
+        self._local_changes += 1
+        self._checked_at = 0.0
+
+    def get(self):
+        from app.models import Coupon
+        ttl = current_app.config.get('COUPON_VERSION_TTL', 30)
+        if time.monotonic() - self._checked_at > ttl:
+            count, updated = db.session.execute(
+                select(func.count(Coupon.id), func.max(Coupon.updated_at))
+            ).one()
+            self._value = f'{count}-{updated}'
+            self._checked_at = time.monotonic()
+        return f'{self._value}-{self._local_changes}'
+
+
+coupon_version = CouponVersion()
+
+
+class CouponEngine:
+    """Tabela compilada de cupons + cache negativo de códigos desconhecidos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._coupons = {}
+        self._missing = OrderedDict()  # código -> expira_em
+
+    def _refresh(self):
+        from app.models import Coupon
+        version = coupon_version.get()
+        if version == self._version:
+            return
+        now = datetime.utcnow()
+        rows = Coupon.query.filter(
+            Coupon.is_active == True,
+            (Coupon.valid_to == None) | (Coupon.valid_to >= now)
+        ).all()
+        compiled = {coupon.code: CompiledCoupon(coupon) for coupon in rows}
+        with self._lock:
+            self._coupons = compiled
+            self._missing.clear()
+            self._version = version
+
+    def _is_missing(self, code):
+        expires_at = self._missing.get(code)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._missing.pop(code, None)
+            return False
+        return True
+
+    def _remember_missing(self, code):
+        ttl = current_app.config.get('COUPON_NEGATIVE_TTL', 300)
+        size = current_app.config.get('COUPON_NEGATIVE_SIZE', 10000)
+        with self._lock:
+            self._missing.pop(code, None)
+            self._missing[code] = time.monotonic() + ttl
+            while len(self._missing) > size:
+                self._missing.popitem(last=False)
+
+    def lookup(self, code):
+        """CompiledCoupon do código ou None se não existe"""
+        from app.models import Coupon
+        code = (code or '').strip().upper()
+        if not code:
+            return None
+        self._refresh()
+        coupon = self._coupons.get(code)
+        if coupon is not None:
+            return coupon
+        if self._is_missing(code):
+            return None
+        # Inativo/expirado (para a mensagem certa) ou cadastrado em outro worker
+        row = Coupon.query.filter_by(code=code).first()
+        if row is None:
+            self._remember_missing(code)
+            return None
+        return CompiledCoupon(row)
+
+    def evaluate(self, code, cart, user_id=None):
+        """CouponResult para o código ou None se o cupom não existe"""
+        coupon = self.lookup(code)
+        if coupon is None:
+            return None
+        return coupon.evaluate(cart, user_id)
+
+    def evict(self, code):
+        """Tira o código da tabela compilada; o próximo lookup lê o banco"""
+        with self._lock:
+            self._coupons.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._coupons = {}
+            self._missing.clear()
+
+
+coupon_engine = CouponEngine()
+
+
+def reserve_usage(coupon):
+    """
+    Incrementa used_count respeitando usage_limit (UPDATE condicional, sem
+    corrida entre pedidos simultâneos). Levanta CouponUnavailable se esgotado.
+
+    Usos comuns mantêm updated_at (não invalidam a tabela compilada); o uso
+    que atinge o limite o atualiza, e os outros workers recompilam em até
+    COUPON_VERSION_TTL segundos. Neste processo a versão muda na hora.
+    """
+    from app.models import Coupon
+    used = func.coalesce(Coupon.used_count, 0) + 1
+    exhausted = (Coupon.usage_limit != None) & (used >= Coupon.usage_limit)
+    row = db.session.execute(
+        update(Coupon)
+        .where(Coupon.id == coupon.id,
+               (Coupon.usage_limit == None) | (Coupon.used_count < Coupon.usage_limit))
+        .values(used_count=used,
+                updated_at=case((exhausted, datetime.utcnow()), else_=Coupon.updated_at))
+        .returning(Coupon.used_count, Coupon.usage_limit)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        # A tabela compilada ainda achava que havia usos disponíveis
+        coupon_engine.evict(coupon.code)
+        raise CouponUnavailable('Limite de uso do cupom atingido')
+    if row.usage_limit and row.used_count >= row.usage_limit:
+        coupon_version.bump()
+
+
+def register_coupon_events():
+    """Recompila os cupons quando um Coupon é alterado pelo ORM"""
+    from app.models import Coupon
+
+    if not event.contains(Coupon, 'after_update', coupon_version.bump):
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(Coupon, name, coupon_version.bump)
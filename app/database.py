@@ -0,0 +1,214 @@
+"""
+Engines do banco de dados - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Perfis de engine: converte o perfil nomeado em DB_ENGINE_PROFILE (ver
+ENGINE_PROFILES em app/config.py) em SQLALCHEMY_ENGINE_OPTIONS e aplica, a
+cada nova conexão, os PRAGMAs do SQLite ou o statement_timeout do PostgreSQL.
+No SQLite ``lower()`` é substituída por uma versão Unicode (a nativa só
+converte ASCII), usada pela busca de clientes e pelos índices em lower().
+
+Réplicas de leitura: RoutingSession envia as leituras de requisições GET
+dos blueprints/endpoints somente leitura para uma das réplicas em
+SQLALCHEMY_REPLICA_URIS. Escritas, flushes e requisições de um usuário que
+acabou de escrever (janela REPLICA_STICKY_SECONDS, guardada na sessão do
+site) ficam no primário. Clientes com token Bearer não mandam o cookie de
+sessão, então os endpoints que leem o que o próprio usuário acabou de
+gravar (READ_REPLICA_EXCLUDED_ENDPOINTS: carrinho e pedidos da API) sempre
+leem do primário. Uma réplica que não responde é ignorada por
+REPLICA_HEALTH_INTERVAL segundos.
+"""
+import itertools
+import threading
+import time
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_recycle', 'pool_timeout', 'pool_pre_ping')
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def build_engine_options(profile, uri):
+    """Monta SQLALCHEMY_ENGINE_OPTIONS para o perfil e a URI informados"""
+    if not uri:
+        return {}
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    options = {}
+
+    # SQLite em memória usa StaticPool, que não aceita dimensionamento
+    if not _is_sqlite_memory(url):
+        options.update({k: profile[k] for k in POOL_OPTIONS if k in profile})
+
+    timeout_ms = profile.get('statement_timeout_ms')
+    if backend == 'postgresql' and timeout_ms:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(timeout_ms)}'}
+    elif backend == 'sqlite':
+        # Tempo máximo de espera pelo lock antes de "database is locked"
+        options['connect_args'] = {'timeout': (timeout_ms or 5000) / 1000}
+
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Executa os PRAGMAs em toda conexão nova do engine"""
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def register_sqlite_functions(engine):
+    """lower() Unicode em toda conexão SQLite ('ÂNGELA' -> 'ângela', igual a str.lower)"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    def register(dbapi_connection, connection_record):
+        # deterministic: permitido em índices de expressão
+        dbapi_connection.create_function('lower', 1, _unicode_lower, deterministic=True)
+
+    event.listen(engine, 'connect', register)
+
+
+def configure_engine_profile(app):
+    """Chamado antes de db.init_app: define SQLALCHEMY_ENGINE_OPTIONS pelo perfil"""
+    from app.config import ENGINE_PROFILES
+
+    name = app.config.get('DB_ENGINE_PROFILE', 'default')
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f'DB_ENGINE_PROFILE inválido: {name}')
+    profile = ENGINE_PROFILES[name]
+
+    options = build_engine_options(profile, app.config.get('SQLALCHEMY_DATABASE_URI'))
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    return profile
+
+
+def init_engine_profile(app, db, profile):
+    """Chamado depois de db.init_app: registra PRAGMAs e funções no engine criado"""
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, profile.get('sqlite_pragmas'))
+        register_sqlite_functions(db.engine)
+
+
+class ReplicaRouter:
+    """Escolhe a réplica de leitura da requisição atual (round-robin)"""
+
+    def __init__(self):
+        self.engines = []
+        self.health_interval = 5
+        self._cycle = None
+        self._health = {}  # engine -> (saudável, verificado_em)
+        self._lock = threading.Lock()
+
+    def configure(self, engines, health_interval):
+        self.engines = list(engines)
+        self.health_interval = health_interval
+        self._cycle = itertools.cycle(self.engines)
+        self._health = {}
+
+    def _is_healthy(self, engine):
+        healthy, checked_at = self._health.get(engine, (True, 0.0))
+        if time.monotonic() - checked_at < self.health_interval:
+            return healthy
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            healthy = True
+        except Exception:
+            healthy = False
+        self._health[engine] = (healthy, time.monotonic())
+        return healthy
+
+    def pick(self):
+        """Engine de réplica para esta requisição, ou None para usar o primário"""
+        if not self.engines or not has_request_context() or not g.get('_db_use_replica'):
+            return None
+        if '_db_replica' not in g:
+            engine = None
+            with self._lock:
+                candidates = [next(self._cycle) for _ in self.engines]
+            for candidate in candidates:
+                if self._is_healthy(candidate):
+                    engine = candidate
+                    break
+            # Fixa a réplica durante a requisição (leituras consistentes)
+            g._db_replica = engine
+        return g._db_replica
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Session do Flask-SQLAlchemy que envia leituras para réplicas"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            writing = self._flushing or getattr(clause, 'is_dml', False)
+            if not writing:
+                engine = replica_router.pick()
+                if engine is not None:
+                    return engine
+            elif has_request_context():
+                g._db_wrote = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_read_replicas(app, profile):
+    """Cria os engines das réplicas e registra o roteamento por requisição"""
+    from flask import request, session
+
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    engines = []
+    for uri in uris:
+        engine = create_engine(uri, **build_engine_options(profile, uri))
+        apply_sqlite_pragmas(engine, profile.get('sqlite_pragmas'))
+        register_sqlite_functions(engine)
+        engines.append(engine)
+    replica_router.configure(engines, app.config.get('REPLICA_HEALTH_INTERVAL', 5))
+    app.extensions['db_replicas'] = engines
+
+    if not engines:
+        return
+
+    blueprints = app.config.get('READ_REPLICA_BLUEPRINTS', set())
+    endpoints = app.config.get('READ_REPLICA_ENDPOINTS', set())
+    excluded = app.config.get('READ_REPLICA_EXCLUDED_ENDPOINTS', set())
+    sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+    @app.before_request
+    def route_reads_to_replica():
+        if request.method not in ('GET', 'HEAD'):
+            return
+        if request.blueprint not in blueprints and request.endpoint not in endpoints:
+            return
+        if request.endpoint in excluded:
+            return
+        # Read-your-writes: após escrever, o usuário lê do primário por um tempo
+        if session.get('_db_primary_until', 0) > time.time():
+            return
+        g._db_use_replica = True
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if g.get('_db_wrote'):
+            session['_db_primary_until'] = int(time.time()) + sticky_seconds
+        return response
@@ -0,0 +1,140 @@
+"""
+Feeds de catálogo - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Catálogo inteiro em uma única resposta em streaming, para parceiros e
+marketplaces que hoje paginam /api/products:
+
+- ``/api/feed/products.ndjson``: um produto JSON por linha
+- ``/api/feed/products.xml``: RSS 2.0 no formato do Google Merchant Center
+
+Os produtos são lidos com yield_per (lotes de FEED_BATCH_SIZE, memória
+constante) e cada lote vira um pedaço da resposta. Com ``since=`` só saem
+os produtos alterados desde aquele instante; no NDJSON os desativados no
+período aparecem como ``{"id": 5, "active": false}`` para o parceiro
+removê-los. O header X-Feed-Snapshot traz o ``since`` da próxima chamada,
+em UTC com 'Z'; ``since`` com fuso é convertido para UTC.
+
+A compressão gzip é feita aqui, em streaming (o middleware de
+app/compression.py só comprime respostas completas).
+"""
+import zlib
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from flask import current_app, url_for
+
+XML_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+           '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n' \
+           '<title>{title}</title>\n<link>{link}</link>\n<description>{description}</description>\n'
+XML_CLOSE = '</channel>\n</rss>\n'
+XML_ITEM = '<item><g:id>{id}</g:id><title>{title}</title><link>{link}</link>' \
+           '<description>{description}</description><g:image_link>{image}</g:image_link>' \
+           '<g:price>{price:.2f} BRL</g:price><g:availability>{availability}</g:availability>' \
+           '<g:condition>new</g:condition><g:mpn>{sku}</g:mpn>{product_type}</item>\n'
+
+# Campos padrão de cada linha do NDJSON
+FEED_FIELDS = (
+    'id', 'title', 'slug', 'description', 'sku', 'price', 'stock', 'in_stock',
+    'images', 'featured', 'specifications', 'categories', 'updated_at',
+)
+XML_FIELDS = ('title', 'slug', 'description', 'sku', 'price', 'in_stock', 'main_image', 'categories')
+
+
+def parse_since(value):
+    """
+    Datetime UTC ingênuo (como updated_at no banco) do parâmetro since=
+    (ISO 8601) ou None; ValueError se inválido. Sem fuso, assume UTC
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_snapshot(value):
+    """Instante UTC ingênuo -> ISO 8601 com 'Z' explícito"""
+    return value.isoformat() + 'Z'
+
+
+def _products(fields, since, include_inactive=False):
+    """Produtos do feed em lotes, ordenados por (updated_at, id)"""
+    from app.models import Product
+    from app.serializers import product_serializer
+
+    options = product_serializer.load_options(fields, extra_columns=('is_active', 'updated_at'))
+    query = Product.query.options(*options)
+    if since is not None:
+        query = query.filter(Product.updated_at >= since)
+    if not include_inactive:
+        query = query.filter(Product.is_active == True)
+    return query.order_by(Product.updated_at, Product.id) \
+        .yield_per(current_app.config.get('FEED_BATCH_SIZE', 500))
+
+
+def _batches(rows, render):
+    """Junta as linhas renderizadas em pedaços de FEED_BATCH_SIZE"""
+    size = current_app.config.get('FEED_BATCH_SIZE', 500)
+    chunk = []
+    for row in rows:
+        chunk.append(render(row))
+        if len(chunk) >= size:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+
+def ndjson_feed(fields=FEED_FIELDS, since=None):
+    from app.serializers import product_serializer
+
+    dumps = current_app.json.dumps
+
+    def render(product):
+        if not product.is_active:
+            data = {'id': product.id, 'active': False, 'updated_at': product.updated_at.isoformat()}
+        else:
+            data = product_serializer.dump(product, fields)
+        return dumps(data, separators=(',', ':')) + '\n'
+
+    yield from _batches(_products(fields, since, include_inactive=since is not None), render)
+
+
+def xml_feed(since=None):
+    """Feed RSS do Google Merchant Center (só produtos ativos)"""
+    product_pattern = url_for('public.product_detail', slug='__slug__', _external=True)
+    image_base = url_for('static', filename='uploads/', _external=True)
+
+    def render(product):
+        category = escape(product.categories[0].name) if product.categories else ''
+        return XML_ITEM.format(
+            id=product.id,
+            title=escape(product.title),
+            link=escape(product_pattern.replace('__slug__', product.slug)),
+            description=escape(product.description or product.title),
+            image=escape(image_base + product.main_image),
+            price=product.price,
+            availability='in_stock' if product.in_stock else 'out_of_stock',
+            sku=escape(product.sku or ''),
+            product_type=f'<g:product_type>{category}</g:product_type>' if category else '',
+        )
+
+    yield XML_OPEN.format(
+        title='Fermarc Robótica',
+        link=escape(url_for('public.index', _external=True)),
+        description='Catálogo de produtos',
+    ).encode('utf-8')
+    yield from _batches(_products(XML_FIELDS, since), render)
+    yield XML_CLOSE.encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Comprime um iterável de bytes em um único stream gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
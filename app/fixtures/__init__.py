@@ -0,0 +1,224 @@
+"""
+Carga de fixtures em lote - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Popula o banco a partir de arquivos JSON/YAML usando ``insert()`` do core
+(executemany), hashes de senha calculados uma única vez por senha distinta
+e uma única transação. Usado por ``flask init-db`` e ``flask load-fixtures``
+para subir bancos de teste, CI e staging em segundos.
+"""
+import json
+import os
+
+from flask import current_app
+from sqlalchemy import bindparam, func, insert, select
+from werkzeug.security import generate_password_hash
+
+from app import db
+
+try:
+    import yaml
+except ImportError:  # PyYAML é opcional
+    yaml = None
+
+FIXTURES_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_FIXTURE = os.path.join(FIXTURES_DIR, 'default.json')
+
+# Ordem de carga respeita as chaves estrangeiras
+TABLE_ORDER = ('users', 'categories', 'products', 'coupons')
+
+
+def read_fixture_file(path):
+    """Lê um arquivo de fixtures (.json, .yml ou .yaml)"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yml', '.yaml')):
+            if yaml is None:
+                raise RuntimeError('PyYAML não instalado - use fixtures em JSON ou instale pyyaml')
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def _hash_passwords(rows):
+    """
+    Converte 'password' em 'password_hash', calculando cada hash uma vez.
+    Administradores sempre recebem o método normal (PASSWORD_HASH_METHOD).
+    """
+    default_method = current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+    fixture_method = current_app.config.get('FIXTURE_PASSWORD_METHOD') or default_method
+    hashes = {}
+    for row in rows:
+        password = row.pop('password', None)
+        if password is None:
+            continue
+        method = default_method if row.get('is_admin') else fixture_method
+        if (password, method) not in hashes:
+            hashes[password, method] = generate_password_hash(password, method=method)
+        row['password_hash'] = hashes[password, method]
+    return rows
+
+
+def _uniform_rows(table, rows):
+    """
+    executemany exige as mesmas chaves em todas as linhas: completa as
+    ausentes com o default da coluna (ou None)
+    """
+    keys = set()
+    for row in rows:
+        keys.update(row)
+
+    fill = {}
+    for key in keys:
+        default = table.c[key].default
+        if default is None:
+            fill[key] = None
+        elif default.is_callable:
+            fill[key] = default.arg(None)
+        else:
+            fill[key] = default.arg
+
+    return [{**fill, **row} for row in rows]
+
+
+def _table_is_empty(table):
+    return db.session.execute(select(func.count()).select_from(table)).scalar() == 0
+
+
+def _slug_map(table, key='slug'):
+    """Mapeia slug -> id com uma única consulta"""
+    column = table.c[key]
+    return dict(db.session.execute(select(column, table.c.id)).all())
+
+
+def _load_users(rows):
+    from app.models import User
+    from app.order_history import rebuild_summaries
+    rows = _hash_passwords([dict(r) for r in rows])
+    db.session.execute(insert(User.__table__), _uniform_rows(User.__table__, rows))
+    # O insert do core não dispara o evento que cria o resumo de pedidos
+    user_ids = db.session.execute(
+        select(User.id).where(User.email.in_([r['email'] for r in rows]))
+    ).scalars().all()
+    rebuild_summaries(db.session.connection(), user_ids)
+    return len(rows)
+
+
+def _load_categories(rows):
+    from app.models import Category
+    table = Category.__table__
+    rows = [dict(r) for r in rows]
+    parents = {r['slug']: r.pop('parent', None) for r in rows}
+    db.session.execute(insert(table), _uniform_rows(table, rows))
+
+    # Subcategorias referenciam o pai pelo slug
+    if any(parents.values()):
+        ids = _slug_map(table)
+        db.session.execute(
+            table.update().where(table.c.slug == bindparam('b_slug')).values(parent_id=bindparam('b_parent_id')),
+            [{'b_slug': slug, 'b_parent_id': ids[parent]} for slug, parent in parents.items() if parent]
+        )
+    return len(rows)
+
+
+def _load_products(rows):
+    from app.models import Product, ProductImage, ProductAttribute, Category, product_categories
+    from app.attributes import attribute_rows
+    from app.utils import slugify
+
+    table = Product.__table__
+    product_rows = []
+    links = []
+    images = []
+    for r in rows:
+        r = dict(r)
+        r.setdefault('slug', slugify(r['title']))
+        links.append((r['slug'], r.pop('categories', [])))
+        images.append((r['slug'], r.pop('images', [])))
+        specs = r.get('specifications')
+        if isinstance(specs, str):
+            r['specifications'] = json.loads(specs)
+        product_rows.append(r)
+
+    db.session.execute(insert(table), _uniform_rows(table, product_rows))
+
+    category_ids = _slug_map(Category.__table__)
+    product_ids = _slug_map(table)
+    link_rows = [
+        {'product_id': product_ids[slug], 'category_id': category_ids[cat]}
+        for slug, cats in links
+        for cat in cats
+        if cat in category_ids
+    ]
+    if link_rows:
+        db.session.execute(insert(product_categories), link_rows)
+
+    image_rows = [
+        {'product_id': product_ids[slug], 'position': position, 'path': path}
+        for slug, paths in images
+        for position, path in enumerate(paths)
+    ]
+    if image_rows:
+        db.session.execute(insert(ProductImage.__table__), _uniform_rows(ProductImage.__table__, image_rows))
+
+    # O insert do core não dispara os eventos do mapper que mantêm o índice
+    attribute_data = [
+        row
+        for r in product_rows
+        for row in attribute_rows(product_ids[r['slug']], r.get('specifications'))
+    ]
+    if attribute_data:
+        db.session.execute(insert(ProductAttribute.__table__), attribute_data)
+    return len(product_rows)
+
+
+def _load_coupons(rows):
+    from app.models import Coupon
+    rows = [dict(r, code=r['code'].upper()) for r in rows]
+    db.session.execute(insert(Coupon.__table__), _uniform_rows(Coupon.__table__, rows))
+    return len(rows)
+
+
+LOADERS = {
+    'users': _load_users,
+    'categories': _load_categories,
+    'products': _load_products,
+    'coupons': _load_coupons,
+}
+
+
+def load_fixtures(data, only_empty=True):
+    """
+    Carrega um conjunto de fixtures em uma única transação.
+    Com only_empty=True, tabelas que já possuem registros são ignoradas.
+    Retorna dict {tabela: linhas inseridas}.
+    """
+    from app.models import User, Category, Product, Coupon
+    tables = {
+        'users': User.__table__,
+        'categories': Category.__table__,
+        'products': Product.__table__,
+        'coupons': Coupon.__table__,
+    }
+
+    loaded = {}
+    try:
+        for name in TABLE_ORDER:
+            rows = data.get(name)
+            if not rows:
+                continue
+            if only_empty and not _table_is_empty(tables[name]):
+                continue
+            loaded[name] = LOADERS[name](rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return loaded
+
+
+def load_fixture_files(paths, only_empty=True):
+    """Lê e carrega vários arquivos de fixtures em uma única transação"""
+    data = {}
+    for path in paths:
+        for name, rows in read_fixture_file(path).items():
+            data.setdefault(name, []).extend(rows or [])
+    return load_fixtures(data, only_empty=only_empty)
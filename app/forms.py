@@ -4,9 +4,10 @@ Desenvolvido por João Lion
 """
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import StringField, PasswordField, TextAreaField, DecimalField, IntegerField, BooleanField, SelectField, SelectMultipleField
+from wtforms import StringField, PasswordField, TextAreaField, DecimalField, IntegerField, BooleanField, SelectField, SelectMultipleField, HiddenField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError, NumberRange
 from app.models import User, Product, Category
+from decimal import Decimal, InvalidOperation
 
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -70,6 +71,8 @@ class CheckoutForm(FlaskForm):
     ], validators=[DataRequired()])
     coupon_code = StringField('Cupom de desconto', validators=[Optional()])
     notes = TextAreaField('Observações', validators=[Optional()])
+    # Uma por carregamento da página; reenvios com a mesma chave não duplicam o pedido
+    idempotency_key = HiddenField()
 
 class ProductForm(FlaskForm):
     title = StringField('Título', validators=[DataRequired(), Length(max=200)])
@@ -106,6 +109,50 @@ class CouponForm(FlaskForm):
     min_purchase = DecimalField('Compra mínima', validators=[Optional(), NumberRange(min=0)], places=2, default=0)
     usage_limit = IntegerField('Limite de uso', validators=[Optional(), NumberRange(min=1)])
     is_active = BooleanField('Ativo', default=True)
+    
+    # Regras (ver app/coupons.py)
+    categories = SelectMultipleField('Só para as categorias', coerce=int, validators=[Optional()])
+    user_emails = StringField('Exclusivo para (e-mails separados por vírgula)', validators=[Optional()])
+    per_user_limit = IntegerField('Usos por cliente', validators=[Optional(), NumberRange(min=1)])
+    tiers = TextAreaField('Faixas (uma por linha, "subtotal mínimo: valor")', validators=[Optional()])
+    
+    def _emails(self):
+        return [e.strip().lower() for e in (self.user_emails.data or '').split(',') if e.strip()]
+    
+    def _tiers(self):
+        tiers = []
+        for line in (self.tiers.data or '').splitlines():
+            if line.strip():
+                minimum, _, value = line.partition(':')
+                tiers.append({'min': str(Decimal(minimum.strip())), 'value': str(Decimal(value.strip()))})
+        return tiers
+    
+    def validate_user_emails(self, field):
+        emails = self._emails()
+        found = {u.email for u in User.query.filter(User.email.in_(emails))} if emails else set()
+        missing = [e for e in emails if e not in found]
+        if missing:
+            raise ValidationError(f'Usuários não encontrados: {", ".join(missing)}')
+    
+    def validate_tiers(self, field):
+        try:
+            self._tiers()
+        except InvalidOperation:
+            raise ValidationError('Use uma faixa por linha no formato "200: 10".')
+    
+    def rules(self):
+        """Dict para Coupon.rules (None sem regras)"""
+        rules = {}
+        if self.categories.data:
+            rules['categories'] = list(self.categories.data)
+        emails = self._emails()
+        if emails:
+            rules['user_ids'] = [u.id for u in User.query.filter(User.email.in_(emails))]
+        if self.per_user_limit.data:
+            rules['per_user_limit'] = self.per_user_limit.data
+        if self._tiers():
+            rules['tiers'] = self._tiers()
+        return rules or None
 
 class SearchForm(FlaskForm):
     q = StringField('Buscar', validators=[Optional()])
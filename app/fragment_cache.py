@@ -0,0 +1,172 @@
+"""
+Cache de fragmentos de template - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Extensão Jinja ``{% cache %}`` com backend LRU em memória (por processo)::
+
+    {% cache 'product-card', product.id, product.updated_at %}
+        ...
+    {% endcache %}
+
+    {% cache 'footer', ttl=3600 %}...{% endcache %}
+
+O primeiro argumento nomeia o fragmento (agrupa as métricas); os demais
+compõem a chave. Inclua na chave tudo que altera o HTML: ``updated_at`` do
+produto, ``category_version()`` para listas de categorias, o usuário para
+trechos que dependem do login. Nunca coloque dentro do bloco conteúdo por
+sessão, como ``csrf_token()``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event, func, select
+
+from app import db
+
+
+class FragmentCache:
+    """LRU com TTL por entrada e contadores de acerto por fragmento"""
+
+    def __init__(self):
+        self.enabled = True
+        self.default_ttl = 300
+        self.max_entries = 2048
+        self._entries = OrderedDict()  # chave -> (expira_em, html)
+        self._lock = threading.Lock()
+        self._stats = {}  # nome -> [hits, misses]
+
+    def configure(self, enabled, default_ttl, max_entries):
+        self.enabled = enabled
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.clear()
+
+    def _count(self, name, hit):
+        counters = self._stats.setdefault(name, [0, 0])
+        counters[0 if hit else 1] += 1
+
+    def get(self, name, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            self._count(name, entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key, html, ttl=None):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def stats(self):
+        """{fragmento: {'hits', 'misses', 'hit_rate'}} + total de entradas"""
+        with self._lock:
+            fragments = {
+                name: {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                }
+                for name, (hits, misses) in sorted(self._stats.items())
+            }
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'fragments': fragments}
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache nome, parte1, parte2, ttl=segundos %}...{% endcache %}``"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        ttl = nodes.Const(None)
+        while parser.stream.skip_if('comma'):
+            if parser.stream.current.test('name:ttl') and parser.stream.look().test('assign'):
+                next(parser.stream)
+                next(parser.stream)
+                ttl = parser.parse_expression()
+                break
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        location = nodes.Const(f'{parser.name}:{lineno}')
+        call = self.call_method('_render', [location, nodes.List(parts), ttl])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, location, parts, ttl, caller):
+        if not fragment_cache.enabled:
+            return caller()
+        name = str(parts[0])
+        key = '\x1f'.join([location, *map(str, parts)])
+        html = fragment_cache.get(name, key)
+        if html is None:
+            html = str(caller())
+            fragment_cache.set(key, html, ttl)
+        return Markup(html)
+
+
+class CategoryVersion:
+    """
+    Versão das categorias para chaves de cache. Alterações feitas neste
+    processo (eventos do mapper) valem na hora; as de outros workers são
+    lidas do banco no máximo a cada ``ttl`` segundos.
+    """
+
+    def __init__(self, ttl=5):
+        self.ttl = ttl
+        self._value = None
+        self._checked_at = 0.0
+        self._local_changes = 0
+
+    def bump(self, *args):
+        self._local_changes += 1
+        self._checked_at = 0.0
+
+    def get(self):
+        from app.models import Category
+        if time.monotonic() - self._checked_at > self.ttl:
+            count, updated = db.session.execute(
+                select(func.count(Category.id), func.max(Category.updated_at))
+            ).one()
+            self._value = f'{count}-{updated}'
+            self._checked_at = time.monotonic()
+        return f'{self._value}-{self._local_changes}'
+
+
+category_version = CategoryVersion()
+
+
+def init_fragment_cache(app):
+    """Registra a extensão Jinja, a versão das categorias e o LRU configurado"""
+    from app.models import Category
+
+    fragment_cache.configure(
+        app.config.get('FRAGMENT_CACHE_ENABLED', True),
+        app.config.get('FRAGMENT_CACHE_TTL', 300),
+        app.config.get('FRAGMENT_CACHE_SIZE', 2048),
+    )
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['category_version'] = category_version.get
+
+    if not event.contains(Category, 'after_update', category_version.bump):
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(Category, name, category_version.bump)
@@ -0,0 +1,109 @@
+"""
+Chaves de idempotência - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Protege operações que não podem ser repetidas (checkout) contra duplo
+clique e reenvio do navegador/app. O cliente manda uma chave única por
+tentativa (campo oculto do formulário ou header ``Idempotency-Key``); a
+primeira execução grava o resultado em ``idempotency_keys`` na mesma
+transação do pedido, e as repetições recebem esse resultado sem recalcular
+preços, inserir linhas ou baixar estoque.
+
+A chave é reservada (flush) antes do trabalho: uma requisição concorrente
+com a mesma chave esbarra na constraint única, espera o commit da primeira
+e devolve o resultado dela.
+"""
+import hashlib
+import json
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+KEY_MAX_LENGTH = 64
+
+
+class IdempotencyConflict(Exception):
+    """Chave reutilizada com conteúdo diferente - o chamador deve responder 422"""
+
+
+def new_key():
+    return secrets.token_urlsafe(24)
+
+
+def request_fingerprint(data):
+    """Hash estável do conteúdo relevante da requisição"""
+    payload = json.dumps(data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def valid_key(key):
+    return bool(key) and len(key) <= KEY_MAX_LENGTH
+
+
+def find_result(user_id, scope, key, fingerprint=None):
+    """Registro concluído e não expirado para a chave, ou None"""
+    from app.models import IdempotencyKey
+    record = IdempotencyKey.query.filter_by(user_id=user_id, scope=scope, key=key).first()
+    if record is None or record.expires_at <= datetime.utcnow():
+        return None
+    if fingerprint is not None and record.fingerprint != fingerprint:
+        raise IdempotencyConflict()
+    return record
+
+
+def run_once(user_id, scope, key, fingerprint, func):
+    """
+    Executa ``func() -> (status, corpo_json)`` uma única vez por chave.
+    ``func`` trabalha na sessão sem fazer commit; o commit grava o resultado
+    e o trabalho juntos. Se ``func`` levantar exceção nada é gravado e a
+    chave pode ser usada de novo.
+
+    Retorna (status, corpo, repetida).
+    """
+    from app.models import IdempotencyKey
+
+    record = find_result(user_id, scope, key, fingerprint)
+    if record is not None:
+        return record.response_code, record.response_body, True
+
+    # Registro expirado com a mesma chave: libera para a nova execução
+    IdempotencyKey.query.filter_by(user_id=user_id, scope=scope, key=key).delete()
+
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', 24 * 3600)
+    record = IdempotencyKey(
+        user_id=user_id, scope=scope, key=key, fingerprint=fingerprint,
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+    )
+    try:
+        db.session.add(record)
+        db.session.flush()
+
+        status, body = func()
+        record.response_code = status
+        record.response_body = body
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição com a mesma chave concluiu primeiro
+        db.session.rollback()
+        record = find_result(user_id, scope, key, fingerprint)
+        if record is None:
+            raise
+        return record.response_code, record.response_body, True
+    except Exception:
+        db.session.rollback()
+        raise
+    return status, body, False
+
+
+def purge_expired_keys():
+    """Remove chaves expiradas; retorna quantas"""
+    from app.models import IdempotencyKey
+    removed = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,134 @@
+"""
+Cache de identidade do usuário logado - Fermarc E-commerce
+Desenvolvido por João Lion
+
+O user_loader do Flask-Login roda em toda requisição autenticada (inclusive
+nas chamadas AJAX do carrinho). Aqui ele passa a devolver um snapshot
+imutável do usuário, guardado em um cache por processo com TTL. A entrada
+é invalidada pelos eventos do mapper de ``User`` sempre que o usuário é
+alterado ou removido pelo ORM; o TTL limita o tempo em que outros workers
+podem ver dados antigos.
+"""
+import threading
+import time
+
+from flask import current_app, g
+from flask_login import UserMixin
+
+from app import db
+
+SNAPSHOT_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'avatar', 'is_admin', 'active', 'email_verified'
+)
+
+
+class UserSnapshot(UserMixin):
+    """
+    Cópia compacta e somente leitura do usuário para o ``current_user``.
+    Atributos fora do snapshot (addresses, orders, check_password...) são
+    delegados ao modelo ORM, carregado sob demanda uma vez por requisição.
+    """
+    __slots__ = SNAPSHOT_FIELDS
+
+    def __init__(self, user):
+        for field in SNAPSHOT_FIELDS:
+            value = user.is_active if field == 'active' else getattr(user, field)
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('UserSnapshot é imutável - altere current_user.model')
+
+    @property
+    def is_active(self):
+        return bool(self.active)
+
+    @property
+    def full_name(self):
+        if self.first_name and self.last_name:
+            return f"{self.first_name} {self.last_name}"
+        return self.username
+
+    @property
+    def model(self):
+        """Instância ORM de ``User`` (uma consulta por requisição)"""
+        from app.models import User
+        cached = g.get('_current_user_model')
+        if cached is None or cached.id != self.id:
+            cached = g._current_user_model = db.session.get(User, self.id)
+        return cached
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+class IdentityCache:
+    """Cache LRU simples com TTL: user_id -> UserSnapshot"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            self.invalidate(user_id)
+            return None
+        return snapshot
+
+    def put(self, user_id, snapshot):
+        ttl = current_app.config.get('USER_CACHE_TTL', 60)
+        max_size = current_app.config.get('USER_CACHE_SIZE', 1024)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic() + ttl, snapshot)
+            while len(self._entries) > max_size:
+                self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, user_id):
+        """Retorna o snapshot do cache ou carrega do banco"""
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        from app.models import User
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user)
+        if current_app.config.get('USER_CACHE_TTL', 60) > 0:
+            self.put(user_id, snapshot)
+        return snapshot
+
+
+identity_cache = IdentityCache()
+
+
+def _invalidate_user(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+
+
+def register_identity_events():
+    """Invalida o cache sempre que um User é alterado ou removido pelo ORM"""
+    from sqlalchemy import event
+    from app.models import User
+
+    if not event.contains(User, 'after_update', _invalidate_user):
+        event.listen(User, 'after_update', _invalidate_user)
+        event.listen(User, 'after_delete', _invalidate_user)
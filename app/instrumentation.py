@@ -0,0 +1,32 @@
+"""
+Instrumentação de requisições - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Contador de comandos SQL por requisição, exposto no header
+``X-SQL-Queries`` quando SQL_COUNTER_HEADER está ativo. Usado para medir
+o efeito de caches e otimizações de consulta.
+"""
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._sql_queries = g.get('_sql_queries', 0) + 1
+
+
+def sql_query_count():
+    """Quantidade de comandos SQL executados na requisição atual"""
+    return g.get('_sql_queries', 0)
+
+
+def init_sql_counter(app):
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.after_request
+    def add_sql_counter_header(response):
+        if app.config.get('SQL_COUNTER_HEADER'):
+            response.headers['X-SQL-Queries'] = str(sql_query_count())
+        return response
@@ -0,0 +1,62 @@
+"""
+Provider JSON do Flask com orjson - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Quando o pacote orjson está instalado (e JSON_FAST_PROVIDER está ativo),
+``jsonify`` e ``app.json`` passam a usar orjson, que serializa listas de
+produtos bem mais rápido que o módulo json da biblioteca padrão. Tipos que o
+orjson não conhece (Decimal, datetime...) passam pelo mesmo ``default`` do
+provider padrão, então a saída é equivalente; só deixa de escapar
+caracteres não-ASCII (UTF-8 direto, payload menor).
+
+Chamadas com argumentos específicos do módulo json (``cls=``, etc.) caem
+no provider padrão.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # opcional
+    orjson = None
+
+# Argumentos de json.dumps que o orjson consegue reproduzir
+SUPPORTED_DUMP_ARGS = frozenset({'default', 'sort_keys', 'indent', 'separators', 'ensure_ascii'})
+
+
+class OrjsonProvider(DefaultJSONProvider):
+
+    def _options(self, kwargs):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _dumps_bytes(self, obj, kwargs):
+        return orjson.dumps(obj, default=kwargs.get('default', self.default),
+                            option=self._options(kwargs))
+
+    def dumps(self, obj, **kwargs):
+        if not SUPPORTED_DUMP_ARGS.issuperset(kwargs):
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj, kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Como o padrão, mas monta o corpo direto em bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        return self._app.response_class(self._dumps_bytes(obj, dump_args) + b'\n',
+                                        mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    if orjson is not None and app.config.get('JSON_FAST_PROVIDER', True):
+        app.json = OrjsonProvider(app)
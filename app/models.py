@@ -4,18 +4,29 @@ Desenvolvido por João Lion
 """
 from app import db, login_manager
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import password_hasher
 from datetime import datetime
 from decimal import Decimal
-import json
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON nativo; JSONB no PostgreSQL
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
 
 product_categories = db.Table('product_categories',
     db.Column('product_id', db.Integer, db.ForeignKey('products.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True),
+    # Filtro por categoria (a PK só cobre buscas por product_id)
+    db.Index('ix_product_categories_category', 'category_id', 'product_id')
 )
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Busca de clientes por prefixo no admin (ver app/admin_orders.py)
+        db.Index('ix_users_email_lower', db.text('lower(email)')),
+        db.Index('ix_users_first_name_lower', db.text('lower(first_name)')),
+        db.Index('ix_users_last_name_lower', db.text('lower(last_name)')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -36,12 +47,16 @@ class User(UserMixin, db.Model):
     
     addresses = db.relationship('Address', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     orders = db.relationship('Order', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    order_summary = db.relationship('UserOrderSummary', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     @property
     def full_name(self):
@@ -49,15 +64,25 @@ class User(UserMixin, db.Model):
             return f"{self.first_name} {self.last_name}"
         return self.username
     
+    @property
+    def model(self):
+        """Compatível com UserSnapshot.model (ver app/identity.py)"""
+        return self
+    
     def __repr__(self):
         return f'<User {self.username}>'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from app.identity import identity_cache
+    return identity_cache.load(int(user_id))
 
 class Address(db.Model):
     __tablename__ = 'addresses'
+    __table_args__ = (
+        # Endereço padrão consultado em toda visualização do carrinho
+        db.Index('ix_addresses_user_default', 'user_id', 'is_default'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -76,6 +101,31 @@ class Address(db.Model):
     def __repr__(self):
         return f'<Address {self.street}, {self.number}>'
 
+class Cart(db.Model):
+    """Carrinho persistido no servidor; o cookie guarda apenas o id"""
+    __tablename__ = 'carts'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    
+    item_count = db.Column(db.Integer, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<Cart {self.id}>'
+
+class CartItem(db.Model):
+    """Uma linha do carrinho: alterar um item grava só esta linha"""
+    __tablename__ = 'cart_items'
+    
+    cart_id = db.Column(db.String(32), db.ForeignKey('carts.id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<CartItem {self.cart_id}:{self.product_id} x {self.quantity}>'
+
 class Category(db.Model):
     __tablename__ = 'categories'
     
@@ -98,6 +148,15 @@ class Category(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Vitrine (index) e ordenações do shop; no PostgreSQL são parciais (só ativos)
+        db.Index('ix_products_active_featured', 'is_active', 'featured',
+                 postgresql_where=db.text('is_active')),
+        db.Index('ix_products_active_created', 'is_active', 'created_at',
+                 postgresql_where=db.text('is_active')),
+        db.Index('ix_products_active_price', 'is_active', 'price',
+                 postgresql_where=db.text('is_active')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -108,12 +167,11 @@ class Product(db.Model):
     price = db.Column(db.Numeric(10, 2), nullable=False)
     stock = db.Column(db.Integer, default=0)
     
-    images_json = db.Column(db.Text)
-    
     featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     
-    specifications = db.Column(db.Text)
+    # Dict {nome: valor}; desserializado uma vez na carga da instância
+    specifications = db.Column(JSONType)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -121,22 +179,28 @@ class Product(db.Model):
     categories = db.relationship('Category', secondary=product_categories, backref='products')
     order_items = db.relationship('OrderItem', backref='product', lazy='dynamic')
     
+    # Carregada em lote (uma consulta IN por listagem) e ordenada por posição
+    gallery = db.relationship('ProductImage', backref='product', lazy='selectin',
+                              order_by='ProductImage.position',
+                              cascade='all, delete-orphan')
+    
     def get_images(self):
-        if self.images_json:
-            try:
-                return json.loads(self.images_json)
-            except (json.JSONDecodeError, TypeError):
-                return []
-        return []
+        return [image.path for image in self.gallery]
     
     def set_images(self, value):
-        self.images_json = json.dumps(value)
+        """Substitui a galeria mantendo as imagens já cadastradas"""
+        existing = {image.path: image for image in self.gallery}
+        gallery = []
+        for position, path in enumerate(value):
+            image = existing.get(path) or ProductImage(path=path)
+            image.position = position
+            gallery.append(image)
+        self.gallery = gallery
     
     @property
     def main_image(self):
-        imgs = self.get_images()
-        if imgs and isinstance(imgs, list) and len(imgs) > 0:
-            return imgs[0]
+        if self.gallery:
+            return self.gallery[0].path
         return 'default-product.png'
     
     @property
@@ -146,8 +210,55 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.title}>'
 
+class ProductImage(db.Model):
+    __tablename__ = 'product_images'
+    __table_args__ = (
+        db.Index('ix_product_images_product_position', 'product_id', 'position'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    path = db.Column(db.String(255), nullable=False)
+    
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    # Variações geradas a partir da original, ex.: {"thumb": "products/x_thumb.webp"}
+    derivatives = db.Column(JSONType)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ProductImage {self.path}>'
+
+class ProductAttribute(db.Model):
+    """Especificações indexadas para filtros e facetas (ver app/attributes.py)"""
+    __tablename__ = 'product_attributes'
+    __table_args__ = (
+        # Filtro por valor exato, faixa numérica e contagem de facetas
+        db.Index('ix_product_attributes_key_value', 'key', 'value_norm', 'product_id'),
+        db.Index('ix_product_attributes_key_num', 'key', 'value_num', 'product_id'),
+    )
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    
+    label = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    value_norm = db.Column(db.String(255), nullable=False)
+    value_num = db.Column(db.Float)
+    
+    def __repr__(self):
+        return f'<ProductAttribute {self.key}={self.value_norm}>'
+
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Dashboard/listagem do admin e histórico do cliente
+        db.Index('ix_orders_status_created', 'status', 'created_at'),
+        db.Index('ix_orders_created_at', 'created_at'),
+        db.Index('ix_orders_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -186,6 +297,11 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order', 'order_id'),
+        # Produtos mais vendidos no dashboard
+        db.Index('ix_order_items_product', 'product_id', 'quantity'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -219,7 +335,11 @@ class Coupon(db.Model):
     valid_from = db.Column(db.DateTime)
     valid_to = db.Column(db.DateTime)
     
+    # Regras extras (categorias, usuários, faixas) - ver app/coupons.py
+    rules = db.Column(JSONType)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def is_valid(self, order_subtotal=0):
         now = datetime.utcnow()
@@ -250,3 +370,64 @@ class Coupon(db.Model):
     
     def __repr__(self):
         return f'<Coupon {self.code}>'
+
+class IdempotencyKey(db.Model):
+    """Resultado da primeira execução de uma requisição com chave de idempotência"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'scope', 'key', name='uq_idempotency_keys_user_scope_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    scope = db.Column(db.String(30), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    
+    # Hash do conteúdo da requisição: mesma chave com outro conteúdo é recusada
+    fingerprint = db.Column(db.String(64), nullable=False)
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(JSONType)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope}:{self.key}>'
+
+class CatalogChange(db.Model):
+    """
+    Log append-only de alterações de preço/estoque/status dos produtos
+    (ver app/changes.py). ``id`` é o número de sequência lido pelos clientes.
+    """
+    __tablename__ = 'catalog_changes'
+    __table_args__ = (
+        # Compactação: último registro de cada produto
+        db.Index('ix_catalog_changes_product', 'product_id', 'id'),
+    )
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # Sem FK: o registro da exclusão continua no log depois que o produto some
+    product_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # insert, update, delete
+    # Valores atuais dos campos monitorados e a lista dos que mudaram
+    data = db.Column(JSONType, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<CatalogChange {self.id} {self.op} product={self.product_id}>'
+
+class UserOrderSummary(db.Model):
+    """
+    Totais de pedidos por cliente, mantidos incrementalmente pelos eventos
+    de Order (ver app/order_history.py).
+    """
+    __tablename__ = 'user_order_summaries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    # Soma dos totais dos pedidos não cancelados
+    total_spent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    last_order_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<UserOrderSummary {self.user_id}: {self.order_count}>'
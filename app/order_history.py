@@ -0,0 +1,208 @@
+"""
+Histórico de pedidos do cliente - Fermarc E-commerce
+Desenvolvido por João Lion
+
+A página "Meus pedidos" usa paginação por cursor em (created_at, id), do
+mais recente para o mais antigo: cada página é uma consulta com LIMIT sobre
+o índice ix_orders_user_created, sem OFFSET nem COUNT, então o custo não
+cresce com o número de pedidos do cliente. Os itens da página são lidos em
+uma única consulta IN (``Order.items`` é dinâmica e não aceita eager load).
+
+O resumo do cliente (pedidos, total gasto, último pedido) fica em
+``user_order_summaries`` e é atualizado incrementalmente pelos eventos do
+mapper de Order, na mesma transação do pedido. Mudanças via Core (ver
+app/bulk.py) chamam ``apply_summary_delta``. A linha nasce zerada com o
+cliente (evento de User, carga de fixtures, migração); se ainda assim
+faltar, ela é criada zerada antes do delta - nunca recalculada no meio do
+flush, em que os INSERTs em lote de pedidos já estão todos no banco antes
+dos eventos. ``flask rebuild-order-summaries`` recalcula todas.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only
+
+from app import db
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+# Pedidos cancelados não contam no total gasto
+CANCELLED = 'cancelled'
+
+
+def encode_cursor(order):
+    return f'{order.created_at.strftime(CURSOR_FORMAT)}-{order.id}'
+
+
+def decode_cursor(value):
+    """(created_at, id) do cursor; ValueError se inválido"""
+    created_at, order_id = value.split('-')
+    return datetime.strptime(created_at, CURSOR_FORMAT), int(order_id)
+
+
+def order_items(order_ids):
+    """{order_id: [itens]} em uma consulta IN"""
+    from app.models import OrderItem
+
+    items = {order_id: [] for order_id in order_ids}
+    if order_ids:
+        rows = db.session.execute(
+            select(OrderItem.order_id, OrderItem.product_id, OrderItem.product_title,
+                   OrderItem.quantity, OrderItem.subtotal)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.order_id, OrderItem.id)
+        )
+        for row in rows:
+            items[row.order_id].append(row)
+    return items
+
+
+def order_page(user_id, before=None, per_page=10):
+    """
+    Pedidos do cliente anteriores ao cursor ``before`` (tupla de
+    decode_cursor). Retorna (pedidos, itens por pedido, próximo cursor).
+    """
+    from app.models import Order
+
+    statement = (
+        select(Order)
+        .options(load_only(Order.id, Order.order_number, Order.status, Order.total,
+                           Order.payment_method, Order.created_at))
+        .where(Order.user_id == user_id)
+    )
+    if before is not None:
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(*before))
+    orders = db.session.execute(
+        statement.order_by(Order.created_at.desc(), Order.id.desc()).limit(per_page + 1)
+    ).scalars().all()
+
+    next_cursor = encode_cursor(orders[per_page - 1]) if len(orders) > per_page else None
+    orders = orders[:per_page]
+    return orders, order_items([order.id for order in orders]), next_cursor
+
+
+def _spent(status, total):
+    return Decimal(str(total or 0)) if status != CANCELLED else Decimal('0')
+
+
+def _summary_aggregate(user_ids=None):
+    from app.models import Order, User
+
+    statement = (
+        select(User.id, func.count(Order.id),
+               func.coalesce(func.sum(case((Order.status != CANCELLED, Order.total), else_=0)), 0),
+               func.max(Order.created_at))
+        .select_from(User)
+        .outerjoin(Order, Order.user_id == User.id)
+        .group_by(User.id)
+    )
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(user_ids))
+    return statement
+
+
+def rebuild_summaries(connection, user_ids=None):
+    """Recalcula os resumos (de todos os clientes se ``user_ids`` é None)"""
+    from app.models import UserOrderSummary
+
+    table = UserOrderSummary.__table__
+    purge = delete(table)
+    if user_ids is not None:
+        purge = purge.where(table.c.user_id.in_(user_ids))
+    connection.execute(purge)
+    connection.execute(insert(table).from_select(
+        ['user_id', 'order_count', 'total_spent', 'last_order_at'], _summary_aggregate(user_ids)
+    ))
+
+
+def _insert_empty_summary(connection, user_id):
+    """Cria a linha zerada do cliente; não faz nada se outra transação já a criou"""
+    from app.models import UserOrderSummary
+
+    table = UserOrderSummary.__table__
+    values = {'user_id': user_id, 'order_count': 0, 'total_spent': 0}
+    dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+    if connection.dialect.name in dialects:
+        statement = dialects[connection.dialect.name].insert(table).values(**values) \
+            .on_conflict_do_nothing(index_elements=['user_id'])
+    else:
+        statement = insert(table).values(**values)
+    connection.execute(statement)
+
+
+def apply_summary_delta(connection, user_id, orders=0, spent=0, last_order_at=None, create_missing=True):
+    """Soma os deltas ao resumo do cliente, criando a linha zerada se ainda não existe"""
+    from app.models import Order, UserOrderSummary
+
+    table = UserOrderSummary.__table__
+    values = {
+        'order_count': table.c.order_count + orders,
+        'total_spent': table.c.total_spent + spent,
+    }
+    if last_order_at is not None:
+        values['last_order_at'] = case(
+            ((table.c.last_order_at == None) | (table.c.last_order_at < last_order_at), last_order_at),
+            else_=table.c.last_order_at,
+        )
+    elif orders < 0:
+        values['last_order_at'] = select(func.max(Order.created_at)) \
+            .where(Order.user_id == user_id).scalar_subquery()
+
+    statement = update(table).where(table.c.user_id == user_id).values(**values)
+    if not connection.execute(statement).rowcount and create_missing:
+        _insert_empty_summary(connection, user_id)
+        connection.execute(statement)
+
+
+def _after_insert_user(mapper, connection, target):
+    _insert_empty_summary(connection, target.id)
+
+
+def _after_insert_order(mapper, connection, target):
+    apply_summary_delta(connection, target.user_id, orders=1,
+                        spent=_spent(target.status, target.total),
+                        last_order_at=target.created_at)
+
+
+def _after_update_order(mapper, connection, target):
+    attrs = inspect(target).attrs
+    status, total = attrs.status.history, attrs.total.history
+    if not (status.has_changes() or total.has_changes()):
+        return
+    old_status = status.deleted[0] if status.deleted else target.status
+    old_total = total.deleted[0] if total.deleted else target.total
+    delta = _spent(target.status, target.total) - _spent(old_status, old_total)
+    if delta:
+        apply_summary_delta(connection, target.user_id, spent=delta)
+
+
+def _after_delete_order(mapper, connection, target):
+    # Na exclusão do cliente o resumo pode já ter sido removido no mesmo flush
+    apply_summary_delta(connection, target.user_id, orders=-1,
+                        spent=-_spent(target.status, target.total), create_missing=False)
+
+
+def register_order_summary_events():
+    """Mantém user_order_summaries junto com as alterações de Order"""
+    from app.models import Order, User
+
+    if not event.contains(Order, 'after_insert', _after_insert_order):
+        event.listen(User, 'after_insert', _after_insert_user)
+        event.listen(Order, 'after_insert', _after_insert_order)
+        event.listen(Order, 'after_update', _after_update_order)
+        event.listen(Order, 'after_delete', _after_delete_order)
+
+
+def order_summary(user_id):
+    """Resumo do cliente: a linha de user_order_summaries ou, sem ela, o agregado"""
+    from app.models import UserOrderSummary
+
+    summary = db.session.get(UserOrderSummary, user_id)
+    if summary is not None:
+        return {'order_count': summary.order_count, 'total_spent': summary.total_spent,
+                'last_order_at': summary.last_order_at}
+    row = db.session.execute(_summary_aggregate([user_id])).first()
+    _, count, spent, last_order_at = row if row is not None else (None, 0, 0, None)
+    return {'order_count': count, 'total_spent': Decimal(str(spent)), 'last_order_at': last_order_at}
@@ -0,0 +1,108 @@
+"""
+Serviço de hash de senhas - Fermarc E-commerce
+Desenvolvido por João Lion
+
+O hash (scrypt/pbkdf2) é caro de propósito. Para que uma rajada de logins
+não prenda todos os workers na CPU, o cálculo roda em um pool de processos
+limitado; quando a fila passa de PASSWORD_HASH_QUEUE_LIMIT a requisição é
+recusada com 503 (PasswordHasherBusy) em vez de esperar.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Fila de hash cheia - o chamador deve responder 503"""
+
+
+class PasswordHasher:
+    """Executa hash/verificação no pool configurado (ou inline se workers=0)"""
+
+    def __init__(self):
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._method_cache = {}
+
+    @property
+    def method(self):
+        return current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+
+    def _get_executor(self):
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+        if not workers:
+            return None
+
+        # Recria o pool após fork (gunicorn --preload)
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._executor_pid = os.getpid()
+                # Padrão único em Config.PASSWORD_HASH_QUEUE_LIMIT
+                self._slots = threading.BoundedSemaphore(
+                    current_app.config['PASSWORD_HASH_QUEUE_LIMIT']
+                )
+        return self._executor
+
+    def _run(self, func, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+
+        # A vaga só é devolvida quando o processo termina o cálculo; se a
+        # requisição desistir por timeout, o job continua ocupando o pool.
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True se o hash foi gerado com algoritmo/custo diferente do configurado"""
+        method = self.method
+        if method not in self._method_cache:
+            # Normaliza 'scrypt' -> 'scrypt:32768:8:1' como o Werkzeug grava
+            self._method_cache[method] = generate_password_hash('', method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_cache[method]
+
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
+
+
+def init_password_hasher(app):
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        from flask import request, jsonify
+        message = 'Servidor ocupado. Tente novamente em alguns segundos.'
+        headers = {'Retry-After': '5'}
+        if request.is_json or request.blueprint == 'api':
+            return jsonify({'error': message}), 503, headers
+        return message, 503, headers
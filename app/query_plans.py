@@ -0,0 +1,85 @@
+"""
+Verificação de planos de consulta - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Roda EXPLAIN nas consultas mais frequentes do site e confere se cada uma
+usa o índice esperado (ver migração "hot query indexes"). Usado por
+``flask check-indexes``; retorna erro se alguma consulta fizer varredura
+completa.
+"""
+from sqlalchemy import select, func, text
+
+from app import db
+from app.admin_orders import prefix_match
+from app.models import Product, ProductAttribute, Order, OrderItem, Address, User, product_categories
+
+
+def hot_queries():
+    """(nome, consulta, índice esperado) - espelham as consultas das rotas"""
+    return [
+        ('index: produtos em destaque',
+         select(Product.id).where(Product.is_active == True, Product.featured == True).limit(8),
+         'ix_products_active_featured'),
+        ('shop: mais recentes',
+         select(Product.id).where(Product.is_active == True).order_by(Product.created_at.desc()).limit(12),
+         'ix_products_active_created'),
+        ('shop: ordenado por preço',
+         select(Product.id).where(Product.is_active == True).order_by(Product.price.asc()).limit(12),
+         'ix_products_active_price'),
+        ('shop: filtro por categoria',
+         select(product_categories.c.product_id).where(product_categories.c.category_id == 1),
+         'ix_product_categories_category'),
+        ('shop: filtro por atributo',
+         select(ProductAttribute.product_id).where(ProductAttribute.key == 'tensao-de-operacao',
+                                                   ProductAttribute.value_norm.in_(['5v'])),
+         'ix_product_attributes_key_value'),
+        ('shop: faixa numérica de atributo',
+         select(ProductAttribute.product_id).where(ProductAttribute.key == 'memoria-flash',
+                                                   ProductAttribute.value_num >= 16),
+         'ix_product_attributes_key_num'),
+        ('dashboard: pedidos pendentes',
+         select(func.count()).select_from(Order).where(Order.status == 'pending'),
+         'ix_orders_status_created'),
+        ('admin: contagem por status',
+         select(Order.status, func.count(Order.id)).group_by(Order.status),
+         'ix_orders_status_created'),
+        ('admin: busca de cliente por e-mail',
+         select(User.id).where(prefix_match(func.lower(User.email), 'joao')),
+         'ix_users_email_lower'),
+        ('dashboard: vendas 30 dias',
+         select(func.sum(Order.total)).where(Order.created_at >= '2000-01-01'),
+         'ix_orders_created_at'),
+        ('dashboard: mais vendidos',
+         select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id),
+         'ix_order_items_product'),
+        ('carrinho: endereço padrão',
+         select(Address.id).where(Address.user_id == 1, Address.is_default == True),
+         'ix_addresses_user_default'),
+        ('conta: histórico de pedidos',
+         select(Order.id).where(Order.user_id == 1).order_by(Order.created_at.desc()).limit(10),
+         'ix_orders_user_created'),
+    ]
+
+
+def explain(conn, statement):
+    """Retorna o plano de execução como texto"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+        return '\n'.join(row[-1] for row in rows)
+    rows = conn.exec_driver_sql(f'EXPLAIN {sql}').all()
+    return '\n'.join(row[0] for row in rows)
+
+
+def check_hot_queries():
+    """Lista de (nome, índice esperado, usou_índice, plano)"""
+    results = []
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Tabelas pequenas favorecem seq scan; força o planner a revelar os índices
+            conn.execute(text('SET enable_seqscan = off'))
+        for name, statement, index in hot_queries():
+            plan = explain(conn, statement)
+            results.append((name, index, index in plan, plan))
+        conn.rollback()
+    return results
@@ -0,0 +1,230 @@
+"""
+Storage de rate limiting compartilhado - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Backend ``sqlite:///caminho/arquivo.db`` para o Flask-Limiter. O arquivo
+SQLite (em modo WAL) é compartilhado por todos os workers do gunicorn na
+mesma máquina, então "5 per minute" vale para o servidor inteiro e os
+contadores sobrevivem a reinícios.
+
+Suporta a estratégia ``sliding-window-counter``. Com a opção
+``batch_interval`` (segundos) os incrementos são acumulados localmente e
+gravados em lote; as leituras usam a última visão compartilhada somada
+aos incrementos pendentes. O limite passa a ser aproximado (cada worker
+pode exceder por no máximo o tráfego de um intervalo), mas o custo por
+requisição cai para algumas operações de dicionário.
+"""
+import atexit
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage, SlidingWindowCounterSupport
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+UPSERT = """
+INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    value = CASE WHEN counters.expires_at <= ? THEN excluded.value
+                 ELSE counters.value + excluded.value END,
+    expires_at = CASE WHEN counters.expires_at <= ? THEN excluded.expires_at
+                      ELSE counters.expires_at END
+RETURNING value
+"""
+
+# A cada N gravações, remove contadores expirados
+PURGE_EVERY = 1000
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport):
+    """Contadores de rate limit em um arquivo SQLite compartilhado"""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, batch_interval=0.0, **options):
+        self._path = uri.split('://', 1)[1][1:] or ':memory:'
+        self._batch_interval = float(batch_interval)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}   # chave -> [incremento, expires_at]
+        self._shared = {}    # chave -> valor lido do arquivo desde o último flush
+        self._last_flush = time.monotonic()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        if self._batch_interval:
+            atexit.register(self.flush)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    @property
+    def _conn(self):
+        """Uma conexão por thread e por processo (seguro após fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if self._path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _upsert(self, conn, key, amount, expires_at, now):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM counters WHERE expires_at <= ?', (now,))
+        return conn.execute(UPSERT, (key, amount, expires_at, now, now)).fetchone()[0]
+
+    def _read(self, key, now):
+        row = self._conn.execute(
+            'SELECT value FROM counters WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    # Janela fixa -------------------------------------------------------
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        now = time.time()
+        return self._upsert(self._conn, key, amount, now + expiry, now)
+
+    def get(self, key):
+        return self._read(key, time.time()) + self._pending.get(key, (0,))[0]
+
+    def get_expiry(self, key):
+        row = self._conn.execute(
+            'SELECT expires_at FROM counters WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._shared.clear()
+        return self._conn.execute('DELETE FROM counters').rowcount
+
+    def clear(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+            self._shared.pop(key, None)
+        self._conn.execute('DELETE FROM counters WHERE key = ?', (key,))
+
+    # Janela deslizante -------------------------------------------------
+
+    @staticmethod
+    def _window_keys(key, expiry, now):
+        window = int(now // expiry)
+        return f'{key}/{window - 1}', f'{key}/{window}'
+
+    @staticmethod
+    def _weights(expiry, now):
+        elapsed = (now / expiry) % 1
+        previous_ttl = (1 - elapsed) * expiry
+        current_ttl = previous_ttl + expiry
+        return previous_ttl, current_ttl
+
+    def _shared_value(self, key, now):
+        if key not in self._shared:
+            self._shared[key] = self._read(key, now)
+        return self._shared[key]
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self._window_keys(key, expiry, now)
+        previous_ttl, current_ttl = self._weights(expiry, now)
+        previous_count = self.get(previous_key)
+        current_count = self.get(current_key)
+        if not previous_count:
+            previous_ttl = 0.0
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_key, current_key = self._window_keys(key, expiry, now)
+        previous_ttl, _ = self._weights(expiry, now)
+
+        if self._batch_interval:
+            return self._acquire_batched(previous_key, current_key, previous_ttl,
+                                         limit, expiry, amount, now)
+
+        # Modo exato: leitura e incremento na mesma transação
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            previous_count = self._read(previous_key, now)
+            current_count = self._read(current_key, now)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            if math.floor(weighted) + amount > limit:
+                conn.execute('ROLLBACK')
+                return False
+            self._upsert(conn, current_key, amount, now + 2 * expiry, now)
+            conn.execute('COMMIT')
+            return True
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _acquire_batched(self, previous_key, current_key, previous_ttl, limit, expiry, amount, now):
+        with self._lock:
+            pending = self._pending.get(current_key)
+            previous_count = self._shared_value(previous_key, now) + self._pending.get(previous_key, (0,))[0]
+            current_count = self._shared_value(current_key, now) + (pending[0] if pending else 0)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            if math.floor(weighted) + amount > limit:
+                allowed = False
+            else:
+                allowed = True
+                if pending:
+                    pending[0] += amount
+                else:
+                    self._pending[current_key] = [amount, now + 2 * expiry]
+
+        if time.monotonic() - self._last_flush >= self._batch_interval:
+            self.flush()
+        return allowed
+
+    def flush(self):
+        """Grava os incrementos pendentes em uma única transação"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._shared = {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        now = time.time()
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, (amount, expires_at) in pending.items():
+                self._upsert(conn, key, amount, expires_at, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear_sliding_window(self, key, expiry):
+        now = time.time()
+        for window_key in self._window_keys(key, expiry, now):
+            self.clear(window_key)
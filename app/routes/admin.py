@@ -7,7 +7,8 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import User, Product, Category, Order, OrderItem, Coupon
 from app.forms import ProductForm, CategoryForm, CouponForm
-from app.utils import slugify, save_upload_file, delete_upload_file
+from app.bulk import ORDER_STATUSES
+from app.utils import slugify, save_upload_file, delete_upload_file, parse_specifications, format_specifications
 from functools import wraps
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -32,6 +33,8 @@ def admin_required(f):
 @admin_required
 def dashboard():
     """Dashboard principal do admin"""
+    from app import admin_orders
+    
     today = datetime.utcnow().date()
     thirty_days_ago = today - timedelta(days=30)
     
@@ -45,8 +48,9 @@ def dashboard():
         Order.status != 'cancelled'
     ).scalar() or Decimal('0.00')
     
-    total_orders = Order.query.count()
-    pending_orders = Order.query.filter_by(status='pending').count()
+    status_counts = admin_orders.status_counts()
+    total_orders = status_counts['all']
+    pending_orders = status_counts.get('pending', 0)
     total_products = Product.query.count()
     total_users = User.query.count()
     low_stock_products = Product.query.filter(Product.stock < 10, Product.is_active == True).count()
@@ -59,7 +63,7 @@ def dashboard():
         func.sum(OrderItem.subtotal).label('revenue')
     ).join(OrderItem).group_by(Product.id).order_by(func.sum(OrderItem.quantity).desc()).limit(5).all()
     
-    recent_orders = Order.query.order_by(Order.created_at.desc()).limit(10).all()
+    recent_orders = admin_orders.recent_orders(10)
     
     return render_template('admin/dashboard.html',
                          total_sales_today=total_sales_today,
@@ -93,9 +97,71 @@ def products():
         page=page, per_page=20, error_out=False
     )
     
+    categories = Category.query.filter_by(is_active=True).order_by(Category.name).all()
+    
     return render_template('admin/products.html',
                          pagination=pagination,
-                         search=search)
+                         search=search,
+                         categories=categories)
+
+@admin_bp.route('/products/bulk/price', methods=['POST'])
+@admin_required
+def bulk_price():
+    """Reajuste percentual de preço por categoria ou seleção"""
+    from app.bulk import reprice_products, describe_result
+    
+    category_ids = request.form.getlist('category_ids', type=int)
+    product_ids = request.form.getlist('product_ids', type=int)
+    try:
+        percent = Decimal(request.form.get('percent', ''))
+        if not percent.is_finite():
+            raise ArithmeticError
+    except ArithmeticError:
+        flash('Percentual inválido.', 'danger')
+        return redirect(url_for('admin.products'))
+    if not category_ids and not product_ids:
+        flash('Selecione produtos ou categorias para o reajuste.', 'warning')
+        return redirect(url_for('admin.products'))
+    
+    try:
+        result = reprice_products(percent, category_ids=category_ids, product_ids=product_ids)
+    except ValueError as e:
+        flash(str(e), 'danger')
+    else:
+        flash(f'Preços reajustados em {percent}%: {describe_result(result)}.', 'success')
+    return redirect(url_for('admin.products'))
+
+@admin_bp.route('/products/bulk/stock', methods=['POST'])
+@admin_required
+def bulk_stock():
+    """Estoque a partir de um CSV (sku, stock)"""
+    from app.bulk import parse_stock_csv, set_stock, describe_result
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Envie um arquivo CSV.', 'warning')
+        return redirect(url_for('admin.products'))
+    
+    rows, errors = parse_stock_csv(upload.read())
+    for error in errors[:10]:
+        flash(error, 'warning')
+    if rows:
+        result = set_stock(rows)
+        flash(f'Estoque atualizado: {describe_result(result)}.', 'success')
+    return redirect(url_for('admin.products'))
+
+@admin_bp.route('/products/bulk/status', methods=['POST'])
+@admin_required
+def bulk_product_status():
+    """Ativar/desativar os produtos selecionados"""
+    from app.bulk import set_products_active, describe_result
+    
+    product_ids = request.form.getlist('product_ids', type=int)
+    active = request.form.get('active') == '1'
+    if product_ids:
+        result = set_products_active(active, product_ids=product_ids)
+        flash(f'Produtos {"ativados" if active else "desativados"}: {describe_result(result)}.', 'success')
+    return redirect(url_for('admin.products'))
 
 @admin_bp.route('/product/add', methods=['GET', 'POST'])
 @admin_required
@@ -114,7 +180,7 @@ def add_product():
             stock=form.stock.data,
             featured=form.featured.data,
             is_active=form.is_active.data,
-            specifications=form.specifications.data
+            specifications=parse_specifications(form.specifications.data)
         )
         
         images = []
@@ -159,7 +225,7 @@ def edit_product(id):
         product.stock = form.stock.data
         product.featured = form.featured.data
         product.is_active = form.is_active.data
-        product.specifications = form.specifications.data
+        product.specifications = parse_specifications(form.specifications.data)
         
         if form.images.data:
             images = product.get_images() or []
@@ -183,6 +249,7 @@ def edit_product(id):
     
     if request.method == 'GET':
         form.categories.data = [c.id for c in product.categories]
+        form.specifications.data = format_specifications(product.specifications)
     
     return render_template('admin/product_form.html', form=form, title='Editar Produto', product=product)
 
@@ -264,21 +331,23 @@ def edit_category(id):
 @admin_required
 def orders():
     """Lista de pedidos"""
+    from app.admin_orders import paginate_orders
+    
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
+    search = request.args.get('q', '').strip()
     
-    query = Order.query
+    if status_filter not in ORDER_STATUSES:
+        status_filter = ''
     
-    if status_filter:
-        query = query.filter_by(status=status_filter)
-    
-    pagination = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    pagination, status_counts = paginate_orders(page, 20, status=status_filter, search=search)
     
     return render_template('admin/orders.html',
                          pagination=pagination,
-                         status_filter=status_filter)
+                         status_filter=status_filter,
+                         status_counts=status_counts,
+                         statuses=ORDER_STATUSES,
+                         search=search)
 
 @admin_bp.route('/order/<int:id>')
 @admin_required
@@ -294,13 +363,30 @@ def update_order_status(id):
     order = Order.query.get_or_404(id)
     new_status = request.form.get('status')
     
-    if new_status in ['pending', 'paid', 'shipped', 'delivered', 'cancelled']:
+    if new_status in ORDER_STATUSES:
         order.status = new_status
         db.session.commit()
         flash(f'Status do pedido {order.order_number} atualizado para {new_status}.', 'success')
     
     return redirect(url_for('admin.view_order', id=id))
 
+@admin_bp.route('/orders/bulk/status', methods=['POST'])
+@admin_required
+def bulk_order_status():
+    """Mudar o status dos pedidos selecionados (só transições válidas)"""
+    from app.bulk import transition_orders, describe_result
+    
+    order_ids = request.form.getlist('order_ids', type=int)
+    new_status = request.form.get('status', '')
+    if order_ids:
+        try:
+            result = transition_orders(order_ids, new_status)
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            flash(f'Pedidos para {new_status}: {describe_result(result)}.', 'success')
+    return redirect(url_for('admin.orders'))
+
 @admin_bp.route('/users')
 @admin_required
 def users():
@@ -324,6 +410,7 @@ def coupons():
 def add_coupon():
     """Adicionar cupom"""
     form = CouponForm()
+    form.categories.choices = [(c.id, c.name) for c in Category.query.filter_by(is_active=True).all()]
     
     if form.validate_on_submit():
         coupon = Coupon(
@@ -333,7 +420,8 @@ def add_coupon():
             value=form.value.data,
             min_purchase=form.min_purchase.data,
             usage_limit=form.usage_limit.data,
-            is_active=form.is_active.data
+            is_active=form.is_active.data,
+            rules=form.rules()
         )
         
         db.session.add(coupon)
@@ -344,6 +432,13 @@ def add_coupon():
     
     return render_template('admin/coupon_form.html', form=form, title='Adicionar Cupom')
 
+@admin_bp.route('/cache-stats')
+@admin_required
+def cache_stats():
+    """Acertos/erros do cache de fragmentos deste worker (JSON)"""
+    from app.fragment_cache import fragment_cache
+    return jsonify(fragment_cache.stats())
+
 @admin_bp.route('/export/products')
 @admin_required
 def export_products():
@@ -2,16 +2,25 @@
 API REST - Fermarc E-commerce
 Desenvolvido por João Lion
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app, url_for
 from app.models import Product, Category, Order
-from app import db
+from app import db, csrf, limiter
 from sqlalchemy import or_
+from app.attributes import parse_attribute_filters, apply_attribute_filters, attribute_facets
+from app.api_auth import api_login_required, cart_session
+from app.serializers import FieldError, product_serializer, PRODUCT_LIST_FIELDS, PRODUCT_DETAIL_FIELDS
 
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/products')
 def products():
-    """Lista produtos (JSON)"""
+    """Lista produtos (JSON); fields=/exclude= escolhem os campos"""
+    try:
+        fields = product_serializer.parse(request.args.get('fields'), request.args.get('exclude'),
+                                          default=PRODUCT_LIST_FIELDS)
+    except FieldError as e:
+        return jsonify({'error': str(e)}), 400
+    
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
@@ -26,58 +35,218 @@ def products():
             )
         )
     
-    pagination = query.paginate(page=page, per_page=min(per_page, 100), error_out=False)
-    
-    products_data = []
-    for product in pagination.items:
-        products_data.append({
-            'id': product.id,
-            'title': product.title,
-            'slug': product.slug,
-            'description': product.description,
-            'sku': product.sku,
-            'price': float(product.price),
-            'stock': product.stock,
-            'in_stock': product.in_stock,
-            'images': product.get_images(),
-            'main_image': product.main_image,
-            'featured': product.featured,
-            'categories': [{'id': c.id, 'name': c.name, 'slug': c.slug} for c in product.categories]
-        })
+    # Filtros attr.<chave>=valor / attr.<chave>.min|max; facets=1 inclui contagens
+    attr_filters = parse_attribute_filters(request.args)
+    facets = None
+    if request.args.get('facets', type=int):
+        facets = attribute_facets(query, attr_filters,
+                                  max_facets=current_app.config['ATTRIBUTE_FACETS_MAX'],
+                                  max_values=current_app.config['ATTRIBUTE_FACET_VALUES'])
+    query = apply_attribute_filters(query, attr_filters)
     
-    return jsonify({
+    pagination = query.options(*product_serializer.load_options(fields)) \
+        .paginate(page=page, per_page=min(per_page, 100), error_out=False)
+    products_data = product_serializer.dump_many(pagination.items, fields)
+    
+    data = {
         'products': products_data,
         'page': page,
         'per_page': per_page,
         'total': pagination.total,
         'pages': pagination.pages
+    }
+    if facets is not None:
+        data['facets'] = facets
+    return jsonify(data)
+
+BATCH_KEYS = (('ids', 'id'), ('skus', 'sku'), ('slugs', 'slug'))
+
+def _batch_values(data, name):
+    """Lista de valores de ids/skus/slugs (JSON: lista; query string: separada por vírgula)"""
+    value = data.get(name)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError(f'{name} deve ser uma lista')
+    values = [str(v).strip() for v in value if str(v).strip()]
+    if name == 'ids':
+        values = [int(v) for v in values]  # ValueError -> 400
+    return values
+
+@api_bp.route('/products/batch', methods=['GET', 'POST'])
+@csrf.exempt
+def products_batch():
+    """
+    Vários produtos por id, SKU ou slug em uma chamada (uma consulta IN por
+    tipo de chave). GET ?ids=1,2&skus=A,B&slugs=x ou POST com listas em JSON;
+    ``fields``/``exclude`` escolhem os campos retornados.
+    
+    ``results`` segue a ordem pedida (ids, depois skus, depois slugs) e traz
+    ``"product": null`` para o que não foi encontrado; ``missing`` lista só
+    as falhas.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    try:
+        requested = [(key, _batch_values(data, name)) for name, key in BATCH_KEYS]
+        fields = product_serializer.parse(data.get('fields'), data.get('exclude'))
+    except FieldError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'ids devem ser inteiros; ids/skus/slugs devem ser listas'}), 400
+    
+    total = sum(len(values) for _, values in requested)
+    limit = current_app.config['API_BATCH_MAX']
+    if total == 0:
+        return jsonify({'error': 'Informe ids, skus ou slugs'}), 400
+    if total > limit:
+        return jsonify({'error': f'Máximo de {limit} produtos por chamada'}), 400
+    
+    results, missing = [], []
+    for key, values in requested:
+        if not values:
+            continue
+        column = getattr(Product, key)
+        found = {
+            getattr(product, key): product
+            for product in Product.query.options(*product_serializer.load_options(fields, extra_columns=(key,)))
+            .filter(Product.is_active == True, column.in_(set(values)))
+        }
+        for value in values:
+            product = found.get(value)
+            results.append({key: value, 'product': product_serializer.dump(product, fields) if product else None})
+            if product is None:
+                missing.append({key: value})
+    
+    return jsonify({
+        'results': results,
+        'found': len(results) - len(missing),
+        'missing': missing
     })
 
 @api_bp.route('/product/<slug>')
 def product_detail(slug):
-    """Detalhe de produto (JSON)"""
-    product = Product.query.filter_by(slug=slug, is_active=True).first()
+    """Detalhe de produto (JSON); fields=/exclude= escolhem os campos"""
+    try:
+        fields = product_serializer.parse(request.args.get('fields'), request.args.get('exclude'),
+                                          default=PRODUCT_DETAIL_FIELDS)
+    except FieldError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    product = Product.query.options(*product_serializer.load_options(fields)) \
+        .filter_by(slug=slug, is_active=True).first()
     
     if not product:
         return jsonify({'error': 'Produto não encontrado'}), 404
     
+    return jsonify(product_serializer.dump(product, fields))
+
+def _feed_response(chunks, mimetype, snapshot):
+    """Resposta em streaming, com gzip quando o cliente aceita"""
+    from flask import Response, stream_with_context
+    from app.compression import add_vary, negotiate
+    from app.feeds import format_snapshot, gzip_stream
+    
+    headers = {'X-Feed-Snapshot': format_snapshot(snapshot)}
+    if negotiate(request.headers.get('Accept-Encoding', ''), ('gzip',)):
+        chunks = gzip_stream(chunks, current_app.config.get('COMPRESS_LEVEL', 6))
+        headers['Content-Encoding'] = 'gzip'
+    response = Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+    add_vary(response.headers)
+    return response
+
+@api_bp.route('/feed/products.ndjson')
+def feed_ndjson():
+    """
+    Catálogo completo, um produto JSON por linha. since=<ISO 8601> traz só
+    o que mudou (inclusive desativações); fields=/exclude= como em /products.
+    """
+    from datetime import datetime
+    from app.feeds import FEED_FIELDS, ndjson_feed, parse_since
+    
+    try:
+        since = parse_since(request.args.get('since'))
+        fields = product_serializer.parse(request.args.get('fields'), request.args.get('exclude'),
+                                          default=FEED_FIELDS)
+    except FieldError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'since deve ser uma data ISO 8601'}), 400
+    
+    snapshot = datetime.utcnow()
+    return _feed_response(ndjson_feed(fields, since), 'application/x-ndjson', snapshot)
+
+@api_bp.route('/feed/products.xml')
+def feed_xml():
+    """Catálogo no formato RSS do Google Merchant Center (since= opcional)"""
+    from datetime import datetime
+    from app.feeds import parse_since, xml_feed
+    
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'since deve ser uma data ISO 8601'}), 400
+    
+    snapshot = datetime.utcnow()
+    return _feed_response(xml_feed(since), 'application/xml', snapshot)
+
+@api_bp.route('/changes')
+@limiter.limit("1000 per hour")
+def changes():
+    """
+    Alterações de preço/estoque/status depois de ``after`` (sequência).
+    ``wait=<segundos>`` segura a resposta até chegar alguma alteração
+    (long-poll; ignorado em workers sync - ver app/changes.py). ``next`` é o
+    ``after`` da próxima chamada.
+    """
+    from app.changes import change_result, fetch_changes, head_sequence, long_poll_supported
+    
+    after = max(request.args.get('after', 0, type=int), 0)
+    page_size = current_app.config['CHANGES_PAGE_SIZE']
+    limit = min(max(request.args.get('limit', page_size, type=int), 1), page_size)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), current_app.config['CHANGES_MAX_WAIT'])
+    if not long_poll_supported(request.environ):
+        wait = 0
+    
+    items = [change_result(change) for change in fetch_changes(after, limit, wait)]
     return jsonify({
-        'id': product.id,
-        'title': product.title,
-        'slug': product.slug,
-        'description': product.description,
-        'sku': product.sku,
-        'price': float(product.price),
-        'stock': product.stock,
-        'in_stock': product.in_stock,
-        'images': product.get_images(),
-        'featured': product.featured,
-        'specifications': product.specifications,
-        'categories': [{'id': c.id, 'name': c.name, 'slug': c.slug} for c in product.categories],
-        'created_at': product.created_at.isoformat(),
-        'updated_at': product.updated_at.isoformat()
+        'changes': items,
+        'next': items[-1]['seq'] if items else after,
+        'head': head_sequence(),
+        'has_more': len(items) == limit
     })
 
+@api_bp.route('/autocomplete')
+def autocomplete():
+    """Sugestões de busca (índice em memória, sem consulta ao banco)"""
+    from app.autocomplete import autocomplete_index
+    
+    term = request.args.get('q', '')[:100]
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    
+    suggestions = []
+    for entry in autocomplete_index.search(term, limit):
+        if entry['type'] == 'product':
+            suggestions.append({
+                'type': 'product',
+                'label': entry['label'],
+                'sku': entry['sku'],
+                'price': entry['price'],
+                'url': url_for('public.product_detail', slug=entry['slug'])
+            })
+        else:
+            suggestions.append({
+                'type': 'category',
+                'label': entry['label'],
+                'url': url_for('public.category', slug=entry['slug'])
+            })
+    
+    response = jsonify({'query': term, 'suggestions': suggestions})
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
+
 @api_bp.route('/categories')
 def categories():
     """Lista categorias (JSON)"""
@@ -97,6 +266,259 @@ def categories():
     
     return jsonify({'categories': categories_data})
 
+# Autenticação, carrinho e pedidos (token Bearer ou sessão - ver app/api_auth.py)
+
+PAYMENT_METHODS = ('credit_card', 'debit_card', 'pix', 'boleto')
+
+@api_bp.route('/auth/token', methods=['POST'])
+@csrf.exempt
+@limiter.limit("5 per minute")
+def auth_token():
+    """Troca e-mail e senha por um token de acesso"""
+    from app.models import User
+    from app.api_auth import issue_token
+    
+    data = request.get_json(silent=True) or {}
+    user = User.query.filter_by(email=str(data.get('email', '')).lower()).first()
+    if user is None or not user.check_password(str(data.get('password', ''))):
+        return jsonify({'error': 'E-mail ou senha inválidos'}), 401
+    if not user.is_active:
+        return jsonify({'error': 'Conta desativada'}), 403
+    
+    return jsonify({
+        'token': issue_token(user),
+        'token_type': 'Bearer',
+        'expires_in': current_app.config['API_TOKEN_MAX_AGE'],
+        'user': {'id': user.id, 'email': user.email, 'username': user.username}
+    })
+
+def _cart_payload():
+    from app.utils import CartService
+    
+    items, subtotal = CartService.get_cart_items(cart_session())
+    return {
+        'items': [{
+            'product_id': item['product'].id,
+            'title': item['product'].title,
+            'slug': item['product'].slug,
+            'sku': item['product'].sku,
+            'price': float(item['product'].price),
+            'quantity': item['quantity'],
+            'stock': item['product'].stock,
+            'subtotal': float(item['subtotal'])
+        } for item in items],
+        'count': len(items),
+        'subtotal': float(subtotal)
+    }
+
+def _requested_quantity(data, default=None):
+    try:
+        return int(data.get('quantity', default))
+    except (TypeError, ValueError):
+        return None
+
+@api_bp.route('/cart')
+@api_login_required
+def cart():
+    """Carrinho do usuário"""
+    return jsonify(_cart_payload())
+
+@api_bp.route('/cart/items', methods=['POST'])
+@api_login_required
+def cart_add():
+    """Adiciona produto ao carrinho: {"product_id": 1, "quantity": 1}"""
+    from app.utils import CartService
+    
+    data = request.get_json(silent=True) or {}
+    product = db.session.get(Product, data.get('product_id')) if isinstance(data.get('product_id'), int) else None
+    if product is None or not product.is_active or not product.in_stock:
+        return jsonify({'error': 'Produto indisponível'}), 400
+    
+    quantity = _requested_quantity(data, 1)
+    if quantity is None or quantity < 1:
+        return jsonify({'error': 'quantity inválida'}), 400
+    
+    in_cart = CartService.get_cart(cart_session()).get(str(product.id), 0)
+    if in_cart + quantity > product.stock:
+        return jsonify({'error': 'Quantidade solicitada não disponível em estoque',
+                        'stock': product.stock}), 400
+    
+    CartService.add_to_cart(cart_session(), product.id, quantity)
+    return jsonify(_cart_payload())
+
+@api_bp.route('/cart/items/<int:product_id>', methods=['PUT', 'PATCH'])
+@api_login_required
+def cart_update(product_id):
+    """Altera a quantidade (0 remove): {"quantity": 2}"""
+    from app.utils import CartService
+    
+    quantity = _requested_quantity(request.get_json(silent=True) or {})
+    if quantity is None or quantity < 0:
+        return jsonify({'error': 'quantity inválida'}), 400
+    
+    if quantity > 0:
+        product = db.session.get(Product, product_id)
+        if product is None or not product.is_active:
+            return jsonify({'error': 'Produto indisponível'}), 400
+        if quantity > product.stock:
+            return jsonify({'error': 'Quantidade solicitada não disponível em estoque',
+                            'stock': product.stock}), 400
+    
+    CartService.update_cart(cart_session(), product_id, quantity)
+    return jsonify(_cart_payload())
+
+@api_bp.route('/cart/items/<int:product_id>', methods=['DELETE'])
+@api_login_required
+def cart_remove(product_id):
+    """Remove produto do carrinho"""
+    from app.utils import CartService
+    
+    CartService.remove_from_cart(cart_session(), product_id)
+    return jsonify(_cart_payload())
+
+@api_bp.route('/cart', methods=['DELETE'])
+@api_login_required
+def cart_clear():
+    """Esvazia o carrinho"""
+    from app.utils import CartService
+    
+    CartService.clear_cart(cart_session())
+    return jsonify(_cart_payload())
+
+@api_bp.route('/cart/quote', methods=['POST'])
+@api_login_required
+def cart_quote():
+    """
+    Cotação do carrinho: {"address_id": 1} ou {"zipcode": "01000-000"},
+    com "coupon_code" opcional. Não cria pedido.
+    """
+    from flask_login import current_user
+    from app.models import Address
+    from app.utils import CartService
+    from app.checkout import price_order, pricing_result
+    
+    data = request.get_json(silent=True) or {}
+    zipcode = data.get('zipcode')
+    if data.get('address_id') is not None:
+        address = Address.query.filter_by(id=data['address_id'], user_id=current_user.id).first()
+        if address is None:
+            return jsonify({'error': 'Endereço não encontrado'}), 400
+        zipcode = address.zipcode
+    if not zipcode:
+        return jsonify({'error': 'Informe address_id ou zipcode'}), 400
+    
+    items, subtotal = CartService.get_cart_items(cart_session())
+    if not items:
+        return jsonify({'error': 'Carrinho vazio'}), 400
+    
+    result = pricing_result(price_order(items, subtotal, str(zipcode), data.get('coupon_code'),
+                                        current_user.id))
+    result['count'] = len(items)
+    return jsonify(result)
+
+@api_bp.route('/checkout', methods=['POST'])
+@api_login_required
+def checkout():
+    """
+    Finaliza o carrinho (JSON). Exige o header Idempotency-Key:
+    repetições com a mesma chave devolvem o pedido original.
+    """
+    from flask_login import current_user
+    from app.models import Address
+    from app.utils import CartService, send_email
+    from app.checkout import price_order, place_order, order_result, cart_fingerprint_data
+    from app.idempotency import IdempotencyConflict, find_result, request_fingerprint, run_once, valid_key
+    from app.coupons import CouponUnavailable
+    
+    key = request.headers.get('Idempotency-Key', '')
+    if not valid_key(key):
+        return jsonify({'error': 'Header Idempotency-Key obrigatório (até 64 caracteres)'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    items, subtotal = CartService.get_cart_items(cart_session())
+    fingerprint = request_fingerprint(cart_fingerprint_data(
+        items, address_id=data.get('address_id'), payment_method=data.get('payment_method'),
+        coupon_code=(data.get('coupon_code') or '').upper(), notes=data.get('notes')
+    ))
+    
+    # Repetição depois do carrinho já limpo pelo pedido original: não há o
+    # que comparar. Com itens, a mesma chave com outro conteúdo é recusada
+    try:
+        existing = find_result(current_user.id, 'checkout', key, fingerprint if items else None)
+    except IdempotencyConflict:
+        return jsonify({'error': 'Idempotency-Key já usada com outro conteúdo'}), 422
+    if existing is not None:
+        return jsonify(existing.response_body), existing.response_code, {'Idempotent-Replayed': 'true'}
+    
+    if not items:
+        return jsonify({'error': 'Carrinho vazio'}), 400
+    if data.get('payment_method') not in PAYMENT_METHODS:
+        return jsonify({'error': 'payment_method inválido'}), 400
+    address = Address.query.filter_by(id=data.get('address_id'), user_id=current_user.id).first()
+    if address is None:
+        return jsonify({'error': 'Endereço não encontrado'}), 400
+    
+    def create_order():
+        pricing = price_order(items, subtotal, address.zipcode, data.get('coupon_code'), current_user.id)
+        order = place_order(current_user.id, items, address, pricing, data['payment_method'],
+                            data.get('notes'))
+        body = order_result(order)
+        if pricing['coupon_message']:
+            body['coupon_message'] = pricing['coupon_message']
+        return 201, body
+    
+    try:
+        status, body, replayed = run_once(current_user.id, 'checkout', key, fingerprint, create_order)
+    except IdempotencyConflict:
+        return jsonify({'error': 'Idempotency-Key já usada com outro conteúdo'}), 422
+    except CouponUnavailable as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if replayed:
+        return jsonify(body), status, {'Idempotent-Replayed': 'true'}
+    
+    order = db.session.get(Order, body['order_id'])
+    CartService.clear_cart(cart_session())
+    send_email(
+        to=current_user.email,
+        subject=f'Pedido {order.order_number} confirmado',
+        template='order_confirmation',
+        order=order
+    )
+    return jsonify(body), status
+
+@api_bp.route('/orders/<int:order_id>')
+@api_login_required
+def order_detail(order_id):
+    """Detalhe de um pedido do usuário"""
+    from flask_login import current_user
+    
+    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first()
+    if order is None:
+        return jsonify({'error': 'Pedido não encontrado'}), 404
+    
+    return jsonify({
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'payment_method': order.payment_method,
+        'subtotal': float(order.subtotal),
+        'shipping': float(order.shipping),
+        'tax': float(order.tax),
+        'discount': float(order.discount),
+        'total': float(order.total),
+        'coupon_code': order.coupon_code,
+        'created_at': order.created_at.isoformat(),
+        'items': [{
+            'product_id': item.product_id,
+            'title': item.product_title,
+            'sku': item.product_sku,
+            'price': float(item.price),
+            'quantity': item.quantity,
+            'subtotal': float(item.subtotal)
+        } for item in order.items]
+    })
+
 @api_bp.route('/health')
 def health():
     """Health check endpoint"""
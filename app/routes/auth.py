@@ -7,7 +7,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from app import db, limiter
 from app.models import User, Address
 from app.forms import LoginForm, RegisterForm, ProfileForm, ChangePasswordForm, AddressForm
-from app.utils import save_upload_file, send_email
+from app.utils import save_upload_file, send_email, CartService
 from datetime import datetime
 import secrets
 
@@ -30,7 +30,12 @@ def login():
                 return redirect(url_for('auth.login'))
             
             login_user(user, remember=form.remember_me.data)
+            CartService.merge_on_login(session, user.id)
             user.last_login = datetime.utcnow()
+            
+            # Atualiza hashes gerados com algoritmo/custo antigo
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
             db.session.commit()
             
             next_page = request.args.get('next')
@@ -80,6 +85,8 @@ def register():
 def logout():
     """Logout do usuário"""
     logout_user()
+    # O carrinho salvo continua do usuário; a sessão anônima começa vazia
+    CartService.forget(session)
     flash('Você saiu com sucesso.', 'info')
     return redirect(url_for('public.index'))
 
@@ -102,16 +109,17 @@ def profile():
                 flash('Este nome de usuário já está em uso.', 'danger')
                 return redirect(url_for('auth.profile'))
         
-        current_user.username = form.username.data.lower()
-        current_user.email = form.email.data.lower()
-        current_user.first_name = form.first_name.data
-        current_user.last_name = form.last_name.data
-        current_user.phone = form.phone.data
+        user = current_user.model
+        user.username = form.username.data.lower()
+        user.email = form.email.data.lower()
+        user.first_name = form.first_name.data
+        user.last_name = form.last_name.data
+        user.phone = form.phone.data
         
         if form.avatar.data:
             avatar_filename = save_upload_file(form.avatar.data, 'avatars')
             if avatar_filename:
-                current_user.avatar = avatar_filename
+                user.avatar = avatar_filename
         
         db.session.commit()
         flash('Perfil atualizado com sucesso!', 'success')
@@ -130,7 +138,7 @@ def change_password():
             flash('Senha atual incorreta.', 'danger')
             return redirect(url_for('auth.change_password'))
         
-        current_user.set_password(form.new_password.data)
+        current_user.model.set_password(form.new_password.data)
         db.session.commit()
         
         flash('Senha alterada com sucesso!', 'success')
@@ -141,13 +149,23 @@ def change_password():
 @auth_bp.route('/orders')
 @login_required
 def orders():
-    """Histórico de pedidos do usuário"""
-    page = request.args.get('page', 1, type=int)
-    pagination = current_user.orders.order_by(
-        db.desc('created_at')
-    ).paginate(page=page, per_page=10, error_out=False)
+    """Histórico de pedidos do usuário (paginação por cursor)"""
+    from app.order_history import decode_cursor, order_page, order_summary
+    
+    cursor = request.args.get('before')
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return redirect(url_for('auth.orders'))
+    
+    orders, items, next_cursor = order_page(current_user.id, before=before, per_page=10)
     
-    return render_template('account/orders.html', pagination=pagination)
+    return render_template('account/orders.html',
+                         orders=orders,
+                         items=items,
+                         next_cursor=next_cursor,
+                         is_first_page=before is None,
+                         summary=order_summary(current_user.id))
 
 @auth_bp.route('/addresses')
 @login_required
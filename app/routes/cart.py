@@ -4,12 +4,14 @@ Desenvolvido por João Lion
 """
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, jsonify
 from flask_login import login_required, current_user
-from app import db
-from app.models import Product, Order, OrderItem, Address, Coupon
+from app import db, limiter
+from app.models import Product, Order, Address
 from app.forms import CheckoutForm, AddressForm
-from app.utils import CartService, generate_order_number, calculate_shipping
+from app.utils import CartService, calculate_shipping, send_email
+from app.checkout import price_order, place_order, order_result, cart_fingerprint_data
+from app.coupons import CouponUnavailable, PricedCart, coupon_engine
+from app.idempotency import IdempotencyConflict, find_result, new_key, request_fingerprint, run_once, valid_key
 from decimal import Decimal
-from datetime import datetime
 
 cart_bp = Blueprint('cart', __name__)
 
@@ -64,7 +66,7 @@ def add(product_id):
         items, subtotal = CartService.get_cart_items(session)
         return jsonify({
             'success': True,
-            'cart_count': len(session.get('cart', {})),
+            'cart_count': CartService.count(session),
             'message': f'{product.title} adicionado ao carrinho!'
         })
     
@@ -90,7 +92,7 @@ def update(product_id):
         items, subtotal = CartService.get_cart_items(session)
         return jsonify({
             'success': True,
-            'cart_count': len(session.get('cart', {})),
+            'cart_count': CartService.count(session),
             'subtotal': float(subtotal)
         })
     
@@ -105,7 +107,7 @@ def remove(product_id):
     if request.is_json:
         return jsonify({
             'success': True,
-            'cart_count': len(session.get('cart', {}))
+            'cart_count': CartService.count(session)
         })
     
     flash('Produto removido do carrinho.', 'info')
@@ -122,14 +124,31 @@ def clear():
 @login_required
 def checkout():
     """Checkout - finalizar compra"""
+    form = CheckoutForm()
     items, subtotal = CartService.get_cart_items(session)
+    key = form.idempotency_key.data
+    fingerprint = request_fingerprint(cart_fingerprint_data(
+        items, address_id=form.address_id.data, payment_method=form.payment_method.data,
+        coupon_code=(form.coupon_code.data or '').upper(), notes=form.notes.data
+    ))
+    
+    # Reenvio/duplo clique: devolve o pedido já criado com esta chave. Com o
+    # carrinho já limpo pelo pedido original não há o que comparar; com itens,
+    # a mesma chave com outro conteúdo é recusada
+    if request.method == 'POST' and valid_key(key):
+        try:
+            existing = find_result(current_user.id, 'checkout', key, fingerprint if items else None)
+        except IdempotencyConflict:
+            flash('Este pedido já foi enviado com outros dados. Revise o checkout.', 'warning')
+            return redirect(url_for('cart.checkout'))
+        if existing is not None:
+            return redirect(url_for('cart.order_success', order_id=existing.response_body['order_id']))
     
     if not items:
         flash('Seu carrinho está vazio.', 'warning')
         return redirect(url_for('public.shop'))
     
     addresses = current_user.addresses.all()
-    form = CheckoutForm()
     form.address_id.choices = [(0, 'Novo endereço')] + [(a.id, f"{a.street}, {a.number} - {a.city}/{a.state}") for a in addresses]
     
     if not addresses:
@@ -141,75 +160,43 @@ def checkout():
             return redirect(url_for('cart.checkout'))
         
         address = Address.query.filter_by(id=form.address_id.data, user_id=current_user.id).first_or_404()
+        coupon_code = form.coupon_code.data
         
-        shipping_cost = Decimal(str(calculate_shipping(address.zipcode, subtotal)))
-        tax = subtotal * Decimal('0.00')
-        discount = Decimal('0.00')
-        
-        if form.coupon_code.data:
-            coupon = Coupon.query.filter_by(code=form.coupon_code.data.upper()).first()
-            if coupon:
-                is_valid, message = coupon.is_valid(subtotal)
-                if is_valid:
-                    discount = coupon.calculate_discount(subtotal)
-                else:
-                    flash(message, 'warning')
-        
-        total = subtotal + shipping_cost + tax - discount
+        def create_order():
+            pricing = price_order(items, subtotal, address.zipcode, coupon_code, current_user.id)
+            if pricing['coupon_message']:
+                flash(pricing['coupon_message'], 'warning')
+            order = place_order(current_user.id, items, address, pricing,
+                                form.payment_method.data, form.notes.data)
+            return 201, order_result(order)
         
-        order = Order(
-            user_id=current_user.id,
-            order_number=generate_order_number(),
-            subtotal=subtotal,
-            tax=tax,
-            shipping=shipping_cost,
-            discount=discount,
-            total=total,
-            payment_method=form.payment_method.data,
-            shipping_street=address.street,
-            shipping_number=address.number,
-            shipping_complement=address.complement,
-            shipping_neighborhood=address.neighborhood,
-            shipping_city=address.city,
-            shipping_state=address.state,
-            shipping_zipcode=address.zipcode,
-            coupon_code=form.coupon_code.data.upper() if form.coupon_code.data else None,
-            notes=form.notes.data
-        )
-        
-        db.session.add(order)
+        if not valid_key(key):
+            key = new_key()  # formulário antigo, sem chave: executa normalmente
+        try:
+            _, result, replayed = run_once(current_user.id, 'checkout', key, fingerprint, create_order)
+        except IdempotencyConflict:
+            flash('Este pedido já foi enviado com outros dados. Revise o checkout.', 'warning')
+            return redirect(url_for('cart.checkout'))
+        except CouponUnavailable as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('cart.checkout'))
         
-        for item in items:
-            order_item = OrderItem(
-                order=order,
-                product_id=item['product'].id,
-                product_title=item['product'].title,
-                product_sku=item['product'].sku,
-                price=item['product'].price,
-                quantity=item['quantity'],
-                subtotal=item['subtotal']
+        if not replayed:
+            order = db.session.get(Order, result['order_id'])
+            CartService.clear_cart(session)
+            
+            send_email(
+                to=current_user.email,
+                subject=f'Pedido {order.order_number} confirmado',
+                template='order_confirmation',
+                order=order
             )
-            db.session.add(order_item)
             
-            product = item['product']
-            product.stock -= item['quantity']
-        
-        if form.coupon_code.data and discount > 0:
-            coupon.used_count += 1
-        
-        db.session.commit()
-        
-        CartService.clear_cart(session)
-        
-        send_email(
-            to=current_user.email,
-            subject=f'Pedido {order.order_number} confirmado',
-            template='order_confirmation',
-            order=order
-        )
-        
-        flash(f'Pedido {order.order_number} realizado com sucesso!', 'success')
-        return redirect(url_for('cart.order_success', order_id=order.id))
+            flash(f'Pedido {order.order_number} realizado com sucesso!', 'success')
+        return redirect(url_for('cart.order_success', order_id=result['order_id']))
+    
+    if not form.idempotency_key.data:
+        form.idempotency_key.data = new_key()
     
     default_address = Address.query.filter_by(user_id=current_user.id, is_default=True).first()
     if default_address:
@@ -238,23 +225,24 @@ def order_success(order_id):
     return render_template('order_success.html', order=order)
 
 @cart_bp.route('/apply-coupon', methods=['POST'])
+@limiter.limit("20 per minute")
 def apply_coupon():
     """Aplicar cupom de desconto (AJAX)"""
-    code = request.json.get('code', '').upper()
-    items, subtotal = CartService.get_cart_items(session)
+    code = (request.get_json(silent=True) or {}).get('code', '').upper()
     
     if not code:
         return jsonify({'error': 'Código inválido'}), 400
     
-    coupon = Coupon.query.filter_by(code=code).first()
-    if not coupon:
+    items, subtotal = CartService.get_cart_items(session)
+    user_id = current_user.id if current_user.is_authenticated else None
+    result = coupon_engine.evaluate(code, PricedCart(items, subtotal), user_id)
+    if result is None:
         return jsonify({'error': 'Cupom não encontrado'}), 404
     
-    is_valid, message = coupon.is_valid(subtotal)
-    if not is_valid:
-        return jsonify({'error': message}), 400
+    if not result.valid:
+        return jsonify({'error': result.message}), 400
     
-    discount = float(coupon.calculate_discount(subtotal))
+    discount = float(result.discount)
     
     return jsonify({
         'success': True,
@@ -2,11 +2,12 @@
 Rotas públicas - Fermarc E-commerce
 Desenvolvido por João Lion
 """
-from flask import Blueprint, render_template, request, abort, redirect, url_for, flash
+from flask import Blueprint, render_template, request, abort, redirect, url_for, flash, current_app
 from app.models import Product, Category, Order
 from app.forms import SearchForm
 from app import db
 from sqlalchemy import or_, and_
+from app.attributes import parse_attribute_filters, apply_attribute_filters, attribute_facets, filter_args
 
 public_bp = Blueprint('public', __name__)
 
@@ -50,6 +51,13 @@ def shop():
     if max_price:
         query = query.filter(Product.price <= max_price)
     
+    # Facetas contadas sobre os demais filtros, antes dos de atributo
+    attr_filters = parse_attribute_filters(request.args)
+    facets = attribute_facets(query, attr_filters,
+                              max_facets=current_app.config['ATTRIBUTE_FACETS_MAX'],
+                              max_values=current_app.config['ATTRIBUTE_FACET_VALUES'])
+    query = apply_attribute_filters(query, attr_filters)
+    
     sort = request.args.get('sort', 'newest')
     if sort == 'price_asc':
         query = query.order_by(Product.price.asc())
@@ -73,7 +81,9 @@ def shop():
                          categories=categories,
                          current_category=category_id,
                          search_term=search_term,
-                         sort=sort)
+                         sort=sort,
+                         facets=facets,
+                         attr_args=filter_args(attr_filters))
 
 @public_bp.route('/product/<slug>')
 def product_detail(slug):
@@ -108,58 +118,47 @@ def search():
 
 @public_bp.route('/sitemap.xml')
 def sitemap():
-    """Sitemap dinâmico para SEO"""
+    """Índice de sitemaps para SEO (shards em app/sitemap.py)"""
     from flask import make_response
-    from datetime import datetime
-    
-    pages = []
-    
-    pages.append({
-        'loc': url_for('public.index', _external=True),
-        'lastmod': datetime.utcnow().strftime('%Y-%m-%d'),
-        'changefreq': 'daily',
-        'priority': '1.0'
-    })
-    
-    pages.append({
-        'loc': url_for('public.shop', _external=True),
-        'lastmod': datetime.utcnow().strftime('%Y-%m-%d'),
-        'changefreq': 'daily',
-        'priority': '0.9'
-    })
-    
-    products = Product.query.filter_by(is_active=True).all()
-    for product in products:
-        pages.append({
-            'loc': url_for('public.product_detail', slug=product.slug, _external=True),
-            'lastmod': product.updated_at.strftime('%Y-%m-%d'),
-            'changefreq': 'weekly',
-            'priority': '0.8'
-        })
-    
-    categories = Category.query.filter_by(is_active=True).all()
-    for cat in categories:
-        pages.append({
-            'loc': url_for('public.category', slug=cat.slug, _external=True),
-            'lastmod': cat.updated_at.strftime('%Y-%m-%d'),
-            'changefreq': 'weekly',
-            'priority': '0.7'
-        })
-    
-    sitemap_xml = render_template('sitemap.xml', pages=pages)
+    from app.sitemap import SitemapNotConfigured, canonical_url, index_entries
+    
+    try:
+        sitemaps = [(canonical_url('public.sitemap_shard', name=name), lastmod)
+                    for name, lastmod in index_entries()]
+    except SitemapNotConfigured as e:
+        current_app.logger.warning(str(e))
+        abort(404)
+    sitemap_xml = render_template('sitemap.xml', sitemaps=sitemaps)
     response = make_response(sitemap_xml)
     response.headers["Content-Type"] = "application/xml"
     return response
 
+@public_bp.route('/sitemap-<name>.xml.gz')
+def sitemap_shard(name):
+    """Shard do sitemap, gerado sob demanda e servido do cache em disco"""
+    from flask import send_file
+    from app.sitemap import SitemapNotConfigured, shard_file
+    
+    try:
+        path = shard_file(name)
+    except SitemapNotConfigured as e:
+        current_app.logger.warning(str(e))
+        abort(404)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='application/x-gzip', max_age=3600)
+
 @public_bp.route('/robots.txt')
 def robots():
     """Arquivo robots.txt para SEO"""
     from flask import make_response
+    from app.sitemap import SitemapNotConfigured, canonical_url
     
-    robots_txt = f"""User-agent: *
-Allow: /
-Sitemap: {url_for('public.sitemap', _external=True)}
-"""
+    robots_txt = "User-agent: *\nAllow: /\n"
+    try:
+        robots_txt += f"Sitemap: {canonical_url('public.sitemap')}\n"
+    except SitemapNotConfigured:
+        pass
     response = make_response(robots_txt)
     response.headers["Content-Type"] = "text/plain"
     return response
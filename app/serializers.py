@@ -0,0 +1,125 @@
+"""
+Serialização de modelos na API - Fermarc E-commerce
+Desenvolvido por João Lion
+
+Cada campo público sabe quais colunas e relacionamentos precisa. Com
+``fields=`` / ``exclude=`` a consulta carrega só essas colunas (load_only) e
+só busca galeria e categorias quando algum campo pedido depende delas,
+então um cliente que pede ``fields=id,sku,price,stock`` não lê descrição
+nem especificações.
+
+O serializador de cada combinação de campos é montado uma vez (lista de
+pares nome/getter em cache) e reaproveitado em todas as linhas.
+"""
+from functools import lru_cache
+from operator import attrgetter
+
+from sqlalchemy.orm import lazyload, load_only, selectinload
+
+
+class FieldError(ValueError):
+    """Campo desconhecido em ``fields=``/``exclude=`` - o chamador deve responder 400"""
+
+
+def _split(value):
+    if value is None or value == '':
+        return []
+    names = value.split(',') if isinstance(value, str) else list(value)
+    return [str(name).strip() for name in names if str(name).strip()]
+
+
+class ModelSerializer:
+    """
+    Serializador de um modelo. ``fields`` mapeia nome -> (colunas,
+    relacionamentos, getter); getter None lê o atributo de mesmo nome.
+    """
+
+    def __init__(self, model_path, fields, lazy_relationships=()):
+        self.model_path = model_path
+        self.fields = fields
+        self.lazy_relationships = lazy_relationships
+        self._compile = lru_cache(maxsize=128)(self._build)
+
+    @property
+    def model(self):
+        from app import models
+        return getattr(models, self.model_path)
+
+    def parse(self, fields=None, exclude=None, default=None):
+        """
+        Campos pedidos, na ordem pedida, sem os excluídos. Sem ``fields`` parte
+        de ``default`` (ou de todos os campos).
+        """
+        default = tuple(default or self.fields)
+        requested, excluded = _split(fields), _split(exclude)
+        for name in requested + excluded:
+            if name not in self.fields:
+                raise FieldError(f'Campo desconhecido: {name}')
+        selected = tuple(dict.fromkeys(requested)) or default
+        return tuple(name for name in selected if name not in excluded)
+
+    def load_options(self, fields, extra_columns=()):
+        """Opções de consulta que carregam só o necessário para ``fields``"""
+        model = self.model
+        columns, relationships = {'id', *extra_columns}, set()
+        for name in fields:
+            needed_columns, needed_relationships, _ = self.fields[name]
+            columns.update(needed_columns)
+            relationships.update(needed_relationships)
+
+        options = [load_only(*(getattr(model, c) for c in sorted(columns)), raiseload=False)]
+        for relationship in sorted(relationships):
+            options.append(selectinload(getattr(model, relationship)))
+        for relationship in self.lazy_relationships:
+            if relationship not in relationships:
+                options.append(lazyload(getattr(model, relationship)))
+        return options
+
+    def _build(self, fields):
+        return tuple(
+            (name, self.fields[name][2] or attrgetter(name))
+            for name in fields
+        )
+
+    def dump(self, obj, fields):
+        return {name: getter(obj) for name, getter in self._compile(fields)}
+
+    def dump_many(self, objs, fields):
+        compiled = self._compile(fields)
+        return [{name: getter(obj) for name, getter in compiled} for obj in objs]
+
+
+def _isoformat(attribute):
+    getter = attrgetter(attribute)
+    return lambda obj: getter(obj).isoformat()
+
+
+product_serializer = ModelSerializer('Product', {
+    'id': ((), (), None),
+    'title': (('title',), (), None),
+    'slug': (('slug',), (), None),
+    'description': (('description',), (), None),
+    'sku': (('sku',), (), None),
+    'price': (('price',), (), lambda p: float(p.price)),
+    'stock': (('stock',), (), None),
+    'in_stock': (('stock',), (), None),
+    'images': ((), ('gallery',), lambda p: p.get_images()),
+    'main_image': ((), ('gallery',), None),
+    'featured': (('featured',), (), None),
+    'specifications': (('specifications',), (), None),
+    'categories': ((), ('categories',), lambda p: [
+        {'id': c.id, 'name': c.name, 'slug': c.slug} for c in p.categories
+    ]),
+    'created_at': (('created_at',), (), _isoformat('created_at')),
+    'updated_at': (('updated_at',), (), _isoformat('updated_at')),
+}, lazy_relationships=('gallery',))  # galeria é selectin por padrão
+
+# Campos padrão de cada endpoint (os mesmos de antes do fields=)
+PRODUCT_LIST_FIELDS = (
+    'id', 'title', 'slug', 'description', 'sku', 'price', 'stock', 'in_stock',
+    'images', 'main_image', 'featured', 'categories',
+)
+PRODUCT_DETAIL_FIELDS = (
+    'id', 'title', 'slug', 'description', 'sku', 'price', 'stock', 'in_stock',
+    'images', 'featured', 'specifications', 'categories', 'created_at', 'updated_at',
+)
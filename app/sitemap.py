@@ -0,0 +1,240 @@
+"""
+Sitemaps - Fermarc E-commerce
+Desenvolvido por João Lion
+
+``/sitemap.xml`` é um índice (sitemapindex) que aponta para os shards:
+
+- ``/sitemap-pages.xml.gz``: home, shop e categorias
+- ``/sitemap-products-<n>.xml.gz``: produtos com id entre
+  n * SITEMAP_SHARD_SIZE + 1 e (n + 1) * SITEMAP_SHARD_SIZE
+
+Cada shard é gerado por uma consulta em streaming que lê só slug e
+updated_at, gravado em SITEMAP_CACHE_DIR como .xml.gz e servido do disco.
+Junto de cada arquivo fica a "impressão digital" das linhas do shard
+(contagem + maior updated_at); o shard só é regerado quando ela muda.
+
+As URLs usam sempre a base canônica (SITEMAP_BASE_URL ou, sem ela,
+PREFERRED_URL_SCHEME + SERVER_NAME), nunca o Host da requisição: os shards
+ficam em cache e são servidos a todos. Sem base configurada os sitemaps não
+são gerados.
+"""
+import gzip
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+from xml.sax.saxutils import escape
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+
+URLSET_OPEN = b'<?xml version="1.0" encoding="UTF-8"?>\n' \
+              b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = b'</urlset>\n'
+URL_ENTRY = '<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod>' \
+            '<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>\n'
+
+SLUG_PLACEHOLDER = '__slug__'
+
+_lock = threading.Lock()
+_index_cache = {}  # 'entries' -> (expira_em, [(nome, lastmod)])
+
+
+class SitemapNotConfigured(RuntimeError):
+    """Nem SITEMAP_BASE_URL nem SERVER_NAME configurados"""
+
+
+def base_url():
+    """Base canônica do site, sem barra final; SitemapNotConfigured se ausente"""
+    config = current_app.config
+    base = config.get('SITEMAP_BASE_URL')
+    if not base and config.get('SERVER_NAME'):
+        base = f"{config.get('PREFERRED_URL_SCHEME', 'http')}://{config['SERVER_NAME']}" \
+               f"{config.get('APPLICATION_ROOT') or ''}"
+    if not base:
+        raise SitemapNotConfigured('Defina SITEMAP_BASE_URL (ou SERVER_NAME) para gerar os sitemaps')
+    return base.rstrip('/')
+
+
+def canonical_url(endpoint, **values):
+    """url_for externo sobre a base canônica, sem depender da requisição"""
+    parts = urlsplit(base_url())
+    adapter = current_app.url_map.bind(parts.netloc, script_name=parts.path or '/',
+                                       url_scheme=parts.scheme)
+    return adapter.build(endpoint, values, force_external=True)
+
+
+def _shard_size():
+    return current_app.config.get('SITEMAP_SHARD_SIZE', 50000)
+
+
+def _cache_dir():
+    path = current_app.config.get('SITEMAP_CACHE_DIR') or \
+        os.path.join(current_app.instance_path, 'sitemaps')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _lastmod(value):
+    return (value or datetime.utcnow()).strftime('%Y-%m-%d')
+
+
+def _url_pattern(endpoint):
+    """url_for uma única vez por shard; cada linha só substitui o slug"""
+    return canonical_url(endpoint, slug=SLUG_PLACEHOLDER)
+
+
+def _entry(loc, lastmod, changefreq, priority):
+    return URL_ENTRY.format(loc=escape(loc), lastmod=lastmod,
+                            changefreq=changefreq, priority=priority).encode('utf-8')
+
+
+# Shards ----------------------------------------------------------------
+
+def _product_range(shard):
+    from app.models import Product
+    size = _shard_size()
+    return Product.id.between(shard * size + 1, (shard + 1) * size)
+
+
+def _products_fingerprint(shard):
+    from app.models import Product
+    count, updated = db.session.execute(
+        select(func.count(Product.id), func.max(Product.updated_at))
+        .where(_product_range(shard), Product.is_active == True)
+    ).one()
+    return f'{count}|{updated}|{base_url()}', updated
+
+
+def _write_products(out, shard):
+    from app.models import Product
+    pattern = _url_pattern('public.product_detail')
+    rows = db.session.execute(
+        select(Product.slug, Product.updated_at)
+        .where(_product_range(shard), Product.is_active == True)
+        .order_by(Product.id)
+        .execution_options(yield_per=1000)
+    )
+    for slug, updated_at in rows:
+        out.write(_entry(pattern.replace(SLUG_PLACEHOLDER, quote(slug)),
+                         _lastmod(updated_at), 'weekly', '0.8'))
+
+
+def _pages_fingerprint():
+    from app.models import Category
+    count, updated = db.session.execute(
+        select(func.count(Category.id), func.max(Category.updated_at))
+        .where(Category.is_active == True)
+    ).one()
+    return f'{count}|{updated}|{base_url()}', updated
+
+
+def _write_pages(out):
+    from app.models import Category
+    today = _lastmod(None)
+    out.write(_entry(canonical_url('public.index'), today, 'daily', '1.0'))
+    out.write(_entry(canonical_url('public.shop'), today, 'daily', '0.9'))
+    pattern = _url_pattern('public.category')
+    rows = db.session.execute(
+        select(Category.slug, Category.updated_at)
+        .where(Category.is_active == True)
+        .order_by(Category.id)
+        .execution_options(yield_per=1000)
+    )
+    for slug, updated_at in rows:
+        out.write(_entry(pattern.replace(SLUG_PLACEHOLDER, quote(slug)),
+                         _lastmod(updated_at), 'weekly', '0.7'))
+
+
+def _shard_functions(name):
+    """(fingerprint, writer) do shard 'pages' ou 'products-<n>'"""
+    if name == 'pages':
+        return _pages_fingerprint, _write_pages
+    prefix, _, number = name.partition('-')
+    if prefix != 'products' or not number.isdigit():
+        return None
+    shard = int(number)
+    return (lambda: _products_fingerprint(shard)), (lambda out: _write_products(out, shard))
+
+
+def shard_file(name):
+    """
+    Caminho do .xml.gz atualizado do shard (regerado se as linhas mudaram)
+    ou None se o shard não existe
+    """
+    functions = _shard_functions(name)
+    if functions is None:
+        return None
+    fingerprint_func, writer = functions
+    fingerprint, _ = fingerprint_func()
+
+    directory = _cache_dir()
+    path = os.path.join(directory, f'sitemap-{name}.xml.gz')
+    meta_path = path + '.fingerprint'
+
+    def cached_fingerprint():
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    if cached_fingerprint() == fingerprint and os.path.exists(path):
+        return path
+
+    with _lock:
+        if cached_fingerprint() == fingerprint and os.path.exists(path):
+            return path
+        # Grava em arquivo temporário e troca atomicamente (outros workers leem o antigo)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as out:
+                out.write(URLSET_OPEN)
+                writer(out)
+                out.write(URLSET_CLOSE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+        os.replace(meta_path + '.tmp', meta_path)
+    return path
+
+
+# Índice ----------------------------------------------------------------
+
+def index_entries():
+    """[(nome_do_shard, lastmod)] - uma consulta agrupada, em cache por SITEMAP_INDEX_TTL"""
+    from app.models import Product
+
+    base_url()
+    cached = _index_cache.get('entries')
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    size = _shard_size()
+    bucket = ((Product.id - 1) // size).label('bucket')
+    rows = db.session.execute(
+        select(bucket, func.max(Product.updated_at))
+        .where(Product.is_active == True)
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+
+    _, pages_updated = _pages_fingerprint()
+    entries = [('pages', _lastmod(pages_updated))]
+    entries += [(f'products-{int(shard)}', _lastmod(updated)) for shard, updated in rows]
+
+    ttl = current_app.config.get('SITEMAP_INDEX_TTL', 300)
+    _index_cache['entries'] = (time.monotonic() + ttl, entries)
+    return entries
+
+
+def build_all():
+    """Gera todos os shards (``flask build-sitemaps``)"""
+    return [(name, shard_file(name)) for name, _ in index_entries()]
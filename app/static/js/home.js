@@ -0,0 +1,83 @@
+/* Fermarc E-commerce - Página inicial (carrossel)
+ * Desenvolvido por João Lion
+ */
+console.log("Fermarc E-commerce - Desenvolvido por João Lion");
+
+// CAROUSEL
+let currentSlide = 0;
+const totalSlides = 3;
+const track = document.getElementById('carouselTrack');
+const dotsContainer = document.getElementById('carouselDots');
+
+// Criar dots
+for (let i = 0; i < totalSlides; i++) {
+    const dot = document.createElement('button');
+    dot.className = 'carousel_dot';
+    if (i === 0) dot.classList.add('active');
+    dot.onclick = () => goToSlide(i);
+    dotsContainer.appendChild(dot);
+}
+
+function moveCarousel(direction) {
+    currentSlide += direction;
+    if (currentSlide < 0) currentSlide = totalSlides - 1;
+    if (currentSlide >= totalSlides) currentSlide = 0;
+    updateCarousel();
+}
+
+function goToSlide(index) {
+    currentSlide = index;
+    updateCarousel();
+}
+
+function updateCarousel() {
+    track.style.transform = `translateX(-${currentSlide * 100}%)`;
+
+    const dots = dotsContainer.querySelectorAll('.carousel_dot');
+    dots.forEach((dot, index) => {
+        dot.classList.toggle('active', index === currentSlide);
+    });
+}
+
+// Auto-play
+setInterval(() => {
+    moveCarousel(1);
+}, 5000);
+
+// Toggle do menu de categorias no mobile
+const sidebar = document.querySelector('.sidebar_categories');
+const sidebarHeader = document.querySelector('.sidebar_header');
+
+if (sidebar && sidebarHeader) {
+    sidebarHeader.addEventListener('click', function() {
+        // Só funciona em telas móveis (max-width: 768px)
+        if (window.innerWidth <= 768) {
+            sidebar.classList.toggle('open');
+        }
+    });
+
+    // Fecha o menu quando redimensiona para desktop
+    window.addEventListener('resize', function() {
+        if (window.innerWidth > 768) {
+            sidebar.classList.remove('open');
+        }
+    });
+}
+
+// Animação suave ao scroll
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function (e) {
+        const href = this.getAttribute('href');
+        if (href !== '#') {
+            e.preventDefault();
+            const target = document.querySelector(href);
+            if (target) {
+                target.scrollIntoView({
+                    behavior: 'smooth',
+                    block: 'start'
+                });
+            }
+        }
+    });
+});
+
@@ -85,4 +85,33 @@ function createToastContainer() {
     return container;
 }
 
+// Search-as-you-type (GET /api/autocomplete)
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.querySelector('[data-autocomplete-url]');
+    const list = document.getElementById('search-suggestions');
+    if (!input || !list) return;
+    
+    let timer = null;
+    let lastTerm = '';
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const term = input.value.trim();
+        if (term.length < 2 || term === lastTerm) return;
+        timer = setTimeout(function() {
+            lastTerm = term;
+            fetch(`${input.dataset.autocompleteUrl}?q=${encodeURIComponent(term)}`)
+                .then(response => response.json())
+                .then(data => {
+                    list.innerHTML = '';
+                    data.suggestions.forEach(function(suggestion) {
+                        const option = document.createElement('option');
+                        option.value = suggestion.label;
+                        list.appendChild(option);
+                    });
+                })
+                .catch(() => {});
+        }, 120);
+    });
+});
+
 console.log('Fermarc E-commerce - Desenvolvido por João Lion');
@@ -6,7 +6,7 @@ import re
 import os
 import secrets
 from werkzeug.utils import secure_filename
-from flask import current_app
+from flask import current_app, g
 from unidecode import unidecode
 
 def slugify(text):
@@ -83,6 +83,36 @@ def calculate_shipping(zipcode, subtotal):
     else:
         return base_rate * 1.2
 
+def parse_specifications(text):
+    """
+    Converte o texto do formulário em dict de especificações
+    Aceita um objeto JSON ou linhas no formato "Nome: Valor"
+    """
+    import json
+    
+    if not text or not text.strip():
+        return None
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+    
+    specs = {}
+    for line in text.splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            if key.strip():
+                specs[key.strip()] = value.strip()
+    return specs or {'Detalhes': text.strip()}
+
+def format_specifications(specs):
+    """Converte o dict de especificações em texto "Nome: Valor" para edição"""
+    if not specs:
+        return ''
+    return '\n'.join(f'{key}: {value}' for key, value in specs.items())
+
 def format_currency(value):
     """Formata valor como moeda brasileira"""
     return f"R$ {float(value):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
@@ -115,17 +145,93 @@ def send_email(to, subject, template, **kwargs):
     return True
 
 class CartService:
-    """Serviço para gerenciar carrinho de compras"""
+    """
+    Serviço para gerenciar carrinho de compras
+    
+    O cookie de sessão guarda apenas session['cart_id']; os itens ficam no
+    backend configurado em CART_STORE (ver app/cart_store.py). Alterações
+    feitas durante a requisição são acumuladas em ``g`` e gravadas uma única
+    vez no after_request, apenas nas linhas dos produtos alterados; limpar o
+    carrinho ou unir carrinhos no login substitui o carrinho inteiro.
+    """
+    
+    @staticmethod
+    def _store():
+        return current_app.extensions['cart_store']
+    
+    @staticmethod
+    def _state(session):
+        """Carrinho de trabalho da requisição atual"""
+        state = g.get('_cart_state')
+        if state is None:
+            cart_id = session.get('cart_id')
+            items = CartService._store().load(cart_id) if cart_id else {}
+            
+            # Migra carrinhos de cookies antigos (session['cart'])
+            legacy = session.pop('cart', None)
+            for product_id, quantity in (legacy or {}).items():
+                items[product_id] = items.get(product_id, 0) + quantity
+            
+            state = g._cart_state = {'items': items, 'dirty': False, 'changed': set(), 'replace': False}
+            if legacy:
+                CartService._mark_dirty(session, state, replace=True)
+        return state
+    
+    @staticmethod
+    def _mark_dirty(session, state, product_id=None, replace=False):
+        """Marca para o flush a linha de ``product_id`` ou, com replace, o carrinho todo"""
+        state['dirty'] = True
+        if replace:
+            state['replace'] = True
+        elif product_id is not None:
+            state['changed'].add(product_id)
+        if 'cart_id' not in session:
+            session['cart_id'] = secrets.token_hex(16)
+    
+    @staticmethod
+    def flush(session):
+        """Grava o carrinho no backend se ele foi alterado na requisição"""
+        from flask_login import current_user
+        
+        state = g.get('_cart_state')
+        if not state or not state['dirty']:
+            return
+        
+        user_id = current_user.id if current_user.is_authenticated else None
+        store = CartService._store()
+        if state['replace']:
+            store.save(session['cart_id'], state['items'], user_id=user_id)
+        else:
+            changes = {product_id: state['items'].get(product_id, 0) for product_id in state['changed']}
+            store.apply(session['cart_id'], changes, user_id=user_id)
+        state.update(dirty=False, changed=set(), replace=False)
+    
+    @staticmethod
+    def count(session):
+        """Quantidade de produtos distintos no carrinho (sem carregar os itens)"""
+        state = g.get('_cart_state')
+        if state is not None:
+            return len(state['items'])
+        if 'cart' in session:
+            return len(CartService._state(session)['items'])
+        
+        cart_id = session.get('cart_id')
+        if not cart_id:
+            return 0
+        if '_cart_count' not in g:
+            g._cart_count = CartService._store().count(cart_id)
+        return g._cart_count
     
     @staticmethod
     def get_cart(session):
         """Retorna carrinho da sessão"""
-        return session.get('cart', {})
+        return dict(CartService._state(session)['items'])
     
     @staticmethod
     def add_to_cart(session, product_id, quantity=1):
         """Adiciona produto ao carrinho"""
-        cart = session.get('cart', {})
+        state = CartService._state(session)
+        cart = state['items']
         product_id_str = str(product_id)
         
         if product_id_str in cart:
@@ -133,14 +239,14 @@ class CartService:
         else:
             cart[product_id_str] = quantity
         
-        session['cart'] = cart
-        session.modified = True
+        CartService._mark_dirty(session, state, product_id_str)
         return cart
     
     @staticmethod
     def update_cart(session, product_id, quantity):
         """Atualiza quantidade de produto no carrinho"""
-        cart = session.get('cart', {})
+        state = CartService._state(session)
+        cart = state['items']
         product_id_str = str(product_id)
         
         if quantity <= 0:
@@ -148,26 +254,66 @@ class CartService:
         else:
             cart[product_id_str] = quantity
         
-        session['cart'] = cart
-        session.modified = True
+        CartService._mark_dirty(session, state, product_id_str)
         return cart
     
     @staticmethod
     def remove_from_cart(session, product_id):
         """Remove produto do carrinho"""
-        cart = session.get('cart', {})
+        state = CartService._state(session)
+        cart = state['items']
         product_id_str = str(product_id)
         cart.pop(product_id_str, None)
         
-        session['cart'] = cart
-        session.modified = True
+        CartService._mark_dirty(session, state, product_id_str)
         return cart
     
     @staticmethod
     def clear_cart(session):
         """Limpa carrinho"""
-        session['cart'] = {}
-        session.modified = True
+        state = CartService._state(session)
+        state['items'] = {}
+        CartService._mark_dirty(session, state, replace=True)
+    
+    @staticmethod
+    def merge_on_login(session, user_id):
+        """
+        Une o carrinho anônimo ao carrinho salvo do usuário após o login
+        Quantidades do mesmo produto são somadas
+        """
+        store = CartService._store()
+        anon_id = session.get('cart_id')
+        owner = store.owner(anon_id) if anon_id else None
+        if owner is not None and owner != user_id:
+            # Carrinho de outra conta (sessão antiga): não é unido nem apagado
+            CartService.forget(session)
+            anon_id = None
+        state = CartService._state(session)
+        user_cart_id = store.find_user_cart(user_id)
+        
+        if user_cart_id and user_cart_id != anon_id:
+            merged = store.load(user_cart_id)
+            for product_id, quantity in state['items'].items():
+                merged[product_id] = merged.get(product_id, 0) + quantity
+            if anon_id:
+                store.delete(anon_id)
+            session['cart_id'] = user_cart_id
+            state['items'] = merged
+            CartService._mark_dirty(session, state, replace=True)
+        elif state['items']:
+            # Associa o carrinho anônimo ao usuário no próximo flush
+            CartService._mark_dirty(session, state)
+    
+    @staticmethod
+    def forget(session):
+        """
+        Desvincula a sessão do carrinho (logout) sem gravar nada: o carrinho
+        salvo do usuário fica intacto para o próximo login
+        """
+        session.pop('cart_id', None)
+        session.pop('cart', None)
+        g.pop('_cart_state', None)
+        g.pop('_cart_count', None)
     
     @staticmethod
     def get_cart_items(session):
@@ -175,7 +321,7 @@ class CartService:
         from app.models import Product
         from decimal import Decimal
         
-        cart = session.get('cart', {})
+        cart = CartService._state(session)['items']
         items = []
         subtotal = Decimal('0.00')
         
@@ -0,0 +1,31 @@
+"""unicode lower indexes
+
+No SQLite o lower() passou a ser a versão Unicode registrada em
+app/database.py; os índices em lower() criados com a função nativa (só
+ASCII) são reconstruídos com a nova. No PostgreSQL não há o que fazer.
+
+Revision ID: 5d1e8c2f7a90
+Revises: a76c8cce2548
+Create Date: 2026-10-19 14:52:06.311402
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e8c2f7a90'
+down_revision = 'a76c8cce2548'
+branch_labels = None
+depends_on = None
+
+INDEXES = ('ix_users_email_lower', 'ix_users_first_name_lower', 'ix_users_last_name_lower')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for name in INDEXES:
+            op.execute(f'REINDEX {name}')
+
+
+def downgrade():
+    pass
@@ -0,0 +1,36 @@
+"""user search indexes
+
+Índices em lower() de e-mail e nomes para a busca de clientes por prefixo
+na listagem de pedidos do admin (app/admin_orders.py). Escrita à mão: o
+autogenerate não compara índices de expressão.
+
+Revision ID: 728389f0c044
+Revises: acd8968841d6
+Create Date: 2026-10-19 14:30:13.248914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '728389f0c044'
+down_revision = 'acd8968841d6'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_users_email_lower', 'lower(email)'),
+    ('ix_users_first_name_lower', 'lower(first_name)'),
+    ('ix_users_last_name_lower', 'lower(last_name)'),
+)
+
+
+def upgrade():
+    for name, expression in INDEXES:
+        op.create_index(name, 'users', [sa.text(expression)], unique=False)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='users')
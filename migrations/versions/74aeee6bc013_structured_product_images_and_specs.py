@@ -0,0 +1,158 @@
+"""structured product images and specs
+
+Move products.images_json para a tabela product_images e converte
+products.specifications (texto) em JSON/JSONB. Os dados existentes são
+convertidos em lotes para não carregar o catálogo inteiro em memória.
+
+Revision ID: 74aeee6bc013
+Revises: 990fac257d41
+Create Date: 2026-10-19 14:20:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '74aeee6bc013'
+down_revision = '990fac257d41'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+JSONType = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+products = sa.table(
+    'products',
+    sa.column('id', sa.Integer),
+    sa.column('images_json', sa.Text),
+    sa.column('specifications', sa.Text),
+    sa.column('specs_json', JSONType),
+)
+
+product_images = sa.table(
+    'product_images',
+    sa.column('product_id', sa.Integer),
+    sa.column('position', sa.Integer),
+    sa.column('path', sa.String),
+)
+
+
+def _batches(conn, *columns):
+    """Percorre products em lotes por id"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(products.c.id, *columns)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _parse_specs(text):
+    if not text or not text.strip():
+        return None
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+    return {'Detalhes': text.strip()}
+
+
+def _parse_images(text):
+    try:
+        paths = json.loads(text) if text else []
+    except ValueError:
+        return []
+    return [p for p in paths if isinstance(p, str)] if isinstance(paths, list) else []
+
+
+def upgrade():
+    op.create_table('product_images',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('derivatives', JSONType, nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.create_index('ix_product_images_product_position', ['product_id', 'position'], unique=False)
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('specs_json', JSONType, nullable=True))
+
+    conn = op.get_bind()
+    for rows in _batches(conn, products.c.images_json, products.c.specifications):
+        image_rows = [
+            {'product_id': product_id, 'position': position, 'path': path}
+            for product_id, images_json, _ in rows
+            for position, path in enumerate(_parse_images(images_json))
+        ]
+        if image_rows:
+            conn.execute(product_images.insert(), image_rows)
+
+        for product_id, _, specifications in rows:
+            specs = _parse_specs(specifications)
+            if specs is not None:
+                conn.execute(
+                    products.update().where(products.c.id == product_id).values(specs_json=specs)
+                )
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('images_json')
+        batch_op.drop_column('specifications')
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.alter_column('specs_json', new_column_name='specifications',
+                              existing_type=JSONType, existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.alter_column('specifications', new_column_name='specs_json',
+                              existing_type=JSONType, existing_nullable=True)
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('images_json', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('specifications', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    for rows in _batches(conn, products.c.specs_json):
+        ids = [row[0] for row in rows]
+        images = {}
+        for product_id, path in conn.execute(
+            sa.select(product_images.c.product_id, product_images.c.path)
+            .where(product_images.c.product_id.in_(ids))
+            .order_by(product_images.c.product_id, product_images.c.position)
+        ):
+            images.setdefault(product_id, []).append(path)
+
+        for product_id, specs in rows:
+            conn.execute(
+                products.update().where(products.c.id == product_id).values(
+                    images_json=json.dumps(images.get(product_id, [])),
+                    specifications=json.dumps(specs, ensure_ascii=False) if specs else None
+                )
+            )
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('specs_json')
+
+    with op.batch_alter_table('product_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_images_product_position')
+
+    op.drop_table('product_images')
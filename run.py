@@ -4,6 +4,9 @@ Desenvolvido por João Lion
 """
 from app import create_app, db
 from app.models import User, Product, Category, Order, OrderItem, Address, Coupon
+from app.fixtures import DEFAULT_FIXTURE, load_fixture_files
+from app.bulk import ORDER_TRANSITIONS
+import click
 import os
 
 app = create_app(os.getenv('FLASK_ENV', 'development'))
@@ -22,320 +25,252 @@ def make_shell_context():
     }
 
 @app.cli.command()
-def init_db():
+@click.option('--file', 'files', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='Arquivo de fixtures (JSON/YAML). Padrão: app/fixtures/default.json')
+def init_db(files):
     """Inicializa o banco de dados com dados de exemplo"""
     db.create_all()
     
-    if User.query.count() == 0:
-        admin = User(
-            username='admin',
-            email='admin@fermarc.com.br',
-            first_name='Administrador',
-            last_name='Fermarc',
-            is_admin=True
-        )
-        admin.set_password('admin123')
-        db.session.add(admin)
-        
-        user = User(
-            username='cliente',
-            email='cliente@example.com',
-            first_name='Cliente',
-            last_name='Teste'
-        )
-        user.set_password('cliente123')
-        db.session.add(user)
-        
-        db.session.commit()
-        print('✓ Usuários criados (admin:admin123, cliente:cliente123)')
+    loaded = load_fixture_files(files or [DEFAULT_FIXTURE])
+    for table, count in loaded.items():
+        print(f'✓ {count} registros inseridos em {table}')
     
-    if Category.query.count() == 0:
-        categories = [
-            Category(name='Arduino', slug='arduino', icon='fa-microchip', description='Placas e shields Arduino'),
-            Category(name='Raspberry Pi', slug='raspberry-pi', icon='fa-raspberry-pi', description='Produtos Raspberry Pi'),
-            Category(name='Sensores', slug='sensores', icon='fa-wifi', description='Sensores e módulos'),
-            Category(name='Módulos', slug='modulos', icon='fa-bolt', description='Módulos eletrônicos'),
-            Category(name='Componentes', slug='componentes', icon='fa-microchip', description='Componentes eletrônicos'),
-            Category(name='Kits Didáticos', slug='kits-didaticos', icon='fa-graduation-cap', description='Kits para aprendizado'),
-            Category(name='Ferramentas', slug='ferramentas', icon='fa-wrench', description='Ferramentas e equipamentos'),
-            Category(name='Impressão 3D', slug='impressao-3d', icon='fa-print', description='Impressoras e filamentos 3D'),
-        ]
-        
-        for category in categories:
-            db.session.add(category)
-        
-        db.session.commit()
-        print('✓ Categorias criadas')
-    
-    if Product.query.count() == 0:
-        arduino_cat = Category.query.filter_by(slug='arduino').first()
-        sensores_cat = Category.query.filter_by(slug='sensores').first()
-        raspberry_cat = Category.query.filter_by(slug='raspberry-pi').first()
-        modulos_cat = Category.query.filter_by(slug='modulos').first()
-        kits_cat = Category.query.filter_by(slug='kits-didaticos').first()
-        
-        import json
-        products = [
-            {
-                'title': 'Arduino Uno R3 - Placa Microcontroladora',
-                'sku': 'ARD-UNO-R3',
-                'description': '''Placa Arduino Uno R3 original com microcontrolador ATmega328P. 
-                
-A placa Arduino Uno R3 é perfeita para iniciantes e profissionais que buscam desenvolver projetos de automação, robótica e IoT. Com ampla comunidade e vasta documentação, é a escolha ideal para aprender programação de microcontroladores.
-
-Características principais:
-• Microcontrolador ATmega328P de alta performance
-• 14 pinos digitais de entrada/saída (6 com PWM)
-• 6 entradas analógicas
-• Conexão USB para programação e alimentação
-• Tensão de operação: 5V
-• Compatível com diversos shields e módulos
-
-Ideal para: Projetos de automação, robótica educacional, IoT, protótipos eletrônicos e aprendizado de programação.''',
-                'price': 89.90,
-                'stock': 50,
-                'featured': True,
-                'images': ['products/arduino_uno_microcon_cfa4e50a.jpg', 'products/arduino_uno_microcon_e797b1d2.jpg'],
-                'specifications': json.dumps({
-                    'Microcontrolador': 'ATmega328P',
-                    'Tensão de Operação': '5V',
-                    'Tensão de Entrada': '7-12V (recomendado)',
-                    'Pinos Digitais I/O': '14 (6 com PWM)',
-                    'Pinos de Entrada Analógica': '6',
-                    'Corrente DC por Pino I/O': '20 mA',
-                    'Corrente DC para Pino 3.3V': '50 mA',
-                    'Memória Flash': '32 KB (0.5 KB usado pelo bootloader)',
-                    'SRAM': '2 KB',
-                    'EEPROM': '1 KB',
-                    'Velocidade do Clock': '16 MHz',
-                    'Dimensões': '68.6 x 53.4 mm',
-                    'Peso': '25g'
-                }),
-                'categories': [arduino_cat] if arduino_cat else []
-            },
-            {
-                'title': 'Kit de Sensores Eletrônicos (37 em 1)',
-                'sku': 'KIT-SEN-37',
-                'description': '''Kit completo com 37 módulos sensores para Arduino e Raspberry Pi.
-
-Este kit profissional contém os sensores mais utilizados em projetos de eletrônica, automação e IoT. Perfeito para estudantes, makers e entusiastas que desejam explorar o mundo dos sensores.
-
-Inclui sensores de:
-• Temperatura e umidade (DHT11)
-• Movimento e presença (PIR)
-• Luz e cores (LDR, RGB)
-• Som e vibração
-• Toque capacitivo
-• Magnético (Hall Effect)
-• Distância ultrassônico
-• Chamas e gás
-• E muito mais!
-
-Cada sensor vem com pinos conectores para fácil integração. Acompanha guia básico de utilização e exemplos de código.''',
-                'price': 159.90,
-                'stock': 35,
-                'featured': True,
-                'images': ['products/electronic_sensors_u_199347fc.jpg', 'products/electronic_sensors_u_d06ed559.jpg', 'products/electronic_sensors_u_e2b50af4.jpg'],
-                'specifications': json.dumps({
-                    'Quantidade de Sensores': '37 módulos',
-                    'Tensão de Operação': '3.3V - 5V',
-                    'Interface': 'Digital e Analógico',
-                    'Compatibilidade': 'Arduino, Raspberry Pi, ESP32, ESP8266',
-                    'Conectores': 'Pinos header inclusos',
-                    'Material': 'PCB FR4',
-                    'Inclui': 'Sensores, conectores e guia básico',
-                    'Embalagem': 'Caixa plástica organizadora'
-                }),
-                'categories': [sensores_cat, kits_cat] if sensores_cat and kits_cat else []
-            },
-            {
-                'title': 'Raspberry Pi 4 Model B - 4GB RAM',
-                'sku': 'RPI4-4GB',
-                'description': '''Raspberry Pi 4 Model B com 4GB de RAM - O computador completo do tamanho de um cartão de crédito!
+    print('\n✓ Banco de dados inicializado com sucesso!')
+    print('  Acesse /admin com: admin / admin123')
 
-O Raspberry Pi 4 é o modelo mais poderoso da família, oferecendo performance de desktop em um formato compacto. Perfeito para projetos de automação residencial, servidores, media center, aprendizado de programação e muito mais.
+@app.cli.command()
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--force', is_flag=True, help='Insere mesmo em tabelas que já possuem registros')
+def load_fixtures(files, force):
+    """Carrega fixtures JSON/YAML em lote (uma única transação)"""
+    import time
+    
+    started = time.perf_counter()
+    loaded = load_fixture_files(files, only_empty=not force)
+    elapsed = time.perf_counter() - started
+    
+    for table, count in loaded.items():
+        print(f'✓ {count} registros inseridos em {table}')
+    print(f'✓ Fixtures carregadas em {elapsed:.2f}s')
 
-Novidades do modelo 4:
-• Processador Broadcom BCM2711 quad-core Cortex-A72 (ARM v8) 64-bit @ 1.5GHz
-• 4GB LPDDR4-3200 SDRAM
-• Conectividade Gigabit Ethernet
-• Bluetooth 5.0, BLE
-• 2 portas USB 3.0 e 2 portas USB 2.0
-• Dual micro-HDMI com suporte a 4K
-• GPU VideoCore VI com suporte a OpenGL ES 3.0
+@app.cli.command()
+@click.option('--days', default=30, show_default=True, help='Idade mínima dos carrinhos anônimos')
+def purge_carts(days):
+    """Remove carrinhos anônimos abandonados"""
+    from app.cart_store import purge_expired_carts
+    
+    removed = purge_expired_carts(app, days=days)
+    print(f'✓ {removed} carrinhos removidos')
 
-Use como: Media center, retro gaming, servidor web, automação residencial, projetos IoT, estação de trabalho portátil.''',
-                'price': 549.90,
-                'stock': 25,
-                'featured': True,
-                'images': ['products/raspberry_pi_compute_85bb9cc5.jpg', 'products/raspberry_pi_compute_a08c95b4.jpg'],
-                'specifications': json.dumps({
-                    'Processador': 'Broadcom BCM2711 Quad-core Cortex-A72 @ 1.5GHz',
-                    'Memória RAM': '4GB LPDDR4-3200',
-                    'Conectividade': 'Gigabit Ethernet',
-                    'WiFi': '2.4 GHz e 5.0 GHz IEEE 802.11ac',
-                    'Bluetooth': '5.0, BLE',
-                    'GPIO': '40 pinos',
-                    'USB': '2x USB 3.0, 2x USB 2.0',
-                    'Vídeo': '2x micro-HDMI (suporte a 4K@60Hz)',
-                    'Armazenamento': 'microSD',
-                    'Alimentação': '5V DC via USB-C (mín. 3A)',
-                    'Dimensões': '88 x 58 x 19.5 mm',
-                    'Temperatura de Operação': '0-50°C'
-                }),
-                'categories': [raspberry_cat] if raspberry_cat else []
-            },
-            {
-                'title': 'Kit Robótica Educacional - Carro Inteligente',
-                'sku': 'KIT-ROB-CAR',
-                'description': '''Kit completo para montar seu próprio carro robô inteligente com Arduino!
+@app.cli.command()
+def purge_idempotency_keys():
+    """Remove chaves de idempotência expiradas"""
+    from app.idempotency import purge_expired_keys
+    
+    removed = purge_expired_keys()
+    print(f'✓ {removed} chaves removidas')
 
-Este kit educacional permite a construção de um veículo robótico com diversos recursos, ideal para aprender robótica, programação e eletrônica de forma prática e divertida.
+@app.cli.command()
+@click.option('--days', default=None, type=int, help='Idade mínima (padrão: CHANGES_RETENTION_DAYS)')
+def compact_changes(days):
+    """Compacta o log catalog_changes (mantém o último registro de cada produto)"""
+    from datetime import datetime, timedelta
+    from app.changes import compact_changes as compact
+    
+    days = app.config['CHANGES_RETENTION_DAYS'] if days is None else days
+    removed = compact(datetime.utcnow() - timedelta(days=days))
+    print(f'✓ {removed} registros compactados')
 
-O que vem no kit:
-• Chassi de acrílico resistente
-• 4 motores DC com redução
-• Driver de motor L298N
-• Módulo Bluetooth HC-05
-• Sensor ultrassônico para desvio de obstáculos
-• Módulo seguidor de linha (3 sensores IR)
-• Bateria recarregável e suporte
-• Rodas e componentes de montagem
-• Arduino Uno R3 compatível
-• Todos os cabos necessários
+@app.cli.command()
+def rebuild_order_summaries():
+    """Recalcula os resumos de pedidos (user_order_summaries) de todos os clientes"""
+    from app.order_history import rebuild_summaries
+    
+    with db.engine.begin() as connection:
+        rebuild_summaries(connection)
+    print(f'✓ {User.query.count()} resumos recalculados')
 
-Funcionalidades:
-✓ Controle via Bluetooth pelo smartphone
-✓ Modo autônomo com desvio de obstáculos
-✓ Seguidor de linha automático
-✓ Velocidade ajustável via programação
+@app.cli.command()
+@click.option('--percent', required=True, type=float, help='Reajuste em % (negativo para desconto)')
+@click.option('--category', 'categories', multiple=True, help='Slug da categoria (repetível)')
+@click.option('--id', 'product_ids', multiple=True, type=int, help='Id do produto (repetível)')
+@click.option('--all', 'all_products', is_flag=True, help='Reajusta todos os produtos')
+def bulk_reprice(percent, categories, product_ids, all_products):
+    """Reajusta preços em massa por categoria ou id"""
+    from app.bulk import reprice_products, describe_result
+    
+    if not (categories or product_ids or all_products):
+        raise click.UsageError('Informe --category, --id ou --all')
+    category_ids = [c.id for c in Category.query.filter(Category.slug.in_(categories))]
+    if len(category_ids) != len(set(categories)):
+        raise click.BadParameter('Categoria não encontrada', param_hint='--category')
+    result = reprice_products(percent, category_ids=category_ids, product_ids=product_ids)
+    print(f'✓ {describe_result(result)}')
 
-Acompanha manual de montagem ilustrado e códigos de exemplo prontos para upload!''',
-                'price': 389.90,
-                'stock': 18,
-                'featured': True,
-                'images': ['products/robotics_kit_compone_6ea80773.jpg', 'products/robotics_kit_compone_8f420ec9.jpg'],
-                'specifications': json.dumps({
-                    'Plataforma': 'Arduino Uno R3 compatível',
-                    'Motores': '4x DC com redução 1:48',
-                    'Driver de Motor': 'L298N Dual H-Bridge',
-                    'Comunicação': 'Bluetooth HC-05',
-                    'Sensores': 'Ultrassônico HC-SR04 + 3x IR seguidor de linha',
-                    'Alimentação': 'Bateria recarregável 7.4V 2200mAh',
-                    'Velocidade Máxima': 'Até 1.5 m/s',
-                    'Autonomia': 'Até 2 horas de uso contínuo',
-                    'Material do Chassi': 'Acrílico 3mm',
-                    'Dimensões Montado': '195 x 135 x 90 mm',
-                    'Peso': '650g',
-                    'Idade Recomendada': '12+ anos',
-                    'Nível': 'Intermediário'
-                }),
-                'categories': [kits_cat, arduino_cat] if kits_cat and arduino_cat else []
-            },
-            {
-                'title': 'Servo Motor MG996R - Alto Torque',
-                'sku': 'SRV-MG996R',
-                'description': '''Servo motor de alto torque MG996R com engrenagens metálicas.
+@app.cli.command()
+@click.argument('file', type=click.File('rb'))
+def bulk_stock(file):
+    """Define o estoque a partir de um CSV (colunas sku, stock)"""
+    from app.bulk import parse_stock_csv, set_stock, describe_result
+    
+    rows, errors = parse_stock_csv(file.read())
+    for error in errors:
+        print(f'✗ {error}')
+    result = set_stock(rows)
+    print(f'✓ {describe_result(result)}')
+    for sku in result['unknown']:
+        print(f'  SKU não encontrado: {sku}')
 
-O MG996R é um servo motor robusto e potente, ideal para aplicações que exigem força e precisão. Com engrenagens metálicas, oferece maior durabilidade e torque comparado aos servos tradicionais.
+@app.cli.command()
+@click.argument('status', type=click.Choice(sorted(ORDER_TRANSITIONS)))
+@click.argument('order_numbers', nargs=-1, required=True)
+def bulk_order_status(status, order_numbers):
+    """Muda o status de pedidos (números ou ids) respeitando as transições"""
+    from app.bulk import transition_orders, describe_result
+    
+    ids = [int(n) for n in order_numbers if n.isdigit()]
+    numbers = [n for n in order_numbers if not n.isdigit()]
+    if numbers:
+        ids += [o.id for o in Order.query.filter(Order.order_number.in_(numbers))]
+    result = transition_orders(ids, status)
+    print(f'✓ {describe_result(result)}')
 
-Características:
-• Engrenagens metálicas para maior durabilidade
-• Alto torque: 11kg.cm @ 6V
-• Rotação de 180° (ajustável por PWM)
-• Velocidade: 0.17seg/60° @ 6V
-• Controle preciso via sinal PWM
-• Rolamentos duplos para melhor estabilidade
+@app.cli.command()
+@click.option('--hits', default=20000, show_default=True)
+def bench_ratelimit(hits):
+    """Mede o custo por requisição dos storages de rate limiting"""
+    import tempfile
+    import time
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import SlidingWindowCounterRateLimiter
+    
+    item = parse('1000000 per minute')
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ('memory', 'memory://', {}),
+            ('sqlite (exato)', f'sqlite:///{tmp}/exact.db', {'batch_interval': 0}),
+            ('sqlite (lote 50ms)', f'sqlite:///{tmp}/batched.db', {'batch_interval': 0.05}),
+        ]
+        for name, uri, options in backends:
+            rate_limiter = SlidingWindowCounterRateLimiter(storage_from_string(uri, **options))
+            
+            started = time.perf_counter()
+            for i in range(hits):
+                rate_limiter.hit(item, f'10.0.0.{i % 50}')
+            elapsed = time.perf_counter() - started
+            print(f'{name:20s} {elapsed / hits * 1e6:8.2f} µs/hit')
 
-Aplicações ideais:
-✓ Braços robóticos
-✓ Sistemas de direção para carros RC
-✓ Mecanismos de abertura/fechamento
-✓ Projetos de automação
-✓ Robótica educacional e competições
+@app.cli.command()
+@click.option('--threads', default=8, show_default=True)
+@click.option('--seconds', default=3.0, show_default=True)
+@click.option('--profiles', default='default,development', show_default=True)
+def bench_db(threads, seconds, profiles):
+    """Compara a vazão dos perfis de engine sob carga concorrente (SQLite)"""
+    import tempfile
+    import threading
+    import time
+    from sqlalchemy import create_engine, text
+    from app.config import ENGINE_PROFILES
+    from app.database import build_engine_options, apply_sqlite_pragmas
+    
+    def worker(engine, deadline, counts, index):
+        done = 0
+        while time.perf_counter() < deadline:
+            with engine.begin() as conn:
+                if done % 5 == 0:
+                    conn.execute(text('INSERT INTO bench (value) VALUES (:v)'), {'v': done})
+                else:
+                    conn.execute(text('SELECT count(*), max(value) FROM bench WHERE id > :i'), {'i': done})
+            done += 1
+        counts[index] = done
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in profiles.split(','):
+            profile = ENGINE_PROFILES[name]
+            uri = f'sqlite:///{tmp}/{name}.db'
+            engine = create_engine(uri, **build_engine_options(profile, uri))
+            apply_sqlite_pragmas(engine, profile.get('sqlite_pragmas'))
+            with engine.begin() as conn:
+                conn.execute(text('CREATE TABLE bench (id INTEGER PRIMARY KEY, value INTEGER)'))
+            
+            counts = [0] * threads
+            deadline = time.perf_counter() + seconds
+            pool = [threading.Thread(target=worker, args=(engine, deadline, counts, i)) for i in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            engine.dispose()
+            print(f'{name:15s} {sum(counts) / seconds:10.0f} ops/s ({threads} threads)')
 
-O servo vem com acessórios: braços de diferentes formatos, parafusos de fixação e cabo conector.''',
-                'price': 45.90,
-                'stock': 75,
-                'featured': False,
-                'images': ['products/servo_motor_electron_5c6dea7e.jpg'],
-                'specifications': json.dumps({
-                    'Modelo': 'MG996R',
-                    'Tensão de Operação': '4.8V - 7.2V',
-                    'Torque': '9.4kg.cm @ 4.8V, 11kg.cm @ 6V',
-                    'Velocidade': '0.19seg/60° @ 4.8V, 0.17seg/60° @ 6V',
-                    'Ângulo de Rotação': '180° (ajustável)',
-                    'Tipo de Engrenagem': 'Metal',
-                    'Rolamentos': 'Duplo',
-                    'Peso': '55g',
-                    'Dimensões': '40.7 x 19.7 x 42.9 mm',
-                    'Tipo de Conector': '3 pinos (PWM)',
-                    'Corrente': '100mA idle, 1200mA stall',
-                    'Material da Carcaça': 'Plástico ABS'
-                }),
-                'categories': [modulos_cat] if modulos_cat else []
-            },
-            {
-                'title': 'Sensor Ultrassônico HC-SR04',
-                'sku': 'SEN-HC-SR04',
-                'description': '''Sensor de distância ultrassônico HC-SR04 de alta precisão.
+@app.cli.command()
+@click.option('--iterations', default=20, show_default=True)
+def bench_checkout(iterations):
+    """Compara a latência do checkout HTML com a API JSON (usuário temporário)"""
+    from app.benchmarks import bench_checkout_flows
+    
+    results = bench_checkout_flows(app, iterations=iterations)
+    for flow, title in (('html', 'HTML (sessão + formulários)'), ('json', 'API JSON (token)')):
+        print(title)
+        for step, median, p95 in results[flow]:
+            print(f'  {step:20s} mediana {median:7.2f} ms   p95 {p95:7.2f} ms')
 
-O HC-SR04 é um sensor de distância por ultrassom amplamente utilizado em projetos de robótica e automação. Oferece medições precisas e é muito fácil de usar com Arduino, Raspberry Pi e outros microcontroladores.
+@app.cli.command()
+@click.option('--per-page', default=100, show_default=True)
+@click.option('--rounds', default=20, show_default=True)
+def bench_json(per_page, rounds):
+    """Compara tamanho e tempo de serialização da listagem de produtos"""
+    from app.benchmarks import bench_product_serialization
+    
+    for fields, step, median, size in bench_product_serialization(app, per_page, rounds):
+        size = f'{size:8d} bytes' if size is not None else ''
+        print(f'{fields:40s} {step:15s} {median:8.3f} ms {size}')
 
-Como funciona:
-O sensor emite ondas ultrassônicas e mede o tempo de retorno do eco, calculando assim a distância até o obstáculo com ótima precisão.
+@app.cli.command()
+@click.option('--verbose', is_flag=True, help='Mostra o plano de cada consulta')
+def check_indexes(verbose):
+    """Confere via EXPLAIN se as consultas mais usadas usam índices"""
+    from app.query_plans import check_hot_queries
+    
+    failures = 0
+    for name, index, used, plan in check_hot_queries():
+        print(f'{"✓" if used else "✗"} {name} ({index})')
+        if verbose or not used:
+            print('    ' + plan.replace('\n', '\n    '))
+        failures += not used
+    
+    if failures:
+        raise click.ClickException(f'{failures} consulta(s) sem o índice esperado')
 
-Especificações técnicas:
-• Alcance de detecção: 2cm a 400cm
-• Precisão: ±3mm
-• Ângulo de medição: 15°
-• Frequência ultrassônica: 40kHz
-• Interface: Trigger e Echo (pinos digitais)
+@app.cli.command()
+def build_sitemaps():
+    """Gera (ou confirma atualizados) todos os shards do sitemap"""
+    from app.sitemap import SitemapNotConfigured, build_all
+    
+    try:
+        shards = build_all()
+    except SitemapNotConfigured as e:
+        raise click.ClickException(str(e))
+    for name, path in shards:
+        print(f'✓ sitemap-{name}.xml.gz ({os.path.getsize(path)} bytes)')
 
-Aplicações:
-✓ Robôs com desvio de obstáculos
-✓ Medidores de nível (líquidos)
-✓ Sistemas de estacionamento
-✓ Alarmes de proximidade
-✓ Projetos de automação residencial
+@app.cli.group()
+def assets():
+    """Pipeline de CSS/JS estáticos"""
 
-Fácil integração: apenas 4 pinos (VCC, GND, Trigger, Echo). Compatível com tensões de 3.3V e 5V.''',
-                'price': 15.90,
-                'stock': 120,
-                'featured': False,
-                'images': ['products/electronic_sensors_u_199347fc.jpg'],
-                'specifications': json.dumps({
-                    'Modelo': 'HC-SR04',
-                    'Tensão de Operação': '5V DC',
-                    'Corrente de Trabalho': '15mA',
-                    'Frequência': '40kHz',
-                    'Alcance Máximo': '400cm',
-                    'Alcance Mínimo': '2cm',
-                    'Ângulo de Medição': '15°',
-                    'Precisão': '±3mm',
-                    'Trigger': 'Pulso TTL de 10µs',
-                    'Echo': 'Pulso TTL proporcional à distância',
-                    'Dimensões': '45 x 20 x 15 mm',
-                    'Peso': '8g'
-                }),
-                'categories': [sensores_cat] if sensores_cat else []
-            }
-        ]
-        
-        from app.utils import slugify
-        for p_data in products:
-            cats = p_data.pop('categories')
-            images = p_data.pop('images', [])
-            product = Product(slug=slugify(p_data['title']), **p_data)
-            product.set_images(images)
-            product.categories = cats
-            db.session.add(product)
-        
-        db.session.commit()
-        print('✓ Produtos completos com imagens e especificações criados')
+@assets.command('build')
+@click.option('--clean', is_flag=True, help='Remove de dist/ as versões antigas')
+def assets_build(clean):
+    """Minifica e gera versões com hash em app/static/dist"""
+    from app.assets import build_assets
     
-    print('\n✓ Banco de dados inicializado com sucesso!')
-    print('  Acesse /admin com: admin / admin123')
+    total_source = total_min = 0
+    for source, target, source_size, min_size in build_assets(app.static_folder, clean=clean):
+        print(f'✓ {source} -> dist/{target} ({source_size} -> {min_size} bytes)')
+        total_source += source_size
+        total_min += min_size
+    print(f'\nTotal: {total_source} -> {total_min} bytes')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))